@@ -0,0 +1,183 @@
+# cross-indicator analysis on the indicator cube
+
+import logging
+import os
+import warnings
+
+import numpy as np
+
+from processing.cache.parse_cache import config_hash
+from processing.store.cube import IndicatorCube
+
+# ------------------------------- array functions ------------------------------ #
+
+def correlation_matrix(values) -> np.ndarray:
+    """
+    Pearson correlation of every pair of indicators over pairwise complete cells.
+
+    Each pair uses only the (region, year) cells where both indicators have a
+    value; all pairs are computed together with matrix products.
+
+    Args:
+        values (np.ndarray): indicators x regions x years values, NaN where missing.
+
+    Returns:
+        np.ndarray: indicators x indicators correlations, NaN for pairs with fewer than 2 common cells.
+    """
+    x = values.reshape(values.shape[0], -1).astype(np.float64)
+    present = (~np.isnan(x)).astype(np.float64)
+    x = np.where(present > 0, x, 0.0)
+
+    # sums over the cells both indicators share
+    count = present @ present.T
+    sum_x = x @ present.T
+    sum_xx = (x * x) @ present.T
+    sum_xy = x @ x.T
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        covariance = sum_xy - sum_x * sum_x.T / count
+        variance_x = sum_xx - sum_x ** 2 / count
+        correlation = covariance / np.sqrt(variance_x * variance_x.T)
+
+    correlation[count < 2] = np.nan
+    return np.clip(correlation, -1.0, 1.0)
+
+
+def yoy_growth(values, years) -> np.ndarray:
+    """
+    Year-over-year relative change.
+
+    Args:
+        values (np.ndarray): ... x years values.
+        years (list): Year of every position of the last axis, ascending.
+
+    Returns:
+        np.ndarray: Same shape, first year NaN; NaN where either year is missing,
+            the previous is 0 or the previous position is not the previous year
+            (a gap in the year axis would make it a multi-year change).
+    """
+    years = np.asarray(years)
+    growth = np.full(values.shape, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth[..., 1:] = values[..., 1:] / values[..., :-1] - 1.0
+    growth[..., 1:][..., np.diff(years) != 1] = np.nan
+    growth[~np.isfinite(growth)] = np.nan
+    return growth
+
+
+def cagr(values, years) -> np.ndarray:
+    """
+    Compound annual growth rate between the first and the last year with a value.
+
+    Args:
+        values (np.ndarray): ... x years values.
+        years (list): Year of every position of the last axis.
+
+    Returns:
+        np.ndarray: values.shape[:-1] rates, NaN with fewer than 2 years or non-positive ends.
+    """
+    present = ~np.isnan(values)
+    years = np.asarray(years, dtype=np.float64)
+
+    # first and last position with a value along the year axis
+    first = np.argmax(present, axis=-1)
+    last = values.shape[-1] - 1 - np.argmax(present[..., ::-1], axis=-1)
+
+    first_values = np.take_along_axis(values, first[..., None], axis=-1)[..., 0]
+    last_values = np.take_along_axis(values, last[..., None], axis=-1)[..., 0]
+    periods = years[last] - years[first]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rates = (last_values / first_values) ** (1.0 / periods) - 1.0
+
+    rates[(periods <= 0) | (first_values <= 0) | (last_values <= 0) | ~present.any(axis=-1)] = np.nan
+    return rates
+
+
+def cross_section_zscores(values, axis=1) -> np.ndarray:
+    """
+    Standardize values across regions for every indicator and year.
+
+    Args:
+        values (np.ndarray): indicators x regions x years values.
+        axis (int): Axis to standardize over, regions by default.
+
+    Returns:
+        np.ndarray: Same shape z-scores, NaN where the value is missing or the spread is 0.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'), warnings.catch_warnings():
+        # all-NaN slices are expected, e.g. years an indicator does not cover
+        warnings.simplefilter('ignore', RuntimeWarning)
+        mean = np.nanmean(values, axis=axis, keepdims=True)
+        std = np.nanstd(values, axis=axis, keepdims=True)
+        zscores = (values - mean) / std
+
+    zscores[~np.isfinite(zscores)] = np.nan
+    return zscores
+
+# ------------------------------------- < ------------------------------------ #
+
+
+# ----------------------------------- engine ----------------------------------- #
+
+class AnalysisEngine:
+    """
+    Cross-indicator analysis of an IndicatorCube with results cached by data version.
+
+    Results are kept in memory and, if cache_path is set, saved as .npy files in
+    a folder named after the cube version, so they are computed once per version
+    of the master data. File names include a hash of the array function's
+    source, so editing the function invalidates its results.
+    """
+
+    def __init__(self, cube: IndicatorCube, cache_path=None):
+        self.cube = cube
+        self.cache_path = cache_path
+        self.results = {}
+
+    def version_path(self) -> str:
+        return os.path.join(self.cache_path, self.cube.version)
+
+    def cached(self, name, function, *arguments) -> np.ndarray:
+        if name in self.results:
+            return self.results[name]
+
+        file_name = f"{name}.{config_hash(function)[:12]}.npy"
+        path = os.path.join(self.version_path(), file_name) if self.cache_path is not None else None
+
+        if path is not None and os.path.exists(path):
+            result = np.load(path)
+        else:
+            result = function(*arguments)
+            if path is not None:
+                os.makedirs(self.version_path(), exist_ok=True)
+                np.save(f"{path}.tmp.npy", result)
+                os.replace(f"{path}.tmp.npy", path)
+                logging.info(f"analysis result {name} cached for version {self.cube.version}")
+
+        self.results[name] = result
+        return result
+
+    def correlations(self) -> np.ndarray:
+        # indicators x indicators, axes ordered as cube.indicator_codes
+        return self.cached('correlations', correlation_matrix, self.cube.values)
+
+    def yoy_growth(self) -> np.ndarray:
+        # indicators x regions x years
+        return self.cached('yoy_growth', yoy_growth, self.cube.values, self.cube.years)
+
+    def cagr(self) -> np.ndarray:
+        # indicators x regions
+        return self.cached('cagr', cagr, self.cube.values, self.cube.years)
+
+    def zscores(self) -> np.ndarray:
+        # indicators x regions x years, standardized across regions
+        return self.cached('zscores', cross_section_zscores, self.cube.values)
+
+    def correlation_frame(self):
+        import pandas as pd
+
+        # labelled correlations, for display
+        return pd.DataFrame(self.correlations(), index=self.cube.indicator_codes, columns=self.cube.indicator_codes)
+
+# ------------------------------------- < ------------------------------------ #
@@ -0,0 +1,242 @@
+# benchmark every stage of the pipeline on a synthetic archive, track results over commits
+# python -m benchmarks.bench_pipeline [--indicators 14] [--granularity voivodeship] [--threshold 0.2]
+# exits with 1 if a stage got slower (or bigger) than the recent runs by more than the threshold
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from processing.indicator.graph import IndicatorGraph
+from processing.processor import INSTRUCTIONS, create_files, extract_file
+from processing.excel import ExcelFileProcessor
+from processing.indicator import process_indicator_df
+from processing.indicator.df import MasterDfBuilder
+from processing.store import save_master_df_to_parquet
+
+from .synthetic_archive import GRANULARITIES, generate_archive
+
+HISTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'history.jsonl')
+
+# differences below these are noise, never regressions
+MIN_SECONDS = 0.05
+MIN_MIB = 1.0
+
+
+# ---------------------------------- stages ---------------------------------- #
+
+def stage_extract(state):
+    extract_file(state['archive'], state['folder'])
+
+
+def stage_parse(state):
+    processor = ExcelFileProcessor()
+    indicators = []
+    for file in create_files(state['folder']):
+        processor.load_file(file)
+        indicators.append(processor.get_indicator())
+    state['indicators'] = indicators
+
+
+def stage_process(state):
+    for indicator in state['indicators']:
+        indicator.df = process_indicator_df(indicator)
+
+
+def stage_derive(state):
+    state['outputs'] = IndicatorGraph(INSTRUCTIONS).outputs(state['indicators'])
+
+
+def stage_assemble(state):
+    builder = MasterDfBuilder()
+    for indicator in state['outputs']:
+        builder.add_indicator(indicator)
+    state['master_df'] = builder.build()
+
+
+def stage_save(state):
+    save_master_df_to_parquet(state['master_df'], state['folder'])
+
+
+STAGES = [
+    ('extract', stage_extract),
+    ('parse', stage_parse),
+    ('process', stage_process),
+    ('derive', stage_derive),
+    ('assemble', stage_assemble),
+    ('save', stage_save),
+]
+
+# ------------------------------------- < ------------------------------------ #
+
+
+# ---------------------------------- running ---------------------------------- #
+
+def run_stages(archive, memory=False) -> dict:
+    """
+    Run all stages once on an archive.
+
+    Args:
+        archive (str): Path of the zip file.
+        memory (bool): Measure the peak of traced allocations of every stage;
+            tracing slows stages down, so times of such a run are not used.
+
+    Returns:
+        dict: Stage name -> seconds, or peak MiB if memory is True.
+    """
+    results = {}
+    folder = tempfile.mkdtemp(prefix='bench_pipeline_')
+    state = {'archive': archive, 'folder': folder}
+
+    if memory:
+        tracemalloc.start()
+    try:
+        for name, stage in STAGES:
+            if memory:
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+                stage(state)
+                results[name] = (tracemalloc.get_traced_memory()[1] - baseline) / 1024 ** 2
+            else:
+                start = time.perf_counter()
+                stage(state)
+                results[name] = time.perf_counter() - start
+    finally:
+        if memory:
+            tracemalloc.stop()
+        shutil.rmtree(folder, ignore_errors=True)
+
+    results['total'] = sum(results.values()) if not memory else max(results.values())
+    return results
+
+
+def benchmark(archive, repeat=3, memory=True) -> dict:
+    # best time of repeat runs, memory from one extra traced run
+    runs = [run_stages(archive) for _ in range(repeat)]
+    result = {'seconds': {name: min(run[name] for run in runs) for name in runs[0]}}
+    if memory:
+        result['peak_mib'] = run_stages(archive, memory=True)
+    return result
+
+# ------------------------------------- < ------------------------------------ #
+
+
+# ---------------------------------- history ---------------------------------- #
+
+def git_commit() -> dict:
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {'commit': git('rev-parse', '--short', 'HEAD'), 'dirty': bool(git('status', '--porcelain', '--untracked-files=no'))}
+
+
+def read_history(history_path) -> list:
+    if not os.path.exists(history_path):
+        return []
+    with open(history_path, encoding='utf-8') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def append_history(history_path, record):
+    with open(history_path, 'a', encoding='utf-8') as file:
+        file.write(json.dumps(record) + '\n')
+
+
+def regressions(record, history, threshold, baseline_runs=5) -> list:
+    """
+    Compare a run with the median of recent runs with the same parameters.
+
+    Args:
+        record (dict): The run.
+        history (list): Earlier runs, oldest first.
+        threshold (float): Allowed relative increase, e.g. 0.2 for 20 %.
+        baseline_runs (int): Number of recent runs in the baseline.
+
+    Returns:
+        list: (metric, stage, baseline, current) of every regression.
+    """
+    previous = [run for run in history if run['params'] == record['params']][-baseline_runs:]
+    if not previous:
+        return []
+
+    found = []
+    for metric, minimum in (('seconds', MIN_SECONDS), ('peak_mib', MIN_MIB)):
+        for stage, current in record.get(metric, {}).items():
+            values = [run[metric][stage] for run in previous if stage in run.get(metric, {})]
+            if not values:
+                continue
+            baseline = statistics.median(values)
+            if current > baseline * (1 + threshold) and current - baseline > minimum:
+                found.append((metric, stage, baseline, current))
+    return found
+
+# ------------------------------------- < ------------------------------------ #
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark pipeline stages on a synthetic archive.')
+    parser.add_argument('--indicators', type=int, default=14)
+    parser.add_argument('--granularity', choices=GRANULARITIES, default='voivodeship')
+    parser.add_argument('--first-year', type=int, default=2002)
+    parser.add_argument('--last-year', type=int, default=2021)
+    parser.add_argument('--archive', help='benchmark this archive instead of generating one')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true', help='skip the traced memory run')
+    parser.add_argument('--history', default=HISTORY_PATH)
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed relative increase over the baseline')
+    parser.add_argument('--baseline-runs', type=int, default=5)
+    parser.add_argument('--no-record', action='store_true', help="don't append the result to the history")
+    args = parser.parse_args()
+
+    if args.archive:
+        archive, params = args.archive, {'archive': os.path.basename(args.archive)}
+    else:
+        params = {
+            'indicators': args.indicators,
+            'granularity': args.granularity,
+            'years': [args.first_year, args.last_year],
+        }
+        archive = os.path.join(tempfile.gettempdir(), 'bench_pipeline_{indicators}_{granularity}_{years[0]}_{years[1]}.zip'.format(**params))
+        if not os.path.exists(archive):
+            start = time.perf_counter()
+            generate_archive(archive, args.indicators, args.granularity, args.first_year, args.last_year)
+            print(f"archive generated in {time.perf_counter() - start:.1f} s: {archive}")
+
+    result = benchmark(archive, args.repeat, not args.no_memory)
+    record = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        **git_commit(),
+        'params': params,
+        **result,
+    }
+
+    history = read_history(args.history)
+    found = regressions(record, history, args.threshold, args.baseline_runs)
+
+    print(f"\n{'stage':<10}{'seconds':>10}{'peak MiB':>10}")
+    for stage, seconds in record['seconds'].items():
+        peak = record.get('peak_mib', {}).get(stage)
+        print(f"{stage:<10}{seconds:>10.3f}{peak:>10.1f}" if peak is not None else f"{stage:<10}{seconds:>10.3f}")
+
+    if not args.no_record:
+        append_history(args.history, record)
+
+    if found:
+        print(f"\nregressions over the median of the last {args.baseline_runs} runs (+{args.threshold:.0%}):")
+        for metric, stage, baseline, current in found:
+            print(f"  {stage} {metric}: {baseline:.3f} -> {current:.3f}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
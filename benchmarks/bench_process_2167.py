@@ -0,0 +1,114 @@
+# benchmark the 2167 transform (mean mother's age) against the previous implementation
+# python -m benchmarks.bench_process_2167 [--regions 2477] [--years 20] [--repeat 3]
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from processing.indicator.df.processor import BASIC_DATAFRAME_PROCESSING_CONFIG, compact_df
+from processing.indicator.df.transforms import transform_plan
+
+
+# ------------------------------ previous version ----------------------------- #
+
+def process_2167_previous(df):
+    """
+    IndicatorProcessor.process_2167 before the single-pass rewrite, kept for comparison.
+    """
+    df["Wiek matki"] = df["Wiek matki"].replace("12 i mniej", 12)
+    df["Wiek matki"] = df["Wiek matki"].replace("50 i więcej", 50)
+    df["Wiek matki"] = df["Wiek matki"].astype(int)
+    df = df.drop(columns=["Jednostka miary", "Atrybut"])
+    df["Suma urodzeń"] = df.groupby(["Code", "Year"], observed=True)["Value"].transform("sum")
+    df["odsetek urodzeń w danym wieku matki"] = df["Value"] / df["Suma urodzeń"]
+    df["Value"] = df["odsetek urodzeń w danym wieku matki"] * df["Wiek matki"]
+    df["Indicator"] = "Średni wiek matki"
+    df = df.groupby(['Code', 'Name', 'Year', 'Indicator', 'Indicator code'], observed=True)['Value'].sum().reset_index()
+    return df
+
+# ------------------------------------- < ------------------------------------ #
+
+
+# ------------------------------- synthetic data ------------------------------ #
+
+def age_buckets() -> list:
+    # every bucket of the export: '12 i mniej', 13 ... 49, '50 i więcej'
+    return ["12 i mniej"] + [str(age) for age in range(13, 50)] + ["50 i więcej"]
+
+
+def synthetic_2167(regions=2477, years=20, seed=0) -> pd.DataFrame:
+    """
+    Create a 2167 df after general processing, one row per region, age bucket and year.
+
+    Args:
+        regions (int): Number of regions, 2477 is roughly the number of gminas.
+        years (int): Number of years, starting in 2002.
+        seed (int): Random seed.
+
+    Returns:
+        pd.DataFrame: The df.
+    """
+    rng = np.random.default_rng(seed)
+    ages = age_buckets()
+
+    codes = np.char.add((np.arange(regions) * 10 + 200000).astype(str), '')
+    n_rows = regions * len(ages) * years
+
+    df = pd.DataFrame({
+        'Code': np.repeat(codes, len(ages) * years),
+        'Name': np.repeat(np.char.add('GMINA ', codes), len(ages) * years),
+        'Wiek matki': np.tile(np.repeat(ages, years), regions),
+        'Year': np.tile(np.arange(2002, 2002 + years), regions * len(ages)),
+        'Value': rng.poisson(20, n_rows).astype(float),
+        'Jednostka miary': np.nan,
+        'Atrybut': '',
+        'Indicator': 'Urodzenia żywe wg pojedynczych roczników wieku matki',
+        'Indicator code': '2167',
+    })
+
+    # some missing values, as '-' in the export
+    df.loc[rng.random(n_rows) < 0.01, 'Value'] = np.nan
+
+    if 'compact' in BASIC_DATAFRAME_PROCESSING_CONFIG:
+        df = compact_df(df, **BASIC_DATAFRAME_PROCESSING_CONFIG['compact'])
+
+    return df
+
+# ------------------------------------- < ------------------------------------ #
+
+
+def best_time(function, df, repeat) -> tuple:
+    times = []
+    for _ in range(repeat):
+        df_copy = df.copy()
+        start = time.perf_counter()
+        result = function(df_copy)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the 2167 transform.')
+    parser.add_argument('--regions', type=int, default=2477)
+    parser.add_argument('--years', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    df = synthetic_2167(args.regions, args.years)
+    print(f"rows: {len(df)}, regions: {args.regions}, years: {args.years}, age buckets: {len(age_buckets())}")
+
+    previous_time, previous = best_time(process_2167_previous, df, args.repeat)
+    current_time, current = best_time(transform_plan('2167'), df, args.repeat)
+
+    # same groups in the same order, same values
+    assert previous[['Code', 'Year']].astype(str).equals(current[['Code', 'Year']].astype(str))
+    assert np.allclose(previous['Value'], current['Value'])
+
+    print(f"previous: {previous_time:.3f} s")
+    print(f"current:  {current_time:.3f} s ({previous_time / current_time:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# benchmark loading export workbooks with the single-pass reader against the previous reads
+# python -m benchmarks.bench_read_workbook [zip] [--repeat 3]
+
+import argparse
+import io
+import os
+import time
+
+import pandas as pd
+
+from paths import paths
+from processing.excel import ExcelFile, ExcelFileProcessor, metadata_from_file_name
+from processing.zip.manage_files import ZipFileManager
+
+
+# ------------------------------ previous version ----------------------------- #
+
+def read_workbook_previous(excel_file) -> tuple:
+    """
+    ExcelFileProcessor.get_indicator before read_workbook, kept for comparison.
+
+    Sheet 0 is parsed for the name, sheet 1 once for the years and once for the values.
+    """
+    na_values = excel_file.NA_VALUES
+    name = pd.read_excel(excel_file.get_source(), sheet_name=0, na_values=na_values, header=None).iloc[4, 1]
+    years = pd.read_excel(excel_file.get_source(), sheet_name=1, na_values=na_values)['Rok'].unique().tolist()
+    df = pd.read_excel(excel_file.get_source(), sheet_name=1, na_values=na_values)
+    return name, years, df
+
+
+def load_workbook_previous(excel_file) -> tuple:
+    # load_file read the indicator, excel_file_data_to_indicator read it again with get_indicator
+    read_workbook_previous(excel_file)
+    return read_workbook_previous(excel_file)
+
+# ------------------------------------- < ------------------------------------ #
+
+
+def load_workbook_current(excel_file) -> tuple:
+    # loading the file reads the workbook once and keeps the indicator on it
+    ExcelFileProcessor(excel_file)
+    indicator = excel_file.get_indicator()
+    return indicator.name, indicator.years, indicator.df
+
+
+def best_time(function, member_name, data, repeat) -> tuple:
+    times = []
+    for _ in range(repeat):
+        excel_file = ExcelFile(member_name, io.BytesIO(data))
+        excel_file.set_metadata(metadata_from_file_name(os.path.basename(member_name)))
+        start = time.perf_counter()
+        result = function(excel_file)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark reading export workbooks.')
+    parser.add_argument('zip_path', nargs='?', default=os.path.join(paths.input_data_path, 'data_original.zip'))
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'workbook':<52}{'read s':>9}{'load s':>9}{'current s':>12}{'read':>7}{'load':>7}")
+    read_total = previous_total = current_total = 0.0
+    for member_name, source in ZipFileManager(args.zip_path).iter_members('.xlsx'):
+        data = source.getvalue()
+        read_time, _ = best_time(read_workbook_previous, member_name, data, args.repeat)
+        previous_time, previous = best_time(load_workbook_previous, member_name, data, args.repeat)
+        current_time, current = best_time(load_workbook_current, member_name, data, args.repeat)
+
+        # same name, years and values
+        assert previous[0] == current[0] and previous[1] == current[1]
+        pd.testing.assert_frame_equal(previous[2], current[2])
+
+        read_total += read_time
+        previous_total += previous_time
+        current_total += current_time
+        print(f"{os.path.basename(member_name):<52}{read_time:>9.3f}{previous_time:>9.3f}{current_time:>12.3f}"
+              f"{read_time / current_time:>6.1f}x{previous_time / current_time:>6.1f}x")
+
+    # read: one get_indicator call before, load: the whole previous load path (two calls)
+    print(f"{'total':<52}{read_total:>9.3f}{previous_total:>9.3f}{current_total:>12.3f}"
+          f"{read_total / current_total:>6.1f}x{previous_total / current_total:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
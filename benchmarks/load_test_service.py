@@ -0,0 +1,98 @@
+# load test of the HTTP query service on localhost
+# python -m service &  then  python -m benchmarks.load_test_service [--concurrency 32] [--duration 10]
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import numpy as np
+
+
+async def request(reader, writer, target, headers=None) -> tuple:
+    lines = [f'GET {target} HTTP/1.1', 'Host: localhost']
+    lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    response_headers = {}
+    while (line := await reader.readline()) not in (b'\r\n', b''):
+        name, _, value = line.decode('latin-1').partition(':')
+        response_headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(response_headers.get('content-length', 0)))
+    return status, response_headers, body
+
+
+async def discover_targets(host, port, formats) -> list:
+    # a mix of indicator slices, series and cross sections of the served data
+    reader, writer = await asyncio.open_connection(host, port)
+    _, _, body = await request(reader, writer, '/indicators')
+    targets = []
+    for indicator in json.loads(body):
+        code = indicator['Indicator code']
+        _, _, body = await request(reader, writer, f'/indicators/{code}')
+        rows = json.loads(body)
+        if not rows:
+            continue
+        row = random.choice(rows)
+        for response_format in formats:
+            targets += [
+                f'/indicators/{code}?format={response_format}',
+                f"/indicators/{code}?codes={row['Code']}&from={row['Year'] - 3}&to={row['Year']}&format={response_format}",
+                f"/indicators/{code}/regions/{row['Code']}?format={response_format}",
+                f"/indicators/{code}/years/{row['Year']}?format={response_format}",
+            ]
+    writer.close()
+    return targets
+
+
+async def client(host, port, targets, deadline, latencies, statuses, revalidate):
+    reader, writer = await asyncio.open_connection(host, port)
+    etag = None
+    while time.perf_counter() < deadline:
+        target = random.choice(targets)
+        headers = {'If-None-Match': etag} if revalidate and etag else None
+        start = time.perf_counter()
+        status, response_headers, _ = await request(reader, writer, target, headers)
+        latencies.append(time.perf_counter() - start)
+        statuses[status] = statuses.get(status, 0) + 1
+        etag = response_headers.get('etag')
+    writer.close()
+
+
+async def run(args):
+    targets = await discover_targets(args.host, args.port, args.formats.split(','))
+    print(f'{len(targets)} distinct requests, {args.concurrency} connections, {args.duration} s')
+
+    latencies, statuses = [], {}
+    start = time.perf_counter()
+    deadline = start + args.duration
+    await asyncio.gather(*(
+        client(args.host, args.port, targets, deadline, latencies, statuses, args.revalidate)
+        for _ in range(args.concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array(latencies) * 1000
+    print(f'requests:   {len(latencies)} {statuses}')
+    print(f'throughput: {len(latencies) / elapsed:.0f} req/s')
+    print(f'latency:    p50 {np.percentile(latencies, 50):.2f} ms, p99 {np.percentile(latencies, 99):.2f} ms, max {latencies.max():.2f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the HTTP query service.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--formats', default='json,csv,arrow')
+    parser.add_argument('--revalidate', action='store_true', help='send If-None-Match with the last ETag')
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+# generate a synthetic BDL export archive of any size
+# python -m benchmarks.synthetic_archive <zip path> [--indicators 14] [--granularity voivodeship] [--first-year 2002] [--last-year 2021]
+
+import argparse
+import io
+import os
+import zipfile
+from datetime import datetime, timedelta
+
+import numpy as np
+import openpyxl
+
+from processing.excel.metadata import metadata_from_file_name
+
+# ---------------------------------- templates --------------------------------- #
+
+AGES_OF_MOTHER = ["12 i mniej"] + [str(age) for age in range(13, 50)] + ["50 i więcej"]
+
+# indicators with transforms or instructions first -> small archives exercise them too
+INDICATOR_TEMPLATES = [
+    {
+        'category': 'LUDN', 'code': '2167', 'unit': '-', 'values': 'count',
+        'title': 'Urodzenia żywe wg pojedynczych roczników wieku matki',
+        'dimensions': {'Wiek matki': AGES_OF_MOTHER},
+    },
+    {
+        'category': 'LUDN', 'code': '1869', 'unit': 'zł', 'values': 'amount',
+        'title': 'Przeciętny miesięczny dochód rozporządzalny na 1 osobę',
+        'dimensions': {'Rodzaje dochodów': ['dochód do dyspozycji']},
+    },
+    {
+        'category': 'RYNE', 'code': '3787', 'unit': 'zł', 'values': 'amount',
+        'title': 'Średnia cena lokali mieszkalnych sprzedanych w ramach transakcji rynkowych',
+        'dimensions': {'Transakcje rynkowe': ['ogółem'], 'Powierzchnia użytkowa lokali mieszkalnych': ['ogółem']},
+    },
+    {
+        'category': 'LUDN', 'code': '3923', 'unit': '-', 'values': 'count',
+        'title': 'Urodzenia żywe małżeńskie/pozamałżeńskie według płci w podziale na miasta i wieś',
+        'dimensions': {
+            'Małżeńskie/pozamałżeńskie': ['urodzenia żywe małżeńskie', 'urodzenia żywe pozamałżeńskie'],
+            'Miasta / wieś': ['ogółem'],
+            'Płeć dziecka': ['ogółem'],
+        },
+    },
+    {
+        'category': 'RYNE', 'code': '4112', 'unit': '%', 'values': 'rate',
+        'title': 'Wskaźnik zatrudnienia wg wieku i płci',
+        'dimensions': {'Grupy wieku': ['15-29'], 'Płeć': ['ogółem', 'mężczyźni', 'kobiety'], 'Wartość i precyzja': ['wartość liczbowa']},
+    },
+    {
+        'category': 'LUDN', 'code': '3895', 'unit': 'lata', 'values': 'rate',
+        'title': 'Przeciętne dalsze trwanie życia',
+        'dimensions': {'Płeć': ['mężczyźni', 'kobiety'], 'Wiek': ['0']},
+    },
+    {
+        'category': 'LUDN', 'code': '3430', 'unit': '-', 'values': 'rate', 'alternative_name': 'malzenstwa_1000',
+        'title': 'Małżeństwa na 1000 ludności wg lokalizacji',
+        'dimensions': {'Ogółem': ['ogółem']},
+    },
+]
+
+# fillers after the templates, one dimension each
+FILLER_CATEGORIES = ['LUDN', 'RYNE', 'OCHR', 'GOSP', 'EDUK']
+FILLER_DIMENSIONS = [
+    {'Ogółem': ['ogółem']},
+    {'Płeć': ['ogółem', 'mężczyźni', 'kobiety']},
+    {'Lokalizacja': ['ogółem', 'miasta', 'wieś']},
+]
+
+VOIVODESHIPS = [
+    'DOLNOŚLĄSKIE', 'KUJAWSKO-POMORSKIE', 'LUBELSKIE', 'LUBUSKIE', 'ŁÓDZKIE', 'MAŁOPOLSKIE',
+    'MAZOWIECKIE', 'OPOLSKIE', 'PODKARPACKIE', 'PODLASKIE', 'POMORSKIE', 'ŚLĄSKIE',
+    'ŚWIĘTOKRZYSKIE', 'WARMIŃSKO-MAZURSKIE', 'WIELKOPOLSKIE', 'ZACHODNIOPOMORSKIE',
+]
+
+GRANULARITIES = ('voivodeship', 'powiat', 'gmina')
+
+# ------------------------------------- < ------------------------------------ #
+
+
+# ----------------------------------- units ----------------------------------- #
+
+def units(granularity='voivodeship', powiats=24, gminas=6) -> list:
+    """
+    Create TERYT units of a level, coded like the 'Kod' column of exports.
+
+    Args:
+        granularity (str): 'voivodeship' (16 units), 'powiat' or 'gmina'.
+        powiats (int): Powiats per voivodeship.
+        gminas (int): Gminas per powiat.
+
+    Returns:
+        list: (code, name) pairs.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity {granularity}, use one of {GRANULARITIES}.")
+
+    result = []
+    for i, voivodeship in enumerate(VOIVODESHIPS):
+        voivodeship_code = f'{2 * (i + 1):02d}'
+        if granularity == 'voivodeship':
+            result.append((f'{voivodeship_code}00000', voivodeship))
+            continue
+        for powiat in range(1, powiats + 1):
+            powiat_code = f'{voivodeship_code}{powiat:02d}'
+            if granularity == 'powiat':
+                result.append((f'{powiat_code}000', f'Powiat {powiat_code}'))
+                continue
+            for gmina in range(1, gminas + 1):
+                # gmina type cycles through urban, rural and mixed
+                code = f'{powiat_code}{gmina:02d}{(gmina - 1) % 3 + 1}'
+                result.append((code, f'Gmina {code}'))
+    return result
+
+# ------------------------------------- < ------------------------------------ #
+
+
+# --------------------------------- indicators --------------------------------- #
+
+def indicator_templates(count) -> list:
+    templates = INDICATOR_TEMPLATES[:count]
+    for i in range(count - len(templates)):
+        code = str(5000 + i)
+        templates.append({
+            'category': FILLER_CATEGORIES[i % len(FILLER_CATEGORIES)], 'code': code, 'unit': '%', 'values': 'rate',
+            'title': f'Wskaźnik syntetyczny {code}',
+            'dimensions': FILLER_DIMENSIONS[i % len(FILLER_DIMENSIONS)],
+        })
+    return templates
+
+
+def file_name(template, timestamp) -> str:
+    # matches the pattern of metadata_from_file_name, e.g. LUDN_2167_XREL_20230425205039.xlsx
+    name = f"{template['category']}_{template['code']}_XREL_{timestamp:%Y%m%d%H%M%S}"
+    if 'alternative_name' in template:
+        name += f"_{template['alternative_name']}"
+    return name + '.xlsx'
+
+
+def sample_values(kind, size, rng) -> np.ndarray:
+    if kind == 'count':
+        return rng.integers(0, 2000, size).astype(float)
+    if kind == 'amount':
+        return np.round(rng.uniform(500, 9000, size), 2)
+    return np.round(rng.uniform(1, 100, size), 1)
+
+
+def workbook_bytes(template, unit_list, years, rng, missing=0.01) -> bytes:
+    """
+    Create an export workbook of one indicator.
+
+    Sheet 0 has the title in B5; sheet 1 has Kod, Nazwa, the dimensions, Rok,
+    Wartosc, Jednostka miary and Atrybut, one row per unit, dimension values
+    and year. Codes and years are stored as text, missing values as '-'.
+
+    Args:
+        template (dict): The indicator template.
+        unit_list (list): (code, name) pairs.
+        years (list): Years.
+        rng (np.random.Generator): Random values.
+        missing (float): Share of missing values.
+
+    Returns:
+        bytes: The xlsx file.
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+
+    description = workbook.create_sheet('OPIS')
+    description.append(['Bank Danych Lokalnych'])
+    description.append([None])
+    description.append(['Kategoria', template['category']])
+    description.append(['Grupa', template['code']])
+    description.append(['Podgrupa', template['title']])
+
+    data = workbook.create_sheet('TABLICA')
+    dimensions = template['dimensions']
+    data.append(['Kod', 'Nazwa', *dimensions, 'Rok', 'Wartosc', 'Jednostka miary', 'Atrybut'])
+
+    combinations = [[]]
+    for values in dimensions.values():
+        combinations = [combination + [value] for combination in combinations for value in values]
+
+    n_rows = len(unit_list) * len(combinations) * len(years)
+    values = sample_values(template['values'], n_rows, rng)
+    is_missing = rng.random(n_rows) < missing
+
+    row = 0
+    for code, name in unit_list:
+        for combination in combinations:
+            for year in years:
+                value = '-' if is_missing[row] else values[row].item()
+                data.append([code, name, *combination, str(year), value, template['unit'], ' '])
+                row += 1
+
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def generate_archive(zip_path, indicators=14, granularity='voivodeship', first_year=2002, last_year=2021,
+                     powiats=24, gminas=6, seed=0) -> list:
+    """
+    Generate a synthetic export archive.
+
+    Args:
+        zip_path (str): Path of the zip file.
+        indicators (int): Number of indicators; the first ones are the templates
+            with transforms and instructions, the rest are fillers.
+        granularity (str): 'voivodeship', 'powiat' or 'gmina'.
+        first_year (int): First year.
+        last_year (int): Last year.
+        powiats (int): Powiats per voivodeship.
+        gminas (int): Gminas per powiat.
+        seed (int): Random seed.
+
+    Returns:
+        list: Names of the members.
+    """
+    rng = np.random.default_rng(seed)
+    unit_list = units(granularity, powiats, gminas)
+    years = list(range(first_year, last_year + 1))
+    timestamp = datetime(2023, 4, 25, 12, 0, 0)
+
+    os.makedirs(os.path.dirname(os.path.abspath(zip_path)), exist_ok=True)
+    names = []
+    with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_DEFLATED) as zip_ref:
+        for i, template in enumerate(indicator_templates(indicators)):
+            name = file_name(template, timestamp + timedelta(minutes=7 * i))
+            zip_ref.writestr(name, workbook_bytes(template, unit_list, years, rng))
+            names.append(name)
+
+    return names
+
+
+def archive_subset(source, target, indicator_codes) -> str:
+    # the workbooks of some indicators of an archive, like an incremental export
+    with zipfile.ZipFile(source) as source_zip, zipfile.ZipFile(target, 'w', compression=zipfile.ZIP_DEFLATED) as target_zip:
+        for name in source_zip.namelist():
+            if metadata_from_file_name(os.path.basename(name)).indicator_code in indicator_codes:
+                target_zip.writestr(name, source_zip.read(name))
+    return target
+
+# ------------------------------------- < ------------------------------------ #
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic BDL export archive.')
+    parser.add_argument('zip_path')
+    parser.add_argument('--indicators', type=int, default=14)
+    parser.add_argument('--granularity', choices=GRANULARITIES, default='voivodeship')
+    parser.add_argument('--first-year', type=int, default=2002)
+    parser.add_argument('--last-year', type=int, default=2021)
+    parser.add_argument('--powiats', type=int, default=24, help='powiats per voivodeship')
+    parser.add_argument('--gminas', type=int, default=6, help='gminas per powiat')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    names = generate_archive(args.zip_path, args.indicators, args.granularity, args.first_year, args.last_year,
+                             args.powiats, args.gminas, args.seed)
+    print(f"{len(names)} workbooks written to {args.zip_path}")
+
+
+if __name__ == '__main__':
+    main()
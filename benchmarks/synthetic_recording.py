@@ -0,0 +1,189 @@
+# record BDL API responses of an export archive, for the replay stub server
+# python -m benchmarks.synthetic_recording <recording folder> [--zip-path archive.zip] [--indicators 14] [--granularity voivodeship]
+# without --zip-path a synthetic archive is recorded; serve it with python -m processing.bdl.stub <recording folder>
+
+import argparse
+import itertools
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from processing.bdl.client import ResponseDiskCache, request_target
+from processing.excel.processor import ExcelFile, ExcelFileProcessor
+from processing.zip.manage_files import ZipFileManager
+
+from .synthetic_archive import GRANULARITIES, generate_archive
+
+# BDL unit levels of the archive granularities
+UNIT_LEVELS = {'voivodeship': 2, 'powiat': 5, 'gmina': 6}
+
+# ids of the variables of an archive are numbered from here
+FIRST_VARIABLE_ID = 1000
+
+# columns of the 2nd sheet that are not dimensions
+SHEET_COLUMNS = ['Kod', 'Nazwa', 'Rok', 'Wartosc', 'Jednostka miary', 'Atrybut']
+
+
+# ---------------------------------- archive ---------------------------------- #
+
+def read_archive(zip_path) -> list:
+    # newest export of every indicator code, read like the ingest command does
+    indicators = {}
+    for member_name, source in ZipFileManager(zip_path).iter_members('.xlsx'):
+        # loading the file reads the workbook once and keeps the indicator on it
+        excel_file = ExcelFile(member_name, source)
+        ExcelFileProcessor(excel_file)
+        indicator = excel_file.get_indicator()
+
+        previous = indicators.get(indicator.code)
+        if previous is None or indicator.timestamp > previous.timestamp:
+            indicators[indicator.code] = indicator
+    return sorted(indicators.values(), key=lambda indicator: indicator.code)
+
+
+def unit_id(code) -> str:
+    # 'Kod' of an export -> 12-digit BDL unit id, the inverse of processing.bdl.unit_code
+    code = str(code).zfill(7)
+    return f'00{code[:2]}000{code[2:]}'
+
+
+def json_value(value):
+    # numpy scalars of a DataFrame -> JSON, missing values -> null
+    if pd.isna(value):
+        return None
+    return value.item() if isinstance(value, np.generic) else value
+
+# ------------------------------------- < ------------------------------------ #
+
+
+# --------------------------------- recording --------------------------------- #
+
+class Recording:
+    """
+    Responses of the endpoints BDLClient uses, written as a ResponseDiskCache.
+
+    Args:
+        recording_path (str): Folder of the recording.
+        page_size (int): page-size of the client that replays it.
+        lang (str): lang of the client that replays it.
+    """
+
+    def __init__(self, recording_path, page_size=100, lang='pl'):
+        self.cache = ResponseDiskCache(recording_path)
+        self.page_size = page_size
+        self.lang = lang
+
+    def put(self, path, body, **params):
+        self.cache.put(request_target(path, {'format': 'json', 'lang': self.lang, **params}), body)
+
+    def put_pages(self, path, results, fields=None, **params):
+        # every page has totalRecords and fields; at least one page, an empty one without results
+        for page, start in enumerate(range(0, max(len(results), 1), self.page_size)):
+            body = {'totalRecords': len(results), **(fields or {}), 'results': results[start:start + self.page_size]}
+            self.put(path, body, **params, page=page, **{'page-size': self.page_size})
+
+    def put_indicator(self, indicator, variable_ids, attribute_ids, unit_level):
+        """
+        Record the subject, variables and data of an indicator read from a workbook.
+
+        Every combination of dimension values is a variable, like in BDL; its
+        n1, n2, ... are the dimension values in the order of the sheet columns.
+
+        Args:
+            indicator (Indicator): The indicator, as read_workbook returns it.
+            variable_ids (iterator): Ids for the variables.
+            attribute_ids (dict): 'Atrybut' symbol -> attribute id.
+            unit_level (int): BDL unit level of the units in the workbook.
+        """
+        subject_id = f'P{indicator.code}'
+        df = indicator.df
+        dimensions = [column for column in df.columns if column not in SHEET_COLUMNS]
+        self.put(f'/subjects/{subject_id}', {'id': subject_id, 'name': indicator.name, 'dimensions': dimensions})
+
+        variables = []
+        groups = df.groupby(dimensions, sort=False, dropna=False) if dimensions else [((), df)]
+        for combination, variable_df in groups:
+            combination = combination if isinstance(combination, tuple) else (combination,)
+            variable = {'id': next(variable_ids), 'subjectId': subject_id,
+                        'measureUnitName': json_value(variable_df['Jednostka miary'].iloc[0])}
+            variable.update({f'n{i + 1}': json_value(value) for i, value in enumerate(combination)})
+            variables.append(variable)
+
+            units = [
+                {
+                    'id': unit_id(code),
+                    'name': name,
+                    'values': [
+                        {'year': str(int(year)), 'val': json_value(value), 'attrId': attribute_ids[symbol]}
+                        for year, value, symbol in zip(unit_df['Rok'], unit_df['Wartosc'], unit_df['Atrybut'].astype(str))
+                    ],
+                }
+                for (code, name), unit_df in variable_df.groupby(['Kod', 'Nazwa'], sort=False)
+            ]
+            fields = {'lastUpdate': indicator.timestamp.isoformat(), 'variableId': variable['id']}
+            self.put_pages(f"/data/by-variable/{variable['id']}", units, fields, **{'unit-level': unit_level})
+
+        self.put_pages('/variables', variables, **{'subject-id': subject_id})
+
+
+def record_archive(zip_path, recording_path, unit_level=2, page_size=100, lang='pl') -> list:
+    """
+    Write the API responses with the data of an export archive.
+
+    A BDLClient with the same page_size and lang replaying the recording
+    (see processing.bdl.ReplayServer) gets the indicators of the archive,
+    for every year, at unit_level.
+
+    Args:
+        zip_path (str): The archive.
+        recording_path (str): Folder of the recording.
+        unit_level (int): BDL unit level of the units in the archive, 2 = voivodeships.
+        page_size (int): Results per page.
+        lang (str): 'pl' or 'en'.
+
+    Returns:
+        list: Indicator codes in the recording.
+    """
+    indicators = read_archive(zip_path)
+    recording = Recording(recording_path, page_size, lang)
+
+    # ' ' in the 'Atrybut' column is no attribute
+    symbols = sorted({symbol for indicator in indicators for symbol in indicator.df['Atrybut'].astype(str)})
+    attribute_ids = {symbol: i + 1 for i, symbol in enumerate(symbols)}
+    recording.put_pages('/attributes', [{'id': i, 'symbol': symbol.strip()} for symbol, i in attribute_ids.items()])
+
+    variable_ids = itertools.count(FIRST_VARIABLE_ID)
+    for indicator in indicators:
+        recording.put_indicator(indicator, variable_ids, attribute_ids, unit_level)
+
+    return [indicator.code for indicator in indicators]
+
+# ------------------------------------- < ------------------------------------ #
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record BDL API responses of an export archive.')
+    parser.add_argument('recording_path')
+    parser.add_argument('--zip-path', help='archive to record, a synthetic one if not given')
+    parser.add_argument('--indicators', type=int, default=14)
+    parser.add_argument('--granularity', choices=GRANULARITIES, default='voivodeship')
+    parser.add_argument('--first-year', type=int, default=2002)
+    parser.add_argument('--last-year', type=int, default=2021)
+    parser.add_argument('--page-size', type=int, default=100)
+    args = parser.parse_args()
+
+    if args.zip_path is not None:
+        indicator_codes = record_archive(args.zip_path, args.recording_path, UNIT_LEVELS[args.granularity], args.page_size)
+    else:
+        with tempfile.TemporaryDirectory() as folder:
+            zip_path = os.path.join(folder, 'synthetic.zip')
+            generate_archive(zip_path, args.indicators, args.granularity, args.first_year, args.last_year)
+            indicator_codes = record_archive(zip_path, args.recording_path, UNIT_LEVELS[args.granularity], args.page_size)
+
+    print(f"{len(indicator_codes)} indicators recorded in {args.recording_path}, unit level {UNIT_LEVELS[args.granularity]}")
+
+
+if __name__ == '__main__':
+    main()
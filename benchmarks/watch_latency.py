@@ -0,0 +1,126 @@
+# end-to-end latency of the watch-folder daemon, from archive arrival to published data
+# python -m benchmarks.watch_latency [--archives 4] [--interval 1] [--workers 2] [--settle 0.5] [--polling]
+# exits with 1 if an archive is not published within the timeout
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from processing.store import read_master_df
+from processing.watch import PUBLISH_FILE, IngestDaemon
+
+from .synthetic_archive import GRANULARITIES, generate_archive
+
+
+def drop_archive(source, target, parts=4, pause=0.1) -> float:
+    """
+    Copy an archive into the watched folder in parts, like a slow upload.
+
+    Returns:
+        float: Time the last byte was written.
+    """
+    with open(source, 'rb') as file:
+        data = file.read()
+
+    size = -(-len(data) // parts)
+    with open(target, 'wb') as file:
+        for start in range(0, len(data), size):
+            file.write(data[start:start + size])
+            file.flush()
+            time.sleep(pause)
+    return time.time()
+
+
+def published_archives(output_path) -> dict:
+    try:
+        with open(os.path.join(output_path, PUBLISH_FILE), encoding='utf-8') as file:
+            return json.load(file)['archives']
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure latency of the watch-folder daemon.')
+    parser.add_argument('--archives', type=int, default=4)
+    parser.add_argument('--interval', type=float, default=1.0, help='seconds between dropped archives')
+    parser.add_argument('--indicators', type=int, default=14)
+    parser.add_argument('--granularity', choices=GRANULARITIES, default='voivodeship')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--settle', type=float, default=0.5)
+    parser.add_argument('--poll-interval', type=float, default=1.0)
+    parser.add_argument('--polling', action='store_true', help="scan the folder only, don't use inotify")
+    parser.add_argument('--timeout', type=float, default=120)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+
+    root = tempfile.mkdtemp(prefix='watch_latency_')
+    staging, watch_path, output_path, store_path = (os.path.join(root, name) for name in ('staging', 'watch', 'output', 'store'))
+    os.makedirs(staging)
+
+    try:
+        # archives differ by seed -> every one changes the store
+        names = [f'export_{i:02d}.zip' for i in range(args.archives)]
+        for i, name in enumerate(names):
+            generate_archive(os.path.join(staging, name), args.indicators, args.granularity, seed=i)
+
+        daemon = IngestDaemon(watch_path, output_path, store_path, args.workers, args.settle, args.poll_interval,
+                              use_inotify=not args.polling, work_path=os.path.join(root, 'work'))
+        daemon_thread = threading.Thread(target=daemon.run)
+        daemon_thread.start()
+
+        arrived = {}
+
+        def drop_all():
+            for name in names:
+                arrived[name] = drop_archive(os.path.join(staging, name), os.path.join(watch_path, name))
+                time.sleep(args.interval)
+
+        # the folder exists once the daemon started
+        while not os.path.isdir(watch_path):
+            time.sleep(0.01)
+        dropper = threading.Thread(target=drop_all)
+        dropper.start()
+
+        observed = {}
+        deadline = time.time() + args.timeout
+        while len(observed) < len(names) and time.time() < deadline:
+            now = time.time()
+            for name, record in published_archives(output_path).items():
+                if name not in observed and 'published_at' in record:
+                    observed[name] = now
+            time.sleep(0.01)
+
+        dropper.join()
+        daemon.stop()
+        daemon_thread.join()
+
+        print(f"\n{'archive':<16}{'latency s':>10}")
+        latencies = []
+        for name in names:
+            if name in observed:
+                latencies.append(observed[name] - arrived[name])
+                print(f"{name:<16}{latencies[-1]:>10.2f}")
+            else:
+                print(f"{name:<16}{'timeout':>10}")
+
+        if latencies:
+            print(f"\nmedian {statistics.median(latencies):.2f} s, max {max(latencies):.2f} s (settle {args.settle} s)")
+            master_df = read_master_df(output_path)
+            print(f"published: {len(master_df)} rows, {master_df['Indicator code'].nunique()} indicators")
+
+        if len(latencies) < len(names):
+            sys.exit(1)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
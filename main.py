@@ -1,13 +1,220 @@
+# command line entry point
+# python main.py ingest [zip] [--force | --reuse]
+# python main.py catalog [zip] [--refresh]
+# python main.py query <indicator code> [--codes ...] [--from 2010] [--to 2020]
+# python main.py export <file> [--indicators ...]
+# python main.py watch <folder> [--workers 2] [--settle 2]
+
 # ---------------------------------- imports --------------------------------- #
 
-# processing data
-import processing.processor as processor
+# heavy dependencies (pandas, pyarrow, openpyxl) are imported in the commands that need them
+import argparse
+import logging
+import os
+import sys
+
+from paths import paths
 
 # ---------------------------------- \imports --------------------------------- #
 
+DEFAULT_ZIP_PATH = os.path.join(paths.input_data_path, "data_original.zip")
 
-if __name__ == "__main__":
+EXPORT_FORMATS = ('csv', 'parquet', 'json')
+
+
+# --------------------------------- commands --------------------------------- #
+
+def ingest(args):
+    import processing.processor as processor
+
+    overwrite = True if args.force else False if args.reuse else None
+    try:
+        master_df = processor.main(
+            args.zip_path,
+            stream=not args.extract,
+            workers=args.workers,
+            use_cache=not args.no_cache,
+            export_csv=args.csv,
+            chunk_size=args.chunk_size,
+            report_path=args.report,
+            profile=args.profile,
+            trace_memory=args.trace_memory or None,
+            overwrite=overwrite,
+            output_path=args.output_path,
+        )
+    except FileExistsError as error:
+        sys.exit(f"{error} Use --force or --reuse.")
+
+    print(f"{len(master_df)} rows, {master_df['Indicator code'].nunique()} indicators in {args.output_path}")
+
+
+def catalog(args):
+    from processing.zip.catalog import load_catalog
+
+    # year ranges come from the parse cache, which needs the processing config -> pandas
+    cache = None
+    if args.years:
+        from processing.processor import create_parse_cache
+        cache = create_parse_cache()
+
+    entries = load_catalog(args.zip_path, refresh=args.refresh, cache=cache)
+    if args.indicators:
+        entries = [entry for entry in entries if entry.indicator_code in args.indicators]
+
+    if args.json:
+        import json
+        from dataclasses import asdict
+        json.dump([asdict(entry) for entry in entries], sys.stdout, ensure_ascii=False, indent=1)
+        print()
+        return
+
+    for entry in entries:
+        years = f"{entry.first_year}-{entry.last_year}" if entry.first_year is not None else '-'
+        print(f"{entry.category}\t{entry.indicator_code}\t{entry.timestamp}\t{entry.row_count}\t{years}\t{entry.indicator_name}")
+
+
+def read_output(args, indicator_codes=None, codes=None, years=None):
+    from processing.store import master_df_exists, read_master_df
+
+    if not master_df_exists(args.output_path):
+        sys.exit(f"No processed data in {args.output_path}, run the ingest command first.")
+    return read_master_df(args.output_path, indicator_codes=indicator_codes, codes=codes, years=years)
+
+
+def query(args):
+    years = (args.first_year, args.last_year) if args.first_year is not None or args.last_year is not None else None
+    df = read_output(args, [args.indicator_code], args.codes, years)
+    df = df.sort_values(['Code', 'Year'], ignore_index=True)
+
+    if args.format == 'csv':
+        df.to_csv(sys.stdout, index=False)
+    elif args.format == 'json':
+        print(df.to_json(orient='records', force_ascii=False))
+    else:
+        print(df.to_string(index=False) if len(df) else f"No rows of indicator {args.indicator_code}.")
+
+
+def export(args):
+    file_format = args.format or os.path.splitext(args.file_path)[1].lstrip('.').lower()
+    if file_format not in EXPORT_FORMATS:
+        sys.exit(f"Unknown export format {file_format!r}, use --format with one of {', '.join(EXPORT_FORMATS)}.")
+
+    df = read_output(args, args.indicators)
+
+    # write next to the target first -> the file is replaced in one step
+    directory = os.path.dirname(os.path.abspath(args.file_path))
+    os.makedirs(directory, exist_ok=True)
+    temporary_path = f"{args.file_path}.tmp"
 
-    df = processor.main("data/data_original.zip")
+    if file_format == 'csv':
+        df.to_csv(temporary_path, index=False)
+    elif file_format == 'parquet':
+        df.to_parquet(temporary_path, index=False)
+    else:
+        df.to_json(temporary_path, orient='records', force_ascii=False)
+    os.replace(temporary_path, args.file_path)
 
-    # ! perform analysis
\ No newline at end of file
+    print(f"{len(df)} rows exported to {args.file_path}")
+
+
+def watch(args):
+    import signal
+    from processing.watch import IngestDaemon
+
+    daemon = IngestDaemon(
+        args.watch_path,
+        args.output_path,
+        args.store_path,
+        workers=args.workers,
+        settle=args.settle,
+        poll_interval=args.poll_interval,
+        use_inotify=not args.polling,
+    )
+
+    # stop after the current loop iteration on Ctrl+C or kill
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signal_number, lambda *_: daemon.stop())
+
+    daemon.run()
+
+# ------------------------------------- < ------------------------------------ #
+
+
+# ---------------------------------- parser ---------------------------------- #
+
+def create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python main.py', description='Process BDL indicator exports.')
+    parser.add_argument('-v', '--verbose', action='store_true', help='log progress')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    ingest_parser = subparsers.add_parser('ingest', help='build the processed dataset from an export archive')
+    ingest_parser.add_argument('zip_path', nargs='?', default=DEFAULT_ZIP_PATH)
+    existing = ingest_parser.add_mutually_exclusive_group()
+    existing.add_argument('--force', action='store_true', help='rebuild the dataset if it exists')
+    existing.add_argument('--reuse', action='store_true', help='read the dataset if it exists')
+    ingest_parser.add_argument('--workers', type=int, default=1, help='processes parsing workbooks, 0 for all cores')
+    ingest_parser.add_argument('--extract', action='store_true', help='extract the archive instead of reading it in memory')
+    ingest_parser.add_argument('--no-cache', action='store_true', help="don't use the parse cache")
+    ingest_parser.add_argument('--csv', action='store_true', help='also save master_df.csv')
+    ingest_parser.add_argument('--chunk-size', type=int, help='read sheets in chunks of this many rows')
+    ingest_parser.add_argument('--report', help='save a JSON report of the pipeline stages here')
+    ingest_parser.add_argument('--profile', nargs='+', metavar='STAGE', help="profile these stages, 'all' for every stage")
+    ingest_parser.add_argument('--trace-memory', action='store_true', help='add traced memory peaks to the report')
+    ingest_parser.set_defaults(handler=ingest)
+
+    catalog_parser = subparsers.add_parser('catalog', help='list the indicators in an export archive')
+    catalog_parser.add_argument('zip_path', nargs='?', default=DEFAULT_ZIP_PATH)
+    catalog_parser.add_argument('--indicators', nargs='+', metavar='CODE', help='only these indicator codes')
+    catalog_parser.add_argument('--refresh', action='store_true', help='scan the archive again')
+    catalog_parser.add_argument('--years', action='store_true', help='add year ranges from the parse cache (slower)')
+    catalog_parser.add_argument('--json', action='store_true')
+    catalog_parser.set_defaults(handler=catalog)
+
+    query_parser = subparsers.add_parser('query', help='print the rows of an indicator')
+    query_parser.add_argument('indicator_code')
+    query_parser.add_argument('--codes', nargs='+', metavar='CODE', help='only these region codes')
+    query_parser.add_argument('--from', dest='first_year', type=int)
+    query_parser.add_argument('--to', dest='last_year', type=int)
+    query_parser.add_argument('--format', choices=('table', 'csv', 'json'), default='table')
+    query_parser.set_defaults(handler=query)
+
+    export_parser = subparsers.add_parser('export', help='write the processed data to a file')
+    export_parser.add_argument('file_path')
+    export_parser.add_argument('--format', choices=EXPORT_FORMATS, help='defaults to the file extension')
+    export_parser.add_argument('--indicators', nargs='+', metavar='CODE', help='only these indicator codes')
+    export_parser.set_defaults(handler=export)
+
+    watch_parser = subparsers.add_parser('watch', help='ingest export archives dropped into a folder')
+    watch_parser.add_argument('watch_path')
+    watch_parser.add_argument('--store-path', default=paths.store_data_path, help='folder of the versioned store')
+    watch_parser.add_argument('--workers', type=int, default=2, help='archives parsed at the same time')
+    watch_parser.add_argument('--settle', type=float, default=2.0, help='seconds an archive must stay unchanged before it is read')
+    watch_parser.add_argument('--poll-interval', type=float, default=1.0, help='seconds between scans of the folder')
+    watch_parser.add_argument('--polling', action='store_true', help="scan the folder only, don't use inotify")
+    watch_parser.set_defaults(handler=watch)
+
+    for subparser in (ingest_parser, query_parser, export_parser, watch_parser):
+        subparser.add_argument('--output-path', default=paths.output_data_path, help='folder with the processed dataset')
+
+    return parser
+
+# ------------------------------------- < ------------------------------------ #
+
+
+def main(argv=None):
+    args = create_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+    if getattr(args, 'workers', None) == 0:
+        args.workers = None
+
+    try:
+        args.handler(args)
+    except BrokenPipeError:
+        # output piped into e.g. head, which exited
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,20 +10,14 @@ class Paths:
     current_path: str = os.path.dirname(os.path.abspath(__file__))
     input_data_path: str = os.path.join(current_path, "data")
     output_data_path: str = os.path.join(input_data_path, "output")
+    cache_data_path: str = os.path.join(input_data_path, "cache")
+    api_cache_data_path: str = os.path.join(cache_data_path, "bdl")
+    store_data_path: str = os.path.join(output_data_path, "store")
+    cube_data_path: str = os.path.join(output_data_path, "cube")
     charts_path: str = os.path.join(current_path, "charts")
 
 
 # create instance of dataclass
 paths = Paths()
 
-# if folder does not exist create it function
-
-
-def create_folder(path):
-    if not os.path.exists(path):
-        os.makedirs(path)
-
-
-# create folders if they do not exist
-for path in [paths.__dict__[key] for key in paths.__dict__]:
-    create_folder(path)
\ No newline at end of file
+# folders are created by whoever writes to them, importing paths has no side effects
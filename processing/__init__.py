@@ -1,3 +1,4 @@
-from .zip import *
-from .excel import *
-from .indicator import *
\ No newline at end of file
+# submodules load on first use -> light modules (e.g. processing.zip.catalog) don't import pandas
+from .lazy import lazy_exports
+
+__getattr__ = lazy_exports(__name__, ['zip', 'excel', 'indicator', 'cache', 'instrumentation'])
@@ -0,0 +1,3 @@
+from .client import *
+from .indicators import *
+from .stub import *
@@ -0,0 +1,396 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import random
+import ssl
+import time
+from urllib.parse import urlencode, urlsplit
+
+# ---------------------------------- config ---------------------------------- #
+
+BDL_API_URL = 'https://bdl.stat.gov.pl/api/v1'
+
+# BDL quotas as (requests, seconds); a client id (X-ClientId header) raises them
+BDL_QUOTAS = {
+    'anonymous': [(5, 1), (100, 15 * 60), (1000, 12 * 3600), (10000, 7 * 24 * 3600)],
+    'registered': [(10, 1), (500, 15 * 60), (5000, 12 * 3600), (50000, 7 * 24 * 3600)],
+}
+
+# statuses worth another try
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# ------------------------------------- < ------------------------------------ #
+
+
+class HTTPStatusError(Exception):
+    def __init__(self, status, target):
+        super().__init__(f'HTTP {status} for {target}')
+        self.status = status
+        self.target = target
+
+
+def request_target(path, params=None) -> str:
+    """
+    Path with a query string in a stable order, the cache and replay key.
+
+    Args:
+        path (str): The path.
+        params (dict | list): Query parameters, lists are repeated; or (name, value) pairs.
+
+    Returns:
+        str: The target.
+    """
+    if not params:
+        return path
+    pairs = params.items() if isinstance(params, dict) else params
+    pairs = sorted(
+        (name, str(item))
+        for name, value in pairs
+        for item in (value if isinstance(value, (list, tuple)) else [value])
+    )
+    return f'{path}?{urlencode(pairs)}'
+
+
+# ------------------------------- rate limiting ------------------------------- #
+
+class TokenBucket:
+    """
+    Token bucket allowing `requests` requests per `seconds`, bursting up to `requests`.
+    """
+
+    def __init__(self, requests, seconds):
+        self.capacity = requests
+        self.tokens = float(requests)
+        self.fill_rate = requests / seconds
+        self.updated = time.monotonic()
+
+    def delay(self, now) -> float:
+        # seconds until a token is available
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.fill_rate
+
+
+class RateLimiter:
+    """
+    Rate limiter enforcing several quotas at once, e.g. per second and per 15 minutes.
+
+    Waiters are served in order; quotas apply to this process only.
+    """
+
+    def __init__(self, quotas):
+        self.buckets = [TokenBucket(requests, seconds) for requests, seconds in quotas]
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while (delay := max((bucket.delay(time.monotonic()) for bucket in self.buckets), default=0)) > 0:
+                await asyncio.sleep(delay)
+            for bucket in self.buckets:
+                bucket.tokens -= 1
+
+# ------------------------------------- < ------------------------------------ #
+
+
+# ------------------------------- response cache ------------------------------- #
+
+class ResponseDiskCache:
+    """
+    On-disk cache of successful JSON responses, one file per request target.
+
+    Files hold the target and the body, so a cache folder doubles as a
+    recording for the replay stub server.
+    """
+
+    def __init__(self, cache_path, max_age=None):
+        self.cache_path = cache_path
+        self.max_age = max_age
+
+    def file_path(self, target) -> str:
+        return os.path.join(self.cache_path, hashlib.sha1(target.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, target):
+        file_path = self.file_path(target)
+        try:
+            if self.max_age is not None and time.time() - os.path.getmtime(file_path) > self.max_age:
+                return None
+            with open(file_path, encoding='utf-8') as file:
+                return json.load(file)['body']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, target, body):
+        file_path = self.file_path(target)
+        os.makedirs(self.cache_path, exist_ok=True)
+        temporary_path = f'{file_path}.{os.getpid()}.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            json.dump({'target': target, 'body': body}, file, ensure_ascii=False)
+        os.replace(temporary_path, file_path)
+
+# ------------------------------------- < ------------------------------------ #
+
+
+# -------------------------------- http session -------------------------------- #
+
+class HttpSession:
+    """
+    Minimal asyncio HTTP/1.1 client with a pool of keep-alive connections to one host.
+
+    Args:
+        base_url (str): Scheme, host and path prefix, e.g. BDL_API_URL.
+        max_connections (int): Connections open at the same time.
+        headers (dict): Headers sent with every request.
+        timeout (float): Seconds for a whole request.
+    """
+
+    def __init__(self, base_url, max_connections=8, headers=None, timeout=60):
+        url = urlsplit(base_url)
+        self.scheme = url.scheme
+        self.host = url.hostname
+        self.port = url.port or (443 if url.scheme == 'https' else 80)
+        self.prefix = url.path.rstrip('/')
+        self.headers = {
+            'Host': url.netloc,
+            'Accept': 'application/json',
+            'Accept-Encoding': 'gzip',
+            'User-Agent': 'bdl-gus_data_analysis',
+            **(headers or {}),
+        }
+        self.timeout = timeout
+        self.connections = asyncio.Semaphore(max_connections)
+        self.idle = []
+
+    async def connect(self):
+        if self.idle:
+            return self.idle.pop()
+        ssl_context = ssl.create_default_context() if self.scheme == 'https' else None
+        return await asyncio.open_connection(self.host, self.port, ssl=ssl_context)
+
+    @staticmethod
+    async def read_body(reader, headers) -> bytes:
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while (size := int((await reader.readline()).split(b';')[0], 16)) > 0:
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            # trailers
+            while (await reader.readline()) not in (b'\r\n', b''):
+                pass
+            return b''.join(chunks)
+        if 'content-length' in headers:
+            return await reader.readexactly(int(headers['content-length']))
+        return await reader.read()
+
+    async def exchange(self, reader, writer, target) -> tuple:
+        lines = [f'GET {self.prefix}{target} HTTP/1.1'] + [f'{name}: {value}' for name, value in self.headers.items()]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError('connection closed by the server')
+        status = int(status_line.split()[1])
+
+        headers = {}
+        while (line := await reader.readline()) not in (b'\r\n', b''):
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        body = await self.read_body(reader, headers)
+        if headers.get('content-encoding', '').lower() == 'gzip':
+            body = gzip.decompress(body)
+
+        keep_alive = headers.get('connection', '').lower() != 'close' and (
+            'content-length' in headers or 'transfer-encoding' in headers
+        )
+        return status, headers, body, keep_alive
+
+    async def get(self, target) -> tuple:
+        """
+        Send a GET request.
+
+        Args:
+            target (str): Path below the base url with a query string.
+
+        Returns:
+            tuple: (status, headers, body).
+        """
+        async with self.connections:
+            reader, writer = await self.connect()
+            try:
+                status, headers, body, keep_alive = await asyncio.wait_for(
+                    self.exchange(reader, writer, target), self.timeout,
+                )
+            except BaseException:
+                writer.close()
+                raise
+
+            if keep_alive:
+                self.idle.append((reader, writer))
+            else:
+                writer.close()
+            return status, headers, body
+
+    async def close(self):
+        while self.idle:
+            _, writer = self.idle.pop()
+            writer.close()
+
+# ------------------------------------- < ------------------------------------ #
+
+
+# --------------------------------- bdl client --------------------------------- #
+
+class BDLClient:
+    """
+    Async client of the BDL REST API.
+
+    Requests go through the on-disk response cache, the rate limiter and a
+    pooled session; failed requests are retried with exponential backoff.
+
+    Args:
+        base_url (str): API url, e.g. a local stub server.
+        client_id (str): BDL client id, raises the quotas.
+        cache_path (str): Folder of the response cache, no cache if None.
+        cache_max_age (float): Seconds a cached response is used for, forever if None.
+        quotas (list): (requests, seconds) limits, BDL_QUOTAS by default.
+        max_connections (int): Connections open at the same time.
+        max_retries (int): Retries of a failed request.
+        backoff (float): Seconds before the first retry, doubled for every next one.
+        page_size (int): Results per page, at most 100.
+        lang (str): 'pl' or 'en'.
+    """
+
+    def __init__(self, base_url=BDL_API_URL, client_id=None, cache_path=None, cache_max_age=None, quotas=None,
+                 max_connections=8, max_retries=5, backoff=1.0, page_size=100, lang='pl'):
+        headers = {'X-ClientId': client_id} if client_id else {}
+        self.session = HttpSession(base_url, max_connections, headers)
+        self.cache = ResponseDiskCache(cache_path, cache_max_age) if cache_path else None
+        if quotas is None:
+            quotas = BDL_QUOTAS['registered' if client_id else 'anonymous']
+        self.rate_limiter = RateLimiter(quotas)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.page_size = page_size
+        self.lang = lang
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        await self.session.close()
+
+    async def get(self, path, **params) -> dict:
+        """
+        Get a JSON response.
+
+        Args:
+            path (str): Endpoint, e.g. '/subjects/P2167'.
+            **params: Query parameters, lists are repeated (year=[2010, 2011]).
+
+        Returns:
+            dict: The decoded response.
+        """
+        target = request_target(path, {'format': 'json', 'lang': self.lang, **params})
+
+        if self.cache is not None and (body := self.cache.get(target)) is not None:
+            return body
+
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire()
+            try:
+                status, headers, body = await self.session.get(target)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as error:
+                status, headers, failure = None, {}, error
+            else:
+                if status == 200:
+                    body = json.loads(body)
+                    if self.cache is not None:
+                        self.cache.put(target, body)
+                    return body
+                failure = HTTPStatusError(status, target)
+                if status not in RETRY_STATUSES:
+                    raise failure
+
+            if attempt == self.max_retries:
+                raise failure
+
+            # Retry-After of a 429 wins over the backoff
+            delay = self.backoff * 2 ** attempt * (1 + random.random() / 2)
+            if (retry_after := headers.get('retry-after', '')).isdigit():
+                delay = max(delay, int(retry_after))
+            logging.warning(f'{failure}, retry {attempt + 1}/{self.max_retries} in {delay:.1f} s')
+            await asyncio.sleep(delay)
+
+    async def paginate(self, path, **params) -> tuple:
+        """
+        Get all results of a paginated endpoint.
+
+        The first page tells the number of records, the other pages are
+        requested concurrently.
+
+        Args:
+            path (str): Endpoint, e.g. '/variables'.
+            **params: Query parameters.
+
+        Returns:
+            tuple: (first page, 'results' of every page in order).
+        """
+        first_page = await self.get(path, **params, page=0, **{'page-size': self.page_size})
+        total_records = first_page.get('totalRecords', len(first_page.get('results', [])))
+        pages = -(-total_records // self.page_size)
+
+        other_pages = await asyncio.gather(*(
+            self.get(path, **params, page=page, **{'page-size': self.page_size})
+            for page in range(1, pages)
+        ))
+
+        results = list(first_page.get('results', []))
+        for page in other_pages:
+            results += page.get('results', [])
+        return first_page, results
+
+    async def get_pages(self, path, **params) -> list:
+        _, results = await self.paginate(path, **params)
+        return results
+
+    # --------------------------------- endpoints -------------------------------- #
+
+    async def subject(self, subject_id) -> dict:
+        return await self.get(f'/subjects/{subject_id}')
+
+    async def variables(self, subject_id) -> list:
+        return await self.get_pages('/variables', **{'subject-id': subject_id})
+
+    async def attributes(self) -> list:
+        return await self.get_pages('/attributes')
+
+    async def data_by_variable(self, variable_id, unit_level=2, years=None) -> tuple:
+        """
+        Get values of a variable in every unit of a level.
+
+        Args:
+            variable_id (int): The variable id.
+            unit_level (int): BDL unit level, 2 = voivodeships, 5 = powiats, 6 = gminas.
+            years (list): Years, all available if None.
+
+        Returns:
+            tuple: (results, last update of the variable as an ISO string or None).
+        """
+        params = {'unit-level': unit_level}
+        if years is not None:
+            params['year'] = list(years)
+
+        # lastUpdate is on every page
+        first_page, results = await self.paginate(f'/data/by-variable/{variable_id}', **params)
+        return results, first_page.get('lastUpdate')
+
+    # ------------------------------------- < ------------------------------------ #
+
+# ------------------------------------- < ------------------------------------ #
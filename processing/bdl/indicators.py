@@ -0,0 +1,135 @@
+import asyncio
+from datetime import datetime
+
+import pandas as pd
+
+from ..indicator import Indicator
+from .client import BDLClient
+
+# ---------------------------------- config ---------------------------------- #
+
+# columns of the 2nd sheet of an export, dimension columns go after 'Nazwa'
+SHEET_COLUMNS_BEFORE = ['Kod', 'Nazwa']
+SHEET_COLUMNS_AFTER = ['Rok', 'Wartosc', 'Jednostka miary', 'Atrybut']
+
+# ------------------------------------- < ------------------------------------ #
+
+
+# -------------------------------- conversion -------------------------------- #
+
+def unit_code(unit_id) -> str:
+    """
+    Convert a 12-digit BDL unit id to the 'Kod' of exports.
+
+    Exports use the 7-digit TERYT code (voivodeship, powiat, gmina, gmina type),
+    which pandas reads as a number -> '030200000000' is '200000', like in
+    a workbook.
+
+    Args:
+        unit_id (str): BDL unit id, MM WW R SS PP GG T.
+
+    Returns:
+        str: The code.
+    """
+    return str(int(unit_id[2:4] + unit_id[7:12]))
+
+
+def parse_timestamp(value) -> datetime:
+    # '2023-04-25T20:50:39' or with fractions of a second / 'Z'
+    if not value:
+        return None
+    return datetime.fromisoformat(value.rstrip('Z').split('.')[0])
+
+
+def variable_rows(variable, dimensions, results, attributes) -> list:
+    # rows of the 2nd sheet for one variable
+    dimension_values = [variable.get(f'n{i + 1}') for i in range(len(dimensions))]
+    rows = []
+    for unit in results:
+        code, name = unit_code(unit['id']), unit['name']
+        for value in unit.get('values', []):
+            rows.append([code, name, *dimension_values, int(value['year']), value.get('val'),
+                         variable.get('measureUnitName'), attributes.get(value.get('attrId'), ' ')])
+    return rows
+
+# ------------------------------------- < ------------------------------------ #
+
+
+# --------------------------------- indicators --------------------------------- #
+
+async def fetch_indicator(client: BDLClient, indicator_code, unit_level=2, years=None, attributes=None) -> Indicator:
+    """
+    Get an indicator (BDL subject, e.g. 'P2167' for '2167') from the API.
+
+    The df has the columns of the 2nd sheet of an export: Kod, Nazwa, one
+    column per dimension, Rok, Wartosc, Jednostka miary and Atrybut, so the
+    indicator goes through general_processing like one read from a workbook.
+
+    Args:
+        client (BDLClient): The client.
+        indicator_code (str): The indicator code, with or without the 'P' prefix.
+        unit_level (int): BDL unit level, 2 = voivodeships.
+        years (list): Years, all available if None.
+        attributes (dict): attrId -> symbol, fetched if None.
+
+    Returns:
+        Indicator: The indicator; the timestamp is the last update of its data.
+    """
+    indicator_code = str(indicator_code).removeprefix('P')
+    subject_id = f'P{indicator_code}'
+
+    subject, variables = await asyncio.gather(client.subject(subject_id), client.variables(subject_id))
+    if attributes is None:
+        attributes = await fetch_attributes(client)
+
+    dimensions = subject.get('dimensions', [])
+
+    # every variable -> every page, concurrently
+    data = await asyncio.gather(*(
+        client.data_by_variable(variable['id'], unit_level, years) for variable in variables
+    ))
+
+    rows = []
+    for variable, (results, _) in zip(variables, data):
+        rows += variable_rows(variable, dimensions, results, attributes)
+
+    df = pd.DataFrame(rows, columns=SHEET_COLUMNS_BEFORE + list(dimensions) + SHEET_COLUMNS_AFTER)
+
+    timestamps = [parse_timestamp(last_update) for _, last_update in data]
+    timestamps = [timestamp for timestamp in timestamps if timestamp is not None]
+
+    return Indicator(
+        name=subject.get('name'),
+        code=indicator_code,
+        years=sorted(df['Rok'].unique().tolist()),
+        df=df,
+        timestamp=max(timestamps) if timestamps else None,
+    )
+
+
+async def fetch_attributes(client: BDLClient) -> dict:
+    # attrId -> symbol as in the 'Atrybut' column; no attribute is ' '
+    return {attribute['id']: attribute.get('symbol') or ' ' for attribute in await client.attributes()}
+
+
+async def fetch_indicators(indicator_codes, unit_level=2, years=None, **client_options) -> list:
+    """
+    Get indicators from the API concurrently.
+
+    Args:
+        indicator_codes (list): Indicator codes, e.g. ['2167', '3430'].
+        unit_level (int): BDL unit level, 2 = voivodeships.
+        years (list): Years, all available if None.
+        **client_options: BDLClient arguments, e.g. base_url of a stub server or cache_path.
+
+    Returns:
+        list: Indicator objects in the order of indicator_codes.
+    """
+    async with BDLClient(**client_options) as client:
+        attributes = await fetch_attributes(client)
+        return list(await asyncio.gather(*(
+            fetch_indicator(client, indicator_code, unit_level, years, attributes)
+            for indicator_code in indicator_codes
+        )))
+
+# ------------------------------------- < ------------------------------------ #
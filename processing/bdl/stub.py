@@ -0,0 +1,120 @@
+import asyncio
+import glob
+import json
+import logging
+import os
+import random
+from urllib.parse import parse_qsl, urlsplit
+
+from .client import request_target
+
+
+class ReplayServer:
+    """
+    Local stand-in for the BDL API replaying recorded responses.
+
+    A recording is a folder written by ResponseDiskCache: run a BDLClient with
+    cache_path against the API once, then point base_url at this server;
+    benchmarks.synthetic_recording writes one from an export archive.
+    Unknown targets get a 404; fail_rate answers a share of requests with
+    429 or 503 to exercise retries.
+
+    Args:
+        recording_path (str): Folder of recorded responses.
+        fail_rate (float): Share of requests failing, 0 to 1.
+        delay (float): Seconds added to every response, simulates latency.
+    """
+
+    def __init__(self, recording_path, fail_rate=0.0, delay=0.0):
+        self.responses = {}
+        for file_path in glob.glob(os.path.join(recording_path, '*.json')):
+            with open(file_path, encoding='utf-8') as file:
+                recording = json.load(file)
+            self.responses[recording['target']] = json.dumps(recording['body'], ensure_ascii=False).encode('utf-8')
+
+        self.fail_rate = fail_rate
+        self.delay = delay
+        self.requests = 0
+        self.server = None
+        self.connections = {}
+
+    @staticmethod
+    def normalize(target) -> str:
+        url = urlsplit(target)
+        return request_target(url.path, parse_qsl(url.query))
+
+    def response(self, target) -> tuple:
+        self.requests += 1
+        if self.fail_rate and random.random() < self.fail_rate:
+            return random.choice(((429, 'Too Many Requests'), (503, 'Service Unavailable'))), b'', {'Retry-After': '0'}
+
+        body = self.responses.get(self.normalize(target))
+        if body is None:
+            return (404, 'Not Found'), b'{"errors": ["not recorded"]}', {}
+        return (200, 'OK'), body, {'Content-Type': 'application/json; charset=utf-8'}
+
+    async def handle_connection(self, reader, writer):
+        self.connections[asyncio.current_task()] = writer
+        try:
+            while request_line := await reader.readline():
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                _, target, _ = request_line.decode('latin-1').split()
+
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+                (status, phrase), body, headers = self.response(target)
+
+                head = [f'HTTP/1.1 {status} {phrase}', f'Content-Length: {len(body)}']
+                head += [f'{name}: {value}' for name, value in headers.items()]
+                writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+            self.connections.pop(asyncio.current_task(), None)
+
+    async def start(self, host='127.0.0.1', port=0) -> str:
+        # port 0 -> any free port; returns the base url for BDLClient
+        self.server = await asyncio.start_server(self.handle_connection, host, port)
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f'http://{host}:{port}'
+
+    async def stop(self):
+        # closing the connections lets their handlers finish instead of being cancelled
+        self.server.close()
+        for writer in self.connections.values():
+            writer.transport.abort()
+        await asyncio.gather(*self.connections, return_exceptions=True)
+        await self.server.wait_closed()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self.server is not None:
+            await self.stop()
+
+
+async def serve(recording_path, host, port, fail_rate):
+    replay_server = ReplayServer(recording_path, fail_rate)
+    base_url = await replay_server.start(host, port)
+    logging.info(f'Replaying {len(replay_server.responses)} responses on {base_url}')
+    async with replay_server.server:
+        await replay_server.server.serve_forever()
+
+
+# python -m processing.bdl.stub <recording folder> [--port 8081] [--fail-rate 0.1]
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Replay recorded BDL API responses.')
+    parser.add_argument('recording_path')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(serve(args.recording_path, args.host, args.port, args.fail_rate))
@@ -0,0 +1 @@
+from .parse_cache import *
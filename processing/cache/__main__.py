@@ -0,0 +1,30 @@
+# manage the parse cache from the command line
+# python -m processing.cache invalidate [member ...]
+# python -m processing.cache size
+
+import argparse
+
+from paths import paths
+from .parse_cache import ParseCache
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m processing.cache', description='Manage the parse cache.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    invalidate_parser = subparsers.add_parser('invalidate', help='remove cache entries')
+    invalidate_parser.add_argument('members', nargs='*', help='zip member names, all entries if omitted')
+
+    subparsers.add_parser('size', help='print the cache size in bytes')
+
+    args = parser.parse_args()
+    cache = ParseCache(paths.cache_data_path)
+
+    if args.command == 'invalidate':
+        removed = sum(cache.invalidate(member) for member in args.members) if args.members else cache.invalidate()
+        print(f'{removed} cache entries removed.')
+    elif args.command == 'size':
+        print(cache.size())
+
+
+main()
@@ -0,0 +1,193 @@
+import hashlib
+import inspect
+import logging
+import os
+import pickle
+import re
+import zipfile
+
+# --------------------------------- config hash -------------------------------- #
+
+def fingerprint(obj) -> str:
+    """
+    Return a stable text representation of processing configuration.
+
+    Functions, classes and modules are represented by their source code, so
+    editing e.g. custom_processing changes the fingerprint.
+
+    Args:
+        obj: dict, list, tuple, callable, class, module or any object with a stable repr.
+
+    Returns:
+        str: The fingerprint.
+    """
+    if isinstance(obj, dict):
+        return '{' + ','.join(f'{fingerprint(key)}:{fingerprint(value)}' for key, value in obj.items()) + '}'
+    if isinstance(obj, (list, tuple)):
+        return '[' + ','.join(fingerprint(item) for item in obj) + ']'
+    if isinstance(obj, type) and obj.__module__ == 'builtins':
+        return obj.__qualname__
+    if inspect.isclass(obj) or inspect.isfunction(obj) or inspect.ismethod(obj):
+        try:
+            return inspect.getsource(obj)
+        except (OSError, TypeError):
+            return obj.__qualname__
+    if inspect.ismodule(obj):
+        try:
+            return inspect.getsource(obj)
+        except (OSError, TypeError):
+            return obj.__name__
+    if hasattr(obj, '__dict__'):
+        # plain objects, e.g. RowWise -> class and attributes, repr would contain the address
+        return type(obj).__qualname__ + fingerprint(vars(obj))
+    return repr(obj)
+
+
+def config_hash(*objects) -> str:
+    """
+    Hash processing configuration objects.
+
+    Args:
+        *objects: Objects passed to fingerprint().
+
+    Returns:
+        str: sha1 hex digest.
+    """
+    return hashlib.sha1(''.join(fingerprint(obj) for obj in objects).encode('utf-8')).hexdigest()
+
+# ------------------------------------- < ------------------------------------ #
+
+
+# --------------------------------- cache -------------------------------- #
+
+class ParseCache:
+    """
+    On-disk cache of processed indicators keyed by zip member.
+
+    The key is the member name, its CRC32 and size (from zipfile.ZipInfo) and a
+    hash of the processing config, so an unchanged workbook processed with an
+    unchanged config is loaded instead of parsed. Entries are evicted in least
+    recently used order once the cache grows over max_size bytes.
+    """
+
+    EXTENSION = '.pkl'
+
+    def __init__(self, cache_path, config='', max_size=512 * 1024 ** 2):
+        self.cache_path = cache_path
+        self.config = config
+        self.max_size = max_size
+
+    # ---------------------------------- keys --------------------------------- #
+
+    @staticmethod
+    def member_prefix(member_name) -> str:
+        # file name safe prefix -> lets invalidate() find entries of a member
+        return re.sub(r'[^\w.-]', '_', os.path.splitext(os.path.basename(member_name))[0])
+
+    def key(self, file_info: zipfile.ZipInfo) -> str:
+        digest = hashlib.sha1(
+            f'{file_info.filename}:{file_info.CRC}:{file_info.file_size}:{self.config}'.encode('utf-8')
+        ).hexdigest()
+        return f'{self.member_prefix(file_info.filename)}.{digest}'
+
+    def entry_path(self, key) -> str:
+        return os.path.join(self.cache_path, key + self.EXTENSION)
+
+    def entries(self) -> list:
+        # folder is created by the first put()
+        if not os.path.isdir(self.cache_path):
+            return []
+        return [
+            os.path.join(self.cache_path, file)
+            for file in os.listdir(self.cache_path)
+            if file.endswith(self.EXTENSION)
+        ]
+
+    # ------------------------------------- < ------------------------------------ #
+
+    def get(self, key):
+        """
+        Load a cached indicator.
+
+        Args:
+            key (str): Key returned by self.key().
+
+        Returns:
+            Indicator: The cached indicator or None if there is no entry.
+        """
+        path = self.entry_path(key)
+        try:
+            with open(path, 'rb') as file:
+                indicator = pickle.load(file)
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            logging.warning(f'Cache entry {key} is unreadable, removing it.')
+            os.remove(path)
+            return None
+
+        # mark as recently used
+        os.utime(path)
+        return indicator
+
+    def put(self, key, indicator):
+        """
+        Store an indicator and evict old entries if the cache is too big.
+
+        Args:
+            key (str): Key returned by self.key().
+            indicator (Indicator): Processed indicator.
+        """
+        path = self.entry_path(key)
+        os.makedirs(self.cache_path, exist_ok=True)
+
+        # write to temporary file first -> readers never see a partial entry
+        temporary_path = f'{path}.{os.getpid()}.tmp'
+        with open(temporary_path, 'wb') as file:
+            pickle.dump(indicator, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, path)
+
+        self.evict()
+
+    def size(self) -> int:
+        return sum(os.path.getsize(path) for path in self.entries())
+
+    def evict(self):
+        """
+        Remove least recently used entries until the cache fits in max_size.
+        """
+        entries = sorted(
+            ((os.stat(path), path) for path in self.entries()),
+            key=lambda entry: entry[0].st_mtime,
+        )
+        total_size = sum(stat.st_size for stat, _ in entries)
+
+        for stat, path in entries:
+            if total_size <= self.max_size:
+                break
+            os.remove(path)
+            total_size -= stat.st_size
+            logging.info(f'Cache entry {os.path.basename(path)} evicted.')
+
+    def invalidate(self, member_name=None) -> int:
+        """
+        Remove cache entries.
+
+        Args:
+            member_name (str): Remove only entries of this zip member. All entries
+                are removed if None.
+
+        Returns:
+            int: Number of removed entries.
+        """
+        entries = self.entries()
+        if member_name is not None:
+            prefix = self.member_prefix(member_name) + '.'
+            entries = [path for path in entries if os.path.basename(path).startswith(prefix)]
+
+        for path in entries:
+            os.remove(path)
+
+        return len(entries)
+
+# ------------------------------------- < ------------------------------------ #
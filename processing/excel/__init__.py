@@ -1,2 +1,4 @@
-from .metadata import *
-from .processor import *
\ No newline at end of file
+# submodules load on first use -> metadata can be read without pandas and openpyxl
+from ..lazy import lazy_exports
+
+__getattr__ = lazy_exports(__name__, ['metadata', 'stream', 'processor'])
@@ -4,6 +4,7 @@
 
 from datetime import datetime
 from dataclasses import dataclass
+import re
 
 ## define metadata dataclass -> string is passed as argument
 @dataclass
@@ -15,4 +16,27 @@ class Metadata:
     alternative_indicator_name: str = None
     
     def __str__(self) -> str:
-        return f"category: {self.category}, indicator_code: {self.indicator_code}, timestamp: {self.timestamp}, alternative_indicator_name: {self.alternative_indicator_name}"
\ No newline at end of file
+        return f"category: {self.category}, indicator_code: {self.indicator_code}, timestamp: {self.timestamp}, alternative_indicator_name: {self.alternative_indicator_name}"
+
+
+# get metadata from file name, e.g. LUDN_2167_XREL_20230425205039.xlsx
+def metadata_from_file_name(file_name) -> Metadata:
+
+    # return Metadata(field, indicator_code, alternative_indicator_name)
+    pattern = r'^(\w{4})_(\d{4})_.*?_(\d{14})'
+    match = re.match(pattern, file_name)
+
+    if match:
+        # convert timestamp to datetime object
+        timestamp = datetime.strptime(match[3], '%Y%m%d%H%M%S')
+
+        # Check for optional indicator name
+        indicator_name_match = re.search(r'^(?:[^_]*_){4}(.+?)(?:\.xlsx)?$', file_name)
+        return Metadata(
+            category=match[1],
+            indicator_code=match[2],
+            timestamp=timestamp,
+            alternative_indicator_name=indicator_name_match[1] if indicator_name_match else None,
+        )
+
+    return None
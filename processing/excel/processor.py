@@ -5,7 +5,9 @@ import re, os, datetime
 
 # indicators module in the same folder
 from ..indicator import Indicator
-from .metadata import Metadata
+from ..instrumentation import instrumented
+from .metadata import Metadata, metadata_from_file_name
+from .stream import CHUNK_SIZE, iter_sheet_chunks, read_cell
 
 # ExcelFile class
 class ExcelFile:
@@ -14,8 +16,10 @@ class ExcelFile:
     NA_VALUES = '-'
 
     # init
-    def __init__(self, path):
+    def __init__(self, path, source=None):
         self.full_path = path
+        # file-like object to read from instead of path, e.g. zip member
+        self.source = source
         # self.columns_to_keep = columns_to_keep
         self.metadata = Metadata()
         self.indicator = Indicator()
@@ -46,6 +50,10 @@ class ExcelFile:
     def get_file_name(self):
         return os.path.basename(self.full_path).split('.')[0]
 
+    # source to read from -> in-memory object if passed, path otherwise
+    def get_source(self):
+        return self.source if self.source is not None else self.full_path
+
 
 class ExcelFileProcessor:
 
@@ -61,6 +69,11 @@ class ExcelFileProcessor:
     # --------------------------------- load file -------------------------------- #
 
     # load file
+    @instrumented(
+        'load_file',
+        before=lambda self, file: {'file': os.path.basename(file.full_path)} if file else {},
+        after=lambda result, self, file: {'indicator': file.indicator.code, 'rows_out': len(file.indicator.df)},
+    )
     def load_file(self, file):
         
         if file:
@@ -92,33 +105,36 @@ class ExcelFileProcessor:
 
     def get_metadata(self):
 
-        # get metadata from xlsx file
+        # get metadata from xlsx file name
+        return metadata_from_file_name(os.path.basename(self.excel_file.full_path))
 
-        file_name = os.path.basename(self.excel_file.full_path)
+    # ------------------------------------- < ------------------------------------ #
 
-        # return Metadata(field, indicator_code, alternative_indicator_name)
-        pattern = r'^(\w{4})_(\d{4})_.*?_(\d{14})'
-        match = re.match(pattern, file_name)
 
-        # convert timestamp to datetime object
-        timestamp = datetime.datetime.strptime(match[3], '%Y%m%d%H%M%S')
+    # -------------------------------- indicators -------------------------------- #
 
-        if match:
-            # Check for optional indicator name
-            indicator_name_match = re.search(r'^(?:[^_]*_){4}(.+?)(?:\.xlsx)?$', file_name)
-            return Metadata(
-                category=match[1],
-                indicator_code=match[2],
-                timestamp=timestamp,
-                alternative_indicator_name=indicator_name_match[1] if indicator_name_match else None,
-            )
+    def read_workbook(self) -> Indicator:
+        """Reads the workbook in a single pass.
 
-        return None
+        The file is opened once; the indicator name (sheet 0, cell B5) and the
+        values (sheet 1) are parsed from the same handle and the year list is
+        derived from the values instead of re-reading the sheet.
 
-    # ------------------------------------- < ------------------------------------ #
+        Returns:
+            Indicator: Fully populated indicator, values still needing to be processed.
+        """
 
+        with pd.ExcelFile(self.excel_file.get_source()) as workbook:
+            name = workbook.parse(sheet_name=0, na_values=self.excel_file.NA_VALUES, header=None, nrows=5).iloc[4, 1]
+            df = workbook.parse(sheet_name=1, na_values=self.excel_file.NA_VALUES)
 
-    # -------------------------------- indicators -------------------------------- #
+        return Indicator(
+            name=name,
+            code=self.excel_file.metadata.indicator_code,
+            years=df['Rok'].unique().tolist(),
+            df=df,
+            timestamp=self.excel_file.metadata.timestamp,
+        )
 
     def get_indicator_values(self) -> pd.DataFrame:
         """Returns the second sheet as a DataFrame.
@@ -127,33 +143,60 @@ class ExcelFileProcessor:
             pd.DataFrame: The second sheet of the Excel file. Still needing to be processed.
         """
 
-        return pd.read_excel(self.excel_file.full_path, sheet_name=1, na_values=self.excel_file.NA_VALUES)
+        return self.get_indicator().df
         
     def get_indicator_name(self):
-        return pd.read_excel(self.excel_file.full_path, sheet_name=0, na_values=self.excel_file.NA_VALUES, header=None).iloc[4, 1]
+        return self.get_indicator().name
     
     def get_indicator_years(self):
-        return pd.read_excel(self.excel_file.full_path, sheet_name=1, na_values=self.excel_file.NA_VALUES)['Rok'].unique().tolist()
+        return self.get_indicator().years
     
     def get_indicator(self):
         
         indicator = self.excel_file.indicator
-        
-        # Read the indicator information from the Excel file
-        indicator.name = self.get_indicator_name()
 
-        # indicator_code = self.excel_file.metadata.indicator_code
-        indicator.years = self.get_indicator_years()
-
-        # code
-        indicator.code = self.excel_file.metadata.indicator_code
-        indicator.df = self.get_indicator_values()
+        # read the workbook only if it was not read on load
+        if indicator.df is None:
+            indicator = self.read_workbook()
+            self.excel_file.set_indicator(indicator)
         
         return Indicator(
             name=indicator.name,
             code=indicator.code,
-            years=indicator.years,
+            years=list(indicator.years),
             df=indicator.df,
+            timestamp=indicator.timestamp,
         )
     
-    # ------------------------------------- < ------------------------------------ #
\ No newline at end of file
+    # ------------------------------------- < ------------------------------------ #
+
+
+    # --------------------------------- streaming -------------------------------- #
+
+    def stream_file(self, file, chunk_size=CHUNK_SIZE) -> tuple:
+        """Loads a file without reading its values at once.
+
+        Only metadata and the indicator name are read; the values (sheet 1)
+        are returned as an iterator of chunks, to be processed one at a time.
+
+        Args:
+            file (ExcelFile): The file.
+            chunk_size (int): Rows per chunk.
+
+        Returns:
+            tuple: (Indicator without df and years, iterator of DataFrame chunks).
+        """
+
+        self.excel_file = file
+        self.excel_file.set_metadata(self.get_metadata())
+
+        source = self.excel_file.get_source()
+        indicator = Indicator(
+            name=read_cell(source, 0, 'B5'),
+            code=self.excel_file.metadata.indicator_code,
+            timestamp=self.excel_file.metadata.timestamp,
+        )
+
+        return indicator, iter_sheet_chunks(source, 1, chunk_size, na_values=(self.excel_file.NA_VALUES,))
+
+    # ------------------------------------- < ------------------------------------ #
@@ -0,0 +1,77 @@
+# -------------------------------- xlsx streaming -------------------------------- #
+
+# read sheets row by row, without building the workbook DOM
+
+import openpyxl
+from pandas.io.parsers import TextParser
+
+# rows per chunk -> bounds memory of a streamed sheet
+CHUNK_SIZE = 50_000
+
+
+def read_cell(source, sheet_index, coordinate):
+    """
+    Read a single cell in read-only mode.
+
+    Args:
+        source (str | file-like): Path or in-memory workbook.
+        sheet_index (int): Index of the sheet.
+        coordinate (str): Cell, e.g. 'B5'.
+
+    Returns:
+        The cell value.
+    """
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        return workbook.worksheets[sheet_index][coordinate].value
+    finally:
+        workbook.close()
+        if hasattr(source, 'seek'):
+            source.seek(0)
+
+
+def iter_sheet_chunks(source, sheet_index=1, chunk_size=CHUNK_SIZE, na_values=('-',)):
+    """
+    Stream a sheet as DataFrames of at most chunk_size rows.
+
+    The first row is the header. Rows are parsed one at a time from the sheet
+    XML, so memory is bounded by the chunk, not by the sheet. Chunks are
+    typed by the parser pd.read_excel uses, so numbers stored as text
+    ('0200000', '2010') are converted the same way.
+
+    Args:
+        source (str | file-like): Path or in-memory workbook.
+        sheet_index (int): Index of the sheet.
+        chunk_size (int): Rows per chunk.
+        na_values (tuple): Cell values read as missing, besides the pandas defaults.
+
+    Yields:
+        pd.DataFrame: Chunks in sheet order; one empty chunk if the sheet has no rows.
+    """
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[sheet_index].iter_rows(values_only=True)
+        header = list(next(rows, ()))
+
+        def chunk(chunk_rows):
+            return TextParser([header] + chunk_rows, header=0, na_values=list(na_values)).read()
+
+        chunk_rows = []
+        emitted = False
+        for row in rows:
+            # trailing empty rows of the sheet dimension
+            if all(value is None for value in row):
+                continue
+            chunk_rows.append(row)
+
+            if len(chunk_rows) == chunk_size:
+                yield chunk(chunk_rows)
+                emitted = True
+                chunk_rows = []
+
+        if chunk_rows or not emitted:
+            yield chunk(chunk_rows)
+    finally:
+        workbook.close()
+
+# ------------------------------------- < ------------------------------------ #
@@ -1,11 +1,13 @@
 # manage indicators
 
 # imports
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
+from datetime import datetime
 import pandas as pd
 
 # import __init__ from df folder below
 from .df import *
+from ..instrumentation import instrumented
 
 # create Indicator dataclass
 @dataclass
@@ -25,6 +27,9 @@ class Indicator:
     # values -> df, 2nd sheet
     df: pd.DataFrame = None
 
+    # export timestamp, from file name; newest of the sources for derived indicators
+    timestamp: datetime = None
+
     # str
     def __str__(self) -> str:
         return f"""
@@ -72,36 +77,112 @@ class Indicator:
     
 
 # create indicators from dfs and instructions
+@instrumented(
+    'create_new_indicator',
+    before=lambda indicators, instructions: {'rows_in': sum(len(indicator.df) for indicator in indicators)},
+    after=lambda indicator, indicators, instructions: {'indicator': indicator.code, 'rows_out': len(indicator.df)},
+)
 def create_new_indicator(indicators, instructions):
     
     # merge dfs
-    merged_df = df.creator.merge_indicator_dfs([indicator.df for indicator in indicators], instructions)
+    merged_df = df.creator.merge_indicator_dfs(
+        [indicator.df for indicator in indicators],
+        instructions,
+        names=[indicator.code for indicator in indicators],
+    )
 
     # store instructions.get('name') and instructions.get('code') in variables
     name = instructions.get('name', '-'.join([indicator.name for indicator in indicators]))
     code = instructions.get('code', '-'.join([indicator.code for indicator in indicators]))
 
+    # derived data is as new as its newest source
+    timestamps = [indicator.timestamp for indicator in indicators]
+
     # create new indicator
     indicator = Indicator(
         name=name,
         code=code,
         years=list(merged_df['Year'].unique()),
         df=merged_df,
+        timestamp=max(timestamps) if None not in timestamps else None,
     )
 
     indicator.df = general_processing(indicator, 'Indicator', 'Indicator code', **{
-        'subset': NEEDED_COLUMNS
+        'subset': NEEDED_COLUMNS,
+        'compact': BASIC_DATAFRAME_PROCESSING_CONFIG['compact'],
     })
 
     return indicator
 
 
 # manage dfs
+@instrumented(
+    'process_indicator_df',
+    before=lambda indicator: {'indicator': indicator.code, 'rows_in': len(indicator.df)},
+    after=lambda df, indicator: {'rows_out': len(df)},
+)
 def process_indicator_df(indicator):
     # process indicator df
     indicator.df = general_processing(indicator, 'Indicator', 'Indicator code', **BASIC_DATAFRAME_PROCESSING_CONFIG)
     # custom process for specific indicator
     indicator.df = custom_processing(indicator)
-    # subset df
-    indicator.df = indicator.df[NEEDED_COLUMNS]
-    return indicator.df
\ No newline at end of file
+    return needed_columns_df(indicator.df)
+
+
+# subset df
+def needed_columns_df(df):
+    df = df[NEEDED_COLUMNS]
+    # custom processing may add plain columns -> back to compact schema
+    if 'compact' in BASIC_DATAFRAME_PROCESSING_CONFIG:
+        df = compact_df(df, **BASIC_DATAFRAME_PROCESSING_CONFIG['compact'])
+    return df
+
+
+# combine processed chunks -> categoricals stay categoricals
+def concat_chunks(dfs) -> pd.DataFrame:
+    builder = MasterDfBuilder(columns=list(dfs[0].columns))
+    for chunk in dfs:
+        builder.add(chunk)
+    combined = builder.build()
+    # every chunk empty -> keep the dtypes of the first
+    return combined if len(combined) else dfs[0]
+
+
+# sheet is read while processing -> the stage includes reading, rows_in is unknown upfront
+@instrumented(
+    'process_indicator_chunks',
+    before=lambda indicator, chunks: {'indicator': indicator.code},
+    after=lambda df, indicator, chunks: {'rows_out': len(df)},
+)
+def process_indicator_chunks(indicator, chunks):
+    """
+    Process an indicator df read in chunks, like process_indicator_df.
+
+    Every chunk goes through general processing as it is read. Indicators
+    with a transform spec are transformed chunk by chunk as far as the spec
+    allows (see TransformPlan.stream); hand-written processing gets the
+    combined df.
+
+    Args:
+        indicator (Indicator): The indicator, without df.
+        chunks (iterable): Chunks of the 2nd sheet, e.g. from iter_sheet_chunks.
+
+    Returns:
+        pd.DataFrame: The processed df; indicator.years is set as well.
+    """
+    # years in order of appearance, like unique()
+    years = {}
+
+    def processed_chunks():
+        for chunk in chunks:
+            years.update(dict.fromkeys(chunk['Rok'].unique().tolist()))
+            yield general_processing(replace(indicator, df=chunk), 'Indicator', 'Indicator code', **BASIC_DATAFRAME_PROCESSING_CONFIG)
+
+    if indicator.code in TRANSFORMS:
+        indicator.df = transform_plan(indicator.code).stream(processed_chunks(), concat_chunks)
+    else:
+        indicator.df = concat_chunks(list(processed_chunks()))
+        indicator.df = custom_processing(indicator)
+
+    indicator.years = list(years)
+    return needed_columns_df(indicator.df)
@@ -2,6 +2,8 @@ import pandas as pd
 
 from .creator import *
 from .processor import *
+from .master import *
+from .transforms import *
 
 
 # create MASTER_DF to hold all indicator data
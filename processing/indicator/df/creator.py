@@ -1,8 +1,6 @@
 import logging
 import pandas as pd
 
-BUFFER = []
-
 def merge_dataframes(dfs, merge_kwargs):
     """
     Merge multiple DataFrames using provided keyword arguments.
@@ -21,7 +19,56 @@ def merge_dataframes(dfs, merge_kwargs):
         return pd.merge(dfs[0], dfs[1], **merge_kwargs)
     else:
         return pd.merge(dfs[0], merge_dataframes(dfs[1:], merge_kwargs), **merge_kwargs)
-    
+
+
+def join_dataframes(dfs, names, on=("Code", "Year"), how="inner", values=("Value",)):
+    """
+    Join multiple DataFrames on shared keys in one pass.
+
+    Every DataFrame is indexed once on the keys and all value columns are
+    aligned together, instead of merging pairwise. Value columns are named
+    after their source, e.g. 'Value_1869' and 'Value_3787' for names
+    ['1869', '3787']; other columns (e.g. 'Name') are taken from the first DataFrame.
+
+    Args:
+        dfs (list): A list of DataFrames to be joined, keys must be unique in each of them.
+        names (list): Suffix for the value columns of each DataFrame, e.g. indicator codes.
+        on (tuple): Key columns.
+        how (str): 'inner' keeps keys present in all DataFrames, 'outer' keeps all keys.
+        values (tuple): Columns taken from every DataFrame.
+
+    Returns:
+        pd.DataFrame: The joined DataFrame with the key columns, the first DataFrame's
+            other columns and a value column per source.
+    """
+    if len(dfs) < 2:
+        raise ValueError("At least two DataFrames are required for joining.")
+    if len(names) != len(dfs) or len(set(names)) != len(names):
+        raise ValueError("A unique name is required for every DataFrame.")
+
+    on, values = list(on), list(values)
+
+    # columns of the first DataFrame that are neither keys nor values, e.g. Name
+    shared = [column for column in dfs[0].columns if column not in on and column not in values]
+
+    frames = [dfs[0].set_index(on)[shared + values].rename(columns={value: f"{value}_{names[0]}" for value in values})]
+    for df, name in zip(dfs[1:], names[1:]):
+        frames.append(df.set_index(on)[values].add_suffix(f"_{name}"))
+
+    return pd.concat(frames, axis=1, join=how).reset_index()
+
+
+class RowWise:
+    """
+    Mark an operation to be applied row by row with df.apply.
+
+    Operations work on whole columns by default; wrap a function in RowWise
+    only if it can't, e.g. RowWise(lambda x: x['Value'] if x['Year'] > 2010 else None).
+    """
+
+    def __init__(self, function):
+        self.function = function
+
 
 def run_operation(df, output_column, function):
     """
@@ -29,10 +76,16 @@ def run_operation(df, output_column, function):
 
     Args:
         df (pd.DataFrame): The DataFrame to run the operation on.
-        operation (dict): A dictionary of instructions for the operation.
+        output_column (str): The column to store the result in.
+        function (str | callable | RowWise): The operation.
+            str -> expression evaluated on whole columns with DataFrame.eval
+                (numexpr is used if installed), e.g. 'Value_y / Value_x'.
+            callable -> called once with the whole DataFrame, should return a Series,
+                e.g. lambda df: df['Value_y'] / df['Value_x'].
+            RowWise -> the wrapped function is applied to every row, slow fallback.
         # example operation:
         'operations': {
-            'Value': lambda x: x['Value_y'] / x['Value_x']
+            'Value': 'Value_y / Value_x'
         }
 
     Returns:
@@ -40,29 +93,40 @@ def run_operation(df, output_column, function):
     """
     
     # run operation -> key is output column, value is function
-    df[output_column] = df.apply(
-        function,
-        axis=1
-    )
+    if isinstance(function, str):
+        df[output_column] = df.eval(function)
+    elif isinstance(function, RowWise):
+        df[output_column] = df.apply(
+            function.function,
+            axis=1
+        )
+    else:
+        df[output_column] = function(df)
 
     return df
 
-def merge_indicator_dfs(dfs, instructions):
+def merge_indicator_dfs(dfs, instructions, names=None):
     """
-    Create a new indicator based on two DataFrames and instructions.
+    Create a new indicator based on two or more DataFrames and instructions.
 
     Args:
         dfs (list): A list of DataFrames to be merged and used for creating the new indicator.
         instructions (dict): A dictionary of instructions for creating the new indicator.
+            'join' -> keyword arguments of join_dataframes, value columns are suffixed with names.
+            'merge' -> keyword arguments of pd.merge, applied pairwise.
+        names (list): Names of the DataFrames used by 'join', e.g. indicator codes.
 
     Returns:
         pd.DataFrame: The resulting DataFrame with the new indicator.
     """
 
-    df = merge_dataframes(
-        dfs=dfs,
-        merge_kwargs=instructions.get("merge")
-    )
+    if (join_kwargs := instructions.get("join")) is not None:
+        df = join_dataframes(dfs, names, **join_kwargs)
+    else:
+        df = merge_dataframes(
+            dfs=dfs,
+            merge_kwargs=instructions.get("merge")
+        )
     # use walrus operator to check if operations exist
     if (operations := instructions.get("operations")) is not None:
         # key: output column, value: function
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from .processor import NEEDED_COLUMNS
+
+
+class MasterDfBuilder:
+    """
+    Collect indicator dfs and materialize master_df exactly once.
+
+    Appending with pd.concat copies the whole growing frame for every indicator.
+    The builder only keeps references to the added dfs. build() allocates every
+    column once at its final size and fills it slice by slice.
+    """
+
+    def __init__(self, columns=None):
+        self.columns = columns if columns is not None else NEEDED_COLUMNS
+        self.dfs = []
+
+    def __len__(self):
+        return sum(len(df) for df in self.dfs)
+
+    def add(self, df: pd.DataFrame):
+        # keep a reference only, columns are selected when building
+        if len(df):
+            self.dfs.append(df)
+        return self
+
+    def add_indicator(self, indicator):
+        return self.add(indicator.df)
+
+    def build_column(self, column, n_rows) -> np.ndarray:
+        """
+        Build a single column of n_rows from the collected dfs.
+
+        Args:
+            column (str): Name of the column.
+            n_rows (int): Number of rows in the final frame.
+
+        Returns:
+            np.ndarray | pd.Series: The filled column.
+        """
+        dtypes = [df[column].dtype for df in self.dfs]
+
+        # categoricals -> union of categories, codes are not decoded to strings
+        if all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes):
+            return union_categoricals([df[column] for df in self.dfs], ignore_order=True)
+
+        # other extension dtypes (categorical, string) -> one concat of that column only
+        if not all(isinstance(dtype, np.dtype) for dtype in dtypes):
+            return pd.concat([df[column] for df in self.dfs], ignore_index=True)
+
+        values = np.empty(n_rows, dtype=np.result_type(*dtypes))
+        start = 0
+        for df in self.dfs:
+            stop = start + len(df)
+            values[start:stop] = df[column].to_numpy()
+            start = stop
+
+        return values
+
+    def build(self) -> pd.DataFrame:
+        """
+        Materialize master_df from the collected dfs.
+
+        Returns:
+            pd.DataFrame: The master dataframe with self.columns.
+        """
+        if not self.dfs:
+            return pd.DataFrame(columns=self.columns)
+
+        n_rows = len(self)
+        data = {column: self.build_column(column, n_rows) for column in self.columns}
+
+        # release references to the collected dfs
+        self.dfs = []
+
+        return pd.DataFrame(data, columns=self.columns, copy=False)
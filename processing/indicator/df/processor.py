@@ -1,6 +1,9 @@
 import logging
 import pandas as pd
 
+from ...instrumentation import instrumented
+from .transforms import TRANSFORMS, transform_plan
+
 
 BASIC_DATAFRAME_PROCESSING_CONFIG = {
     'rename': {
@@ -15,6 +18,19 @@ BASIC_DATAFRAME_PROCESSING_CONFIG = {
         'Year': int,
         'Value': float,
     },
+    # compact schema -> see compact_df, set 'value_dtype': 'float32' to also narrow values
+    'compact': {
+        'value_dtype': None,
+    },
+}
+
+# repeated strings become categoricals, years fit in int16
+COMPACT_TYPES = {
+    'Code': 'category',
+    'Name': 'category',
+    'Year': 'int16',
+    'Indicator': 'category',
+    'Indicator code': 'category',
 }
 
 NEEDED_COLUMNS = [
@@ -28,6 +44,53 @@ NEEDED_COLUMNS = [
 
 # --------------------------------- functions -------------------------------- #
 
+# compact schema
+def compact_df(df, value_dtype=None) -> pd.DataFrame:
+    """
+    Convert a df to the compact schema.
+
+    Args:
+        df (pd.DataFrame): The df, columns missing from COMPACT_TYPES are kept as they are.
+        value_dtype (str): Type of the 'Value' column, e.g. 'float32'. Kept if None.
+
+    Returns:
+        pd.DataFrame: The df with compact types.
+    """
+    types = {column: column_type for column, column_type in COMPACT_TYPES.items() if column in df.columns}
+    if value_dtype is not None and 'Value' in df.columns:
+        types['Value'] = value_dtype
+
+    # deep memory usage is slow on object columns -> only measured if it is logged
+    report = logging.getLogger().isEnabledFor(logging.DEBUG)
+    if report:
+        memory_before = df.memory_usage(deep=True).sum()
+
+    df = df.astype(types)
+
+    if report:
+        memory_after = df.memory_usage(deep=True).sum()
+        logging.debug(f"compact schema: {memory_before / 1024:.1f} KiB -> {memory_after / 1024:.1f} KiB")
+
+    return df
+
+
+def memory_usage_report(df) -> dict:
+    """
+    Compare memory usage of a df with its compact version.
+
+    Args:
+        df (pd.DataFrame): The df, e.g. master_df.
+
+    Returns:
+        dict: Memory usage in bytes of the df as it is and in the compact schema.
+    """
+    compact = compact_df(df, **BASIC_DATAFRAME_PROCESSING_CONFIG['compact'])
+    return {
+        'current': int(df.memory_usage(deep=True).sum()),
+        'compact': int(compact.memory_usage(deep=True).sum()),
+    }
+
+
 # process indicator df
 def general_processing(indicator, indicator_col, indicator_code_col, **kwargs) -> pd.DataFrame:
     """
@@ -46,100 +109,35 @@ def general_processing(indicator, indicator_col, indicator_code_col, **kwargs) -
         indicator.df = indicator.df.rename(columns=kwargs['rename'])
     if 'change_type' in kwargs:
         indicator.df = indicator.df.astype(kwargs['change_type'])
-    if 'subset' in kwargs:
-        indicator.df = indicator.df[kwargs['subset']]
     
     # indicator info
     indicator.df = indicator.df.assign(**{
         indicator_col: indicator.name,
         indicator_code_col: indicator.code,
     })
-    
-    return indicator.df
 
-class IndicatorProcessor:
-    def process_2167(self, df):
-        """
-        Process indicator 2167 dataframe.
-        """
-        # convert value '12 i mniej' in column 'Wiek matki' to 12, convert value '50 i więcej' in column 'Wiek matki' to 50
-        df["Wiek matki"] = df["Wiek matki"].replace("12 i mniej", 12)
-        df["Wiek matki"] = df["Wiek matki"].replace("50 i więcej", 50)
-
-        # convert wiek matki to int, just in case
-        df["Wiek matki"] = df["Wiek matki"].astype(int)
-
-        # drop columns Jednostka miary,Atrybut
-        df = df.drop(columns=["Jednostka miary", "Atrybut"])
-
-        # add column with sum of births in each year for every Kod
-        df["Suma urodzeń"] = df.groupby(["Code", "Year"])["Value"].transform("sum")
-
-        # divide Wartosc by Suma urodzeń as 'odsetek urodzeń w danym wieku matki'
-        df["odsetek urodzeń w danym wieku matki"] = df["Value"] / df["Suma urodzeń"]
-
-        # multiply odsetek urodzeń w danym wieku matki by wiek matki as 'Wiek ważony'
-        df["Value"] = df["odsetek urodzeń w danym wieku matki"] * df["Wiek matki"]
-
-        df["Indicator"] = "Średni wiek matki"
-
-        # sum Wiek ważony for every Kod and Rok, group by Kod and Rok, keep only Wiek ważony
-        df = df.groupby(['Code', 'Name', 'Year', 'Indicator', 'Indicator code'])['Value'].sum().reset_index()
-
-        return df
-
-    def process_3923(self, df):
-        """
-        Process indicator 3923 dataframe.
-        """
-        # Continue with your data processing using the optimized code
-        df = (
-            df
-            .pivot(index=['Code', 'Name', 'Year', 'Indicator code'], columns='Małżeńskie/pozamałżeńskie', values='Value')
-            .reset_index()
-            .dropna()
-        )
-        
-        # convert urodzenia żywe pozamałżeńskie to numeric with coerce
-        df['urodzenia żywe pozamałżeńskie'] = pd.to_numeric(df['urodzenia żywe pozamałżeńskie'], errors='coerce')
-
-        # Set the name of the DataFrame, reset column name, filter NA values, change data type, calculate ratio, subset columns
-        df.name = 'odsetek urodzeń pozamałżeńskich'
-        df.columns.name = None
-        df = df.dropna()
-        df['urodzenia żywe pozamałżeńskie'] = df['urodzenia żywe pozamałżeńskie'].astype(int)
-        df['Value'] = df['urodzenia żywe pozamałżeńskie'] / (df['urodzenia żywe pozamałżeńskie'] + df['urodzenia żywe małżeńskie'])
-        
-        df['Indicator'] = 'odsetek urodzeń pozamałżeńskich'
-
-        return df
-    
-    def process_4112(self, df):
-        """
-        Process indicator 4112 dataframe.
-        """
-        # optimize data processing
-        df = (
-            # subset df to where column 'Płeć' == 'ogółem'
-            df[df['Płeć'] == 'ogółem']
-            # delete Płeć column
-            .drop(columns=['Płeć'])
-        )
-
-        df['Indicator'] = 'Wskaźnik zatrudnienia'
-
-        return df
+    # subset after indicator info -> indicator columns don't have to exist before
+    if 'subset' in kwargs:
+        indicator.df = indicator.df[kwargs['subset']]
 
+    # compact schema after indicator info -> indicator columns are categorical too
+    if 'compact' in kwargs:
+        indicator.df = compact_df(indicator.df, **kwargs['compact'])
+    
+    return indicator.df
 
+@instrumented(
+    'custom_processing',
+    before=lambda indicator: {'indicator': indicator.code, 'rows_in': len(indicator.df)},
+    after=lambda df, indicator: {'rows_out': len(df)},
+)
 def custom_processing(indicator):
     """
-    Custom processing function for indicators.
+    Custom processing of indicators with a transform spec in TRANSFORMS.
     """
-    processor = IndicatorProcessor()
-
-    if indicator.code in ['2167', '3923', '4112']:
-        indicator.df = processor.__getattribute__(f'process_{indicator.code}')(indicator.df)
+    if indicator.code in TRANSFORMS:
+        indicator.df = transform_plan(indicator.code)(indicator.df)
     else:
-        logging.error(f'No custom processing function defined for indicator {indicator.code}.')
+        logging.info(f'No transform defined for indicator {indicator.code}, kept as is.')
 
-    return indicator.df
\ No newline at end of file
+    return indicator.df
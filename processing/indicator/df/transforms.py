@@ -0,0 +1,320 @@
+import logging
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+__all__ = ['TRANSFORMS', 'OPERATIONS', 'TransformPlan', 'transform_plan']
+
+# ------------------------------- transform specs ------------------------------ #
+
+# steps applied to an indicator df after general processing, in order
+# 'filter' -> keep rows where column == value (or value in list)
+# 'drop' -> drop columns
+# 'pivot' -> one column per value of 'columns', optionally drop rows with missing values
+# 'ratio' -> output = sum(numerator columns) / sum(denominator columns)
+# 'mean' -> output = mean of columns, e.g. of pivoted dimension values
+# 'weighted_mean' -> output = sum(value * weight) / sum(weight) per 'by' group
+# 'label' -> set the indicator name
+TRANSFORMS = {
+    # mean mother's age
+    '2167': [
+        {'weighted_mean': {
+            'by': ['Code', 'Year'],
+            'keep': ['Name', 'Indicator code'],
+            'value': 'Wiek matki',
+            'value_map': {'12 i mniej': 12, '50 i więcej': 50},
+            'weight': 'Value',
+        }},
+        {'label': 'Średni wiek matki'},
+    ],
+    # share of births outside marriage
+    '3923': [
+        {'pivot': {
+            'index': ['Code', 'Name', 'Year', 'Indicator code'],
+            'columns': 'Małżeńskie/pozamałżeńskie',
+            'values': 'Value',
+            'dropna': True,
+        }},
+        {'ratio': {
+            'numerator': ['urodzenia żywe pozamałżeńskie'],
+            'denominator': ['urodzenia żywe pozamałżeńskie', 'urodzenia żywe małżeńskie'],
+        }},
+        {'label': 'odsetek urodzeń pozamałżeńskich'},
+    ],
+    # employment rate, both sexes
+    '4112': [
+        {'filter': {'Płeć': 'ogółem'}},
+        {'drop': ['Płeć']},
+        {'label': 'Wskaźnik zatrudnienia'},
+    ],
+    # healthy life expectancy, exported per sex only -> mean of both sexes where both are known
+    '3895': [
+        {'pivot': {
+            'index': ['Code', 'Name', 'Year', 'Indicator code'],
+            'columns': 'Płeć',
+            'values': 'Value',
+            'dropna': True,
+        }},
+        {'mean': {'columns': ['kobiety', 'mężczyźni']}},
+        {'label': 'Oczekiwane trwanie życia w zdrowiu, średnia kobiet i mężczyzn'},
+    ],
+}
+
+# ------------------------------------- < ------------------------------------ #
+
+
+# --------------------------------- operations -------------------------------- #
+
+def condition_mask(df, column, value) -> np.ndarray:
+    if isinstance(value, (list, tuple, set)):
+        return df[column].isin(list(value)).to_numpy()
+    return (df[column] == value).to_numpy()
+
+
+def select(df, conditions=(), drop=()) -> pd.DataFrame:
+    """
+    Filter rows and drop columns with a single copy.
+
+    Args:
+        df (pd.DataFrame): The df.
+        conditions (list): (column, value) pairs, all of them have to match.
+        drop (list): Columns to drop.
+
+    Returns:
+        pd.DataFrame: The selected part of df.
+    """
+    columns = [column for column in df.columns if column not in drop]
+
+    if not conditions:
+        return df[columns]
+
+    mask = condition_mask(df, *conditions[0])
+    for column, value in conditions[1:]:
+        mask &= condition_mask(df, column, value)
+
+    return df.loc[mask, columns]
+
+
+def pivot(df, index, columns, values='Value', dropna=False) -> pd.DataFrame:
+    df = df.pivot(index=index, columns=columns, values=values).reset_index()
+    df.columns.name = None
+    return df.dropna() if dropna else df
+
+
+def ratio(df, numerator, denominator, output='Value') -> pd.DataFrame:
+    # column sums on arrays, no intermediate columns
+    numerator_values = sum(df[column].to_numpy(dtype=float) for column in numerator)
+    denominator_values = sum(df[column].to_numpy(dtype=float) for column in denominator)
+    df[output] = numerator_values / denominator_values
+    return df
+
+
+def mean(df, columns, output='Value') -> pd.DataFrame:
+    df[output] = np.mean([df[column].to_numpy(dtype=float) for column in columns], axis=0)
+    return df
+
+
+# per-group sums of a weighted mean, combinable across chunks
+WEIGHTED_SUM = '_weighted_sum'
+WEIGHT_SUM = '_weight_sum'
+
+
+def weighted_mean_partial(df, by, value, weight='Value', keep=(), value_map=None, **_) -> pd.DataFrame:
+    """
+    Per-group sums of a weighted mean, in one grouping step over NumPy arrays.
+
+    Args:
+        df (pd.DataFrame): The df.
+        by (list): Group columns.
+        value (str): Column to average, e.g. 'Wiek matki'.
+        weight (str): Weight column, missing weights count as 0.
+        keep (list): Columns constant within a group, taken from its first row.
+        value_map (dict): Labels of value to replace before averaging, e.g. {'12 i mniej': 12}.
+
+    Returns:
+        pd.DataFrame: One row per group with by, keep, WEIGHTED_SUM and WEIGHT_SUM columns.
+    """
+    # labels are converted once per distinct value, then spread to rows
+    value_labels, value_uniques = pd.factorize(df[value])
+    if value_map:
+        # few distinct labels -> plain lookup, no dtype downcasting of replace
+        value_uniques = [value_map.get(value_unique, value_unique) for value_unique in value_uniques]
+    values = pd.Series(value_uniques, dtype=object).astype(float).to_numpy()[value_labels]
+
+    weights = np.nan_to_num(df[weight].to_numpy(dtype=float))
+
+    # one grouping step -> group id of every row
+    group_ids = df.groupby(by, observed=True, sort=True).ngroup().to_numpy()
+
+    weight_sum = np.bincount(group_ids, weights=weights)
+    weighted_sum = np.bincount(group_ids, weights=values * weights)
+
+    # index of the first row of every group, in group id order
+    first_rows = np.unique(group_ids, return_index=True)[1]
+
+    df = df.iloc[first_rows][list(by) + list(keep)].reset_index(drop=True)
+    df[WEIGHTED_SUM] = weighted_sum
+    df[WEIGHT_SUM] = weight_sum
+    return df
+
+
+def weighted_mean_combine(df, by, keep=(), **_) -> pd.DataFrame:
+    # partial sums of the same group from several chunks -> one row
+    return df.groupby(by, observed=True, sort=True).agg(**{
+        **{column: (column, 'first') for column in keep},
+        WEIGHTED_SUM: (WEIGHTED_SUM, 'sum'),
+        WEIGHT_SUM: (WEIGHT_SUM, 'sum'),
+    }).reset_index()
+
+
+def weighted_mean_finish(df, output='Value', **_) -> pd.DataFrame:
+    weight_sum = df[WEIGHT_SUM].to_numpy()
+
+    # groups without weight get 0
+    df[output] = np.divide(df[WEIGHTED_SUM].to_numpy(), weight_sum, out=np.zeros_like(weight_sum), where=weight_sum > 0)
+    return df.drop(columns=[WEIGHTED_SUM, WEIGHT_SUM])
+
+
+def weighted_mean(df, by, value, weight='Value', keep=(), value_map=None, output='Value') -> pd.DataFrame:
+    """
+    Weighted mean of a column per group.
+
+    Args:
+        df (pd.DataFrame): The df.
+        by (list): Group columns.
+        value (str): Column to average, e.g. 'Wiek matki'.
+        weight (str): Weight column, missing weights count as 0.
+        keep (list): Columns constant within a group, taken from its first row.
+        value_map (dict): Labels of value to replace before averaging, e.g. {'12 i mniej': 12}.
+        output (str): Column to store the mean in.
+
+    Returns:
+        pd.DataFrame: One row per group with by, keep and output columns.
+    """
+    return weighted_mean_finish(weighted_mean_partial(df, by, value, weight, keep, value_map), output)
+
+
+def label(df, name, column='Indicator') -> pd.DataFrame:
+    df[column] = name
+    return df
+
+
+OPERATIONS = {
+    'select': select,
+    'pivot': pivot,
+    'ratio': ratio,
+    'mean': mean,
+    'weighted_mean': weighted_mean,
+    'label': label,
+}
+
+# operations on single rows -> can run on every chunk of a streamed df
+ROW_OPERATIONS = {'select', 'ratio', 'mean', 'label'}
+
+# ------------------------------------- < ------------------------------------ #
+
+
+# ----------------------------------- planner --------------------------------- #
+
+class TransformPlan:
+    """
+    Transform spec compiled into a minimal sequence of operations.
+
+    Consecutive 'filter' and 'drop' steps are fused into one 'select', so rows
+    are masked once and the df is copied once; consecutive labels collapse to
+    the last one.
+    """
+
+    def __init__(self, steps):
+        self.steps = steps
+        self.operations = self.compile(steps)
+
+    @staticmethod
+    def compile(steps) -> list:
+        operations = []
+
+        for step in steps:
+            (name, params), = step.items()
+            previous_name, previous_params = operations[-1] if operations else (None, None)
+
+            if name in ('filter', 'drop'):
+                # fuse into the previous select if there is one
+                if previous_name != 'select':
+                    previous_params = {'conditions': [], 'drop': []}
+                    operations.append(('select', previous_params))
+                if name == 'filter':
+                    previous_params['conditions'].extend(params.items())
+                else:
+                    previous_params['drop'].extend(params)
+            elif name == 'label' and previous_name == 'label':
+                operations[-1] = ('label', {'name': params})
+            elif name == 'label':
+                operations.append(('label', {'name': params}))
+            elif name in OPERATIONS:
+                operations.append((name, params))
+            else:
+                raise ValueError(f"Unknown transform step {name}.")
+
+        return operations
+
+    @staticmethod
+    def run(operations, df) -> pd.DataFrame:
+        # shallow copy -> setting columns never touches the caller's df
+        df = df.copy(deep=False)
+
+        for name, params in operations:
+            df = OPERATIONS[name](df, **params)
+
+        return df
+
+    def __call__(self, df) -> pd.DataFrame:
+        return self.run(self.operations, df)
+
+    def stream(self, chunks, concat) -> pd.DataFrame:
+        """
+        Apply the plan to a df arriving in chunks.
+
+        Leading row operations run on every chunk as it arrives. A weighted
+        mean right after them is reduced per chunk to partial sums, combined
+        once all chunks are read. The remaining operations run on the
+        combined result.
+
+        Args:
+            chunks (iterable): DataFrame chunks.
+            concat (callable): Combines a list of chunk results into one df.
+
+        Returns:
+            pd.DataFrame: Same rows as calling the plan on the whole df.
+        """
+        split = next((i for i, (name, _) in enumerate(self.operations) if name not in ROW_OPERATIONS), len(self.operations))
+        row_operations, operations = self.operations[:split], self.operations[split:]
+
+        reduce_params = None
+        if operations and operations[0][0] == 'weighted_mean':
+            (_, reduce_params), operations = operations[0], operations[1:]
+
+        results = []
+        for chunk in chunks:
+            chunk = self.run(row_operations, chunk)
+            if reduce_params is not None:
+                chunk = weighted_mean_partial(chunk, **reduce_params)
+            results.append(chunk)
+
+        df = concat(results)
+        if reduce_params is not None:
+            df = weighted_mean_finish(weighted_mean_combine(df, **reduce_params), **reduce_params)
+
+        return self.run(operations, df)
+
+    def __str__(self) -> str:
+        return ' -> '.join(name for name, _ in self.operations)
+
+
+@lru_cache(maxsize=None)
+def transform_plan(code) -> TransformPlan:
+    plan = TransformPlan(TRANSFORMS[code])
+    logging.debug(f"transform plan for indicator {code}: {plan}")
+    return plan
+
+# ------------------------------------- < ------------------------------------ #
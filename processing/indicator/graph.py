@@ -0,0 +1,175 @@
+# dependency graph of derived indicators
+
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from . import create_new_indicator
+
+
+def newest_indicators(indicators) -> dict:
+    """
+    Keep the newest export of every indicator code.
+
+    Args:
+        indicators (list): Indicator objects, possibly several of one code.
+
+    Returns:
+        dict: Indicator code -> Indicator, in the order codes first appear.
+    """
+    results = {}
+    for indicator in indicators:
+        if indicator.code in results:
+            previous = results[indicator.code]
+            logging.warning(f"Indicator {indicator.code} loaded more than once, the newest export is used.")
+            if None not in (previous.timestamp, indicator.timestamp) and previous.timestamp > indicator.timestamp:
+                continue
+        results[indicator.code] = indicator
+    return results
+
+
+class IndicatorGraph:
+    """
+    Dependency graph of indicators derived with instructions.
+
+    Every instruction is a node, its 'codes' are the edges. A code can point
+    to a loaded indicator or to another instruction, so derived indicators can
+    depend on derived ones. Nodes are computed level by level in topological
+    order, each exactly once; nodes of the same level run concurrently.
+    """
+
+    def __init__(self, instructions):
+        self.instructions = {}
+
+        for instruction in instructions:
+            code = self.node_code(instruction)
+            if code in self.instructions:
+                raise ValueError(f"Instruction {code} is defined more than once.")
+            self.instructions[code] = instruction
+
+        self.levels = self.topological_levels()
+
+    # code of the derived indicator -> same default as in create_new_indicator
+    @staticmethod
+    def node_code(instruction) -> str:
+        return instruction.get('code', '-'.join(instruction['codes']))
+
+    def dependencies(self, code) -> list:
+        return self.instructions[code]['codes']
+
+    # codes used as input by the instructions in produced, by any instruction if None
+    def consumed_codes(self, produced=None) -> set:
+        return {
+            dependency
+            for code in self.instructions if produced is None or code in produced
+            for dependency in self.dependencies(code)
+        }
+
+    def affected(self, codes) -> set:
+        """
+        Instructions depending on any of codes, directly or through other instructions.
+
+        Args:
+            codes (iterable): Changed indicator codes.
+
+        Returns:
+            set: Instruction codes.
+        """
+        codes = set(codes)
+        affected = set()
+        for level in self.levels:
+            for code in level:
+                if any(dependency in codes or dependency in affected for dependency in self.dependencies(code)):
+                    affected.add(code)
+        return affected
+
+    def topological_levels(self) -> list:
+        """
+        Group instructions into levels; a level depends only on the levels before it.
+
+        Returns:
+            list: Lists of instruction codes.
+        """
+        # only dependencies on other instructions matter, loaded indicators are always ready
+        remaining = {
+            code: {dependency for dependency in self.dependencies(code) if dependency in self.instructions}
+            for code in self.instructions
+        }
+
+        levels = []
+        while remaining:
+            ready = [code for code, dependencies in remaining.items() if not dependencies]
+            if not ready:
+                raise ValueError(f"Instructions depend on each other in a cycle: {sorted(remaining)}.")
+
+            levels.append(ready)
+            for code in ready:
+                del remaining[code]
+            for dependencies in remaining.values():
+                dependencies.difference_update(ready)
+
+        return levels
+
+    def compute_node(self, code, results):
+        return create_new_indicator([results[dependency] for dependency in self.dependencies(code)], self.instructions[code])
+
+    def compute(self, indicators, workers=1, nodes=None) -> dict:
+        """
+        Compute derived indicators.
+
+        Args:
+            indicators (list): Loaded Indicator objects.
+            workers (int): Number of threads computing independent nodes, None for the default.
+            nodes (iterable): Instruction codes to compute, all if None.
+
+        Returns:
+            dict: Indicator code -> Indicator, loaded indicators first, then derived ones in topological order.
+        """
+        # several exports of one indicator -> newest export wins
+        results = newest_indicators(indicators)
+        nodes = set(self.instructions if nodes is None else nodes)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for level in self.levels:
+
+                # nodes with missing inputs are skipped, and so are nodes depending on them
+                computable = []
+                for code in level:
+                    if code not in nodes:
+                        continue
+                    if code in results:
+                        raise ValueError(f"Derived indicator {code} has the code of a loaded indicator.")
+
+                    missing = [dependency for dependency in self.dependencies(code) if dependency not in results]
+                    if missing:
+                        logging.error(f"Indicator {code} not created, missing indicators: {missing}.")
+                    else:
+                        computable.append(code)
+
+                # every node in a copy of the context -> its stages are recorded in the run report
+                futures = [
+                    executor.submit(contextvars.copy_context().run, self.compute_node, code, results)
+                    for code in computable
+                ]
+                for code, future in zip(computable, futures):
+                    results[code] = future.result()
+
+        return results
+
+    def outputs(self, indicators, workers=1) -> list:
+        """
+        Compute derived indicators and return indicators that belong in master_df.
+
+        Indicators used as input of an instruction are replaced by the derived
+        indicator; if it could not be created, they are kept.
+
+        Args:
+            indicators (list): Loaded Indicator objects.
+            workers (int): Number of threads computing independent nodes.
+
+        Returns:
+            list: Indicator objects.
+        """
+        results = self.compute(indicators, workers)
+        consumed = self.consumed_codes(results)
+        return [indicator for code, indicator in results.items() if code not in consumed]
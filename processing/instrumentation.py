@@ -0,0 +1,427 @@
+# per-stage instrumentation of the pipeline -> JSON run report
+
+import contextvars
+import cProfile
+import functools
+import json
+import logging
+import os
+import resource
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+__all__ = ['RunReport', 'instrumented', 'report_stage', 'run_report', 'active_report', 'report_options', 'map_in_workers']
+
+# report of the current run, None -> instrumented functions run as they are
+# a context variable -> concurrent runs in threads or tasks each record into their own report
+ACTIVE_REPORT = contextvars.ContextVar('active_report', default=None)
+
+# enable the report without changing calls, e.g. BDL_RUN_REPORT=run.json BDL_PROFILE=custom_processing
+REPORT_ENV = 'BDL_RUN_REPORT'
+PROFILE_ENV = 'BDL_PROFILE'
+PROFILER_ENV = 'BDL_PROFILER'
+TRACE_MEMORY_ENV = 'BDL_TRACE_MEMORY'
+
+
+# ------------------------------------ memory ----------------------------------- #
+
+def rss_mib() -> float:
+    # current resident set size; peak RSS where /proc is not available
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError, IndexError):
+        return max_rss_mib()
+
+
+def max_rss_mib() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+# ------------------------------------- < ------------------------------------ #
+
+
+# ------------------------------------ report ----------------------------------- #
+
+class RunReport:
+    """
+    Records of instrumented pipeline stages in one run.
+
+    Every call of an instrumented function is a record with its stage,
+    indicator code, wall time, rows in and out, RSS change, how much the stage
+    raised the peak RSS of its process and, with trace_memory, the peak of
+    traced allocations (nested stages included). Stages listed in profile run
+    under a profiler; profiles are saved in profile_path and referenced from
+    the record.
+
+    Stages run in worker processes through map_in_workers are recorded with
+    the worker's pid; stages in threads are recorded if the thread runs in a
+    copy of the context, but their traced memory peaks overlap.
+
+    Args:
+        trace_memory (bool): Trace allocations with tracemalloc, slows stages down.
+        profile (iterable): Stage names to profile, 'all' for every stage.
+        profile_path (str): Folder for profiles.
+        profiler (str): 'cprofile' or 'pyinstrument' (must be installed).
+        worker (int): pid of the worker process recording the report, None in the main process.
+    """
+
+    def __init__(self, trace_memory=False, profile=(), profile_path=None, profiler='cprofile', worker=None):
+        self.trace_memory = trace_memory
+        self.profile = {profile} if isinstance(profile, str) else set(profile)
+        self.profile_path = profile_path
+        self.profiler = profiler
+        self.worker = worker
+        self.records = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.started = None
+        self.finished = None
+
+    # ----------------------------------- stages ---------------------------------- #
+
+    def stack(self) -> list:
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = []
+        return self.local.stack
+
+    def profiled(self, stage) -> bool:
+        return 'all' in self.profile or stage in self.profile
+
+    @contextmanager
+    def stage(self, stage, **fields):
+        """
+        Record a stage.
+
+        Args:
+            stage (str): Stage name.
+            **fields: Known fields of the record, e.g. indicator or rows_in.
+
+        Yields:
+            dict: The record; fields known only afterwards (rows_out) are set on it.
+        """
+        record = {'stage': stage, **fields}
+        if self.worker is not None:
+            record['worker'] = self.worker
+        stack = self.stack()
+        frame = {'record': record, 'peak': 0}
+
+        if self.trace_memory:
+            # the parent's peak so far is kept before the peak is reset for this stage
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+            tracemalloc.reset_peak()
+            frame['traced_start'] = current
+
+        profiler = None
+        if self.profiled(stage) and not any('profiler' in parent for parent in stack):
+            profiler = self.start_profiler()
+            frame['profiler'] = profiler
+
+        stack.append(frame)
+        rss_start = rss_mib()
+        max_rss_start = max_rss_mib()
+        start = time.perf_counter()
+        try:
+            yield record
+        except BaseException as error:
+            record['error'] = repr(error)
+            raise
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            rss_end = rss_mib()
+            record['rss_mib'] = round(rss_end, 1)
+            # net change -> memory the stage kept, not what it used meanwhile
+            record['rss_delta_mib'] = round(rss_end - rss_start, 1)
+            # the process peak can only be raised -> 0 if the stage stayed below an earlier peak
+            record['max_rss_delta_mib'] = round(max_rss_mib() - max_rss_start, 1)
+            stack.pop()
+
+            if self.trace_memory:
+                peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+                tracemalloc.reset_peak()
+                if stack:
+                    stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+                record['traced_peak_mib'] = round((peak - frame['traced_start']) / 1024 ** 2, 2)
+
+            if profiler is not None:
+                record['profile'] = self.stop_profiler(profiler, record)
+
+            with self.lock:
+                self.records.append(record)
+
+    # ---------------------------------- profiling -------------------------------- #
+
+    def start_profiler(self):
+        if self.profiler == 'pyinstrument':
+            # optional dependency, only needed when asked for
+            from pyinstrument import Profiler
+            profiler = Profiler()
+        else:
+            profiler = cProfile.Profile()
+        profiler.start() if self.profiler == 'pyinstrument' else profiler.enable()
+        return profiler
+
+    def stop_profiler(self, profiler, record) -> str:
+        os.makedirs(self.profile_path, exist_ok=True)
+        parts = (record['stage'], record.get('indicator'), self.worker, len(self.records))
+        name = '_'.join(str(part) for part in parts if part is not None)
+
+        if self.profiler == 'pyinstrument':
+            profiler.stop()
+            path = os.path.join(self.profile_path, f'{name}.html')
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(profiler.output_html())
+        else:
+            profiler.disable()
+            path = os.path.join(self.profile_path, f'{name}.prof')
+            profiler.dump_stats(path)
+        return path
+
+    # ----------------------------------- workers --------------------------------- #
+
+    def options(self) -> dict:
+        # picklable settings of the reports of worker processes
+        return {
+            'trace_memory': self.trace_memory,
+            'profile': sorted(self.profile),
+            'profile_path': self.profile_path,
+            'profiler': self.profiler,
+        }
+
+    def merge(self, records):
+        # records of a worker process, as they come back with its results
+        with self.lock:
+            self.records.extend(records)
+
+    # ----------------------------------- output ---------------------------------- #
+
+    def summary(self) -> dict:
+        # totals per stage and per indicator
+        stages = {}
+        indicators = {}
+        for record in self.records:
+            totals = stages.setdefault(record['stage'], {'calls': 0, 'seconds': 0.0, 'rows_in': 0, 'rows_out': 0})
+            totals['calls'] += 1
+            totals['seconds'] += record['seconds']
+            totals['rows_in'] += record.get('rows_in') or 0
+            totals['rows_out'] += record.get('rows_out') or 0
+
+            if record.get('indicator') is not None:
+                indicator = indicators.setdefault(str(record['indicator']), {})
+                indicator[record['stage']] = indicator.get(record['stage'], 0.0) + record['seconds']
+
+        return {'stages': stages, 'indicators': indicators}
+
+    def to_dict(self, hot_spots=10) -> dict:
+        return {
+            'started': self.started,
+            'finished': self.finished,
+            'seconds': sum(record['seconds'] for record in self.records if record['stage'] == 'run'),
+            'max_rss_mib': round(max_rss_mib(), 1),
+            'trace_memory': self.trace_memory,
+            **self.summary(),
+            # slowest indicator-level calls
+            'hot_spots': sorted(
+                (record for record in self.records if record.get('indicator') is not None),
+                key=lambda record: record['seconds'],
+                reverse=True,
+            )[:hot_spots],
+            'records': self.records,
+        }
+
+    def save(self, report_path) -> str:
+        os.makedirs(os.path.dirname(os.path.abspath(report_path)), exist_ok=True)
+        temporary_path = f'{report_path}.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            json.dump(self.to_dict(), file, ensure_ascii=False, indent=2, default=str)
+        os.replace(temporary_path, report_path)
+        return report_path
+
+# ------------------------------------- < ------------------------------------ #
+
+
+# ---------------------------------- activation --------------------------------- #
+
+def active_report() -> RunReport:
+    return ACTIVE_REPORT.get()
+
+
+def report_options(report_path=None, profile=None, trace_memory=None, profiler=None, default_report_path='run_report.json') -> dict:
+    """
+    Options of run_report from arguments, or from environment variables where not given.
+
+    BDL_RUN_REPORT is the report path, BDL_PROFILE comma separated stages
+    (or 'all'), BDL_PROFILER 'cprofile' or 'pyinstrument' and
+    BDL_TRACE_MEMORY=1 turns tracemalloc on.
+
+    Args:
+        report_path (str): Path of the report.
+        profile (iterable): Stages to profile.
+        trace_memory (bool): Trace allocations.
+        profiler (str): Profiler of profiled stages.
+        default_report_path (str): Report path if profiling or tracing is asked for without one.
+
+    Returns:
+        dict: Keyword arguments of run_report, empty if nothing was asked for.
+    """
+    report_path = report_path or os.environ.get(REPORT_ENV) or None
+    if profile is None:
+        profile = [stage.strip() for stage in os.environ.get(PROFILE_ENV, '').split(',') if stage.strip()]
+    if trace_memory is None:
+        trace_memory = os.environ.get(TRACE_MEMORY_ENV, '').lower() in ('1', 'true', 'yes')
+    profiler = profiler or os.environ.get(PROFILER_ENV) or 'cprofile'
+
+    if not (report_path or profile or trace_memory):
+        return {}
+
+    return {
+        'report_path': report_path or default_report_path,
+        'trace_memory': trace_memory,
+        'profile': profile,
+        'profiler': profiler,
+    }
+
+
+@contextmanager
+def run_report(report_path=None, trace_memory=False, profile=(), profile_path=None, profiler='cprofile'):
+    """
+    Instrument everything run inside the block.
+
+    Args:
+        report_path (str): Save the JSON report here when the block ends, None to only return it.
+        trace_memory (bool): See RunReport.
+        profile (iterable): See RunReport.
+        profile_path (str): Folder for profiles, next to the report by default.
+        profiler (str): See RunReport.
+
+    Yields:
+        RunReport: The report.
+    """
+    if profile_path is None:
+        profile_path = os.path.join(os.path.dirname(os.path.abspath(report_path or 'run_report.json')), 'profiles')
+
+    report = RunReport(trace_memory, profile, profile_path, profiler)
+    token = ACTIVE_REPORT.set(report)
+
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+
+    report.started = datetime.now().isoformat(timespec='seconds')
+    try:
+        with report.stage('run'):
+            yield report
+    finally:
+        report.finished = datetime.now().isoformat(timespec='seconds')
+        if started_tracing:
+            tracemalloc.stop()
+        ACTIVE_REPORT.reset(token)
+        if report_path is not None:
+            report.save(report_path)
+            logging.info(f"run report saved to {report_path}")
+
+
+@contextmanager
+def report_stage(stage, **fields):
+    """
+    Record a block as a stage of the active run report.
+
+    Args:
+        stage (str): Stage name.
+        **fields: Known fields of the record.
+
+    Yields:
+        dict: The record, a throwaway dict without an active report.
+    """
+    report = ACTIVE_REPORT.get()
+    if report is None:
+        yield dict(fields)
+        return
+
+    with report.stage(stage, **fields) as record:
+        yield record
+
+
+def instrumented(stage, before=None, after=None):
+    """
+    Record calls of a function as a stage of the active run report.
+
+    Without an active report the function is called directly.
+
+    Args:
+        stage (str): Stage name.
+        before (callable): (*args, **kwargs) -> dict of record fields known
+            before the call, e.g. indicator and rows_in.
+        after (callable): (result, *args, **kwargs) -> dict of fields known
+            after the call, e.g. rows_out.
+
+    Returns:
+        callable: The decorator.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            report = ACTIVE_REPORT.get()
+            if report is None:
+                return function(*args, **kwargs)
+
+            with report.stage(stage, **(before(*args, **kwargs) if before else {})) as record:
+                result = function(*args, **kwargs)
+                if after:
+                    record.update(after(result, *args, **kwargs))
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def call_in_worker(options, function, argument) -> tuple:
+    # runs in a worker process: a report of its own, its records go back with the result
+    if options is None:
+        return function(argument), []
+
+    report = RunReport(**options, worker=os.getpid())
+    token = ACTIVE_REPORT.set(report)
+    started_tracing = report.trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    try:
+        return function(argument), report.records
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+        ACTIVE_REPORT.reset(token)
+
+
+def map_in_workers(executor, function, iterable) -> list:
+    """
+    executor.map over a process pool, recording the stages run in the workers.
+
+    With an active report every call runs under a report of its own in the
+    worker, and its records are merged into the active report.
+
+    Args:
+        executor (ProcessPoolExecutor): The pool.
+        function (callable): Picklable function of one argument.
+        iterable (iterable): Arguments.
+
+    Returns:
+        list: Results in the order of iterable.
+    """
+    report = ACTIVE_REPORT.get()
+    options = report.options() if report is not None else None
+
+    results = []
+    for result, records in executor.map(functools.partial(call_in_worker, options, function), iterable):
+        if report is not None:
+            report.merge(records)
+        results.append(result)
+    return results
+
+# ------------------------------------- < ------------------------------------ #
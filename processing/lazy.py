@@ -0,0 +1,45 @@
+# lazy package namespaces -> submodules are imported when one of their names is used
+
+import importlib
+
+
+def lazy_exports(package, submodules):
+    """
+    Module __getattr__ of a package exporting the public names of its submodules.
+
+    Replaces `from .submodule import *` in the package __init__: importing the
+    package (e.g. to reach one light submodule) doesn't import the heavy ones,
+    while `package.name` and `from package import *` work as before. As with
+    star imports, a name in a later submodule wins.
+
+    Args:
+        package (str): __name__ of the package.
+        submodules (list): Submodules whose names are exported, in import order.
+
+    Returns:
+        callable: The __getattr__ of the package.
+    """
+    def public_names(module) -> list:
+        return getattr(module, '__all__', None) or [name for name in vars(module) if not name.startswith('_')]
+
+    def __getattr__(name):
+        if name in submodules:
+            return importlib.import_module(f'.{name}', package)
+
+        # star import of the package -> every submodule is imported
+        if name == '__all__':
+            return sorted({
+                exported
+                for submodule in submodules
+                for exported in public_names(importlib.import_module(f'.{submodule}', package))
+            })
+
+        if not name.startswith('__'):
+            for submodule in reversed(submodules):
+                module = importlib.import_module(f'.{submodule}', package)
+                if name in public_names(module):
+                    return getattr(module, name)
+
+        raise AttributeError(f"module {package!r} has no attribute {name!r}")
+
+    return __getattr__
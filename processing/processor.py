@@ -1,35 +1,38 @@
 # ---------------------------------- imports --------------------------------- #
 
+import asyncio
 import pandas as pd
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 import logging
 import os
+import sys
 
 # local
 from paths import paths
 from processing import *
 from .zip.manage_files import ZipFileManager
+from .indicator.graph import IndicatorGraph, newest_indicators
+from .indicator.df import transforms
+from .bdl import fetch_indicators
+from .store import MASTER_DF_DATASET, IndicatorStore, master_df_exists, read_master_df, rollup_master_df, save_cube, save_master_df_to_parquet, save_rollup
 
 # ---------------------------------- globals --------------------------------- #
 
+# run report of main, next to the dataset
+REPORT_FILE = 'run_report.json'
+
 INSTRUCTIONS = [
     {
         'codes': ['1869', '3787'],
-        'merge': {
-            'on': ["Code", "Year", "Name"],
+        # value columns are named after indicator codes -> Value_1869, Value_3787
+        'join': {
+            'on': ["Code", "Year"],
             'how': 'inner',
         },
-        'rename': {
-            'columns': {
-                'Indicator code_x': 'Indicator code',
-                'Indicator_x': 'Indicator',
-                },
-        },
-        'type': {
-            'Indicator code': str,
-            'Indicator': str
-        },
         'operations': {
-            'Value': lambda x: x['Value_y'] / x['Value_x']
+            'Value': 'Value_1869 / Value_3787'
         },
         'name': 'Obciążenie zakupem mieszkania',
         # 'code': '1869-3787',
@@ -38,6 +41,7 @@ INSTRUCTIONS = [
 
 # ---------------------------------- functions --------------------------------- #
 
+@instrumented('extract_file', before=lambda file_path, output_path: {'file': os.path.basename(file_path)})
 def extract_file(file_path, output_path):
     zip_manager = ZipFileManager(file_path, output_path)
     zip_manager.extract_with_progress()
@@ -59,7 +63,13 @@ def create_files(folder_path):
 
 
 def excel_file_data_to_indicator(processor: ExcelFileProcessor,
-                                     file: ExcelFile) -> Indicator:
+                                     file: ExcelFile, chunk_size=None) -> Indicator:
+    # stream values in chunks -> memory bounded by chunk_size, not by the sheet
+    if chunk_size:
+        indicator, chunks = processor.stream_file(file, chunk_size)
+        indicator.df = process_indicator_chunks(indicator, chunks)
+        return indicator
+
     # load file
     processor.load_file(file)
 
@@ -70,118 +80,275 @@ def excel_file_data_to_indicator(processor: ExcelFileProcessor,
     return indicator
 
 
+# create indicator with a processor of its own -> safe to run in worker processes
+def file_to_indicator(file: ExcelFile, chunk_size=None) -> Indicator:
+    return excel_file_data_to_indicator(ExcelFileProcessor(), file, chunk_size)
+
+
+def files_to_indicators(excel_files, workers=1, chunk_size=None) -> list:
+    """
+    Create indicators from excel files, optionally in a process pool.
+
+    Args:
+        excel_files (iterable): ExcelFile objects, read from disk or in memory.
+        workers (int): Number of worker processes. 1 parses in the current
+            process, None uses all available cores.
+        chunk_size (int): Stream sheets in chunks of this many rows instead of
+            reading them at once. Defaults to None (read at once).
+
+    Returns:
+        list: Indicator objects in the same order as excel_files.
+    """
+    if workers == 1:
+        # one processor is reused for every file
+        processor = ExcelFileProcessor()
+        return [excel_file_data_to_indicator(processor, file, chunk_size) for file in excel_files]
+
+    # map keeps the input order regardless of which worker finishes first, stages of the workers go to the run report
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return map_in_workers(executor, partial(file_to_indicator, chunk_size=chunk_size), excel_files)
+
+
 # create, process and delete files
-def excel_files_to_indicators(output_path) -> list:
+def excel_files_to_indicators(output_path, workers=1, chunk_size=None) -> list:
 
     # create files = list of excel files in folder, using xlsx_files_in_folder
     excel_files = create_files(output_path)
 
-    # for every excel file add indicator to master_df
-    processor = ExcelFileProcessor()
-
-    indicator_list = []
+    # create indicators from files
+    indicator_list = files_to_indicators(excel_files, workers, chunk_size)
 
+    # remove files
     for file in excel_files:
-        # create indicator from file
-        indicator = excel_file_data_to_indicator(processor, file)
-
-        # add to list
-        indicator_list.append(indicator)
-
-        # remove file
         os.remove(file.full_path)
 
     return indicator_list
 
 
-# --------------------------------- Indicator -------------------------------- #
-def process_indicators(indicators, indicator_codes, buffer, instruction, master_df):
+# create files = excel files read from zip members in memory, nothing is extracted
+def create_files_from_zip(zip_file_path):
+    zip_manager = ZipFileManager(zip_file_path)
+    for member_name, source in zip_manager.iter_members('.xlsx'):
+        yield ExcelFile(member_name, source)
+
+
+# create and process files streamed from zip
+def zip_to_indicators(zip_file_path, workers=1, cache=None, chunk_size=None) -> list:
     """
-    Process a list of indicators and update the master dataframe.
+    Create indicators from workbooks in a zip file, without extracting it.
 
     Args:
-        indicators (list): List of Indicator objects.
-        indicator_codes (list): List of indicator codes to filter.
-        buffer (list): List to store indicators temporarily.
-        instruction (str): Instruction for creating new indicator.
-        master_df (pd.DataFrame): Master dataframe to update.
+        zip_file_path (str): Path to the zip file.
+        workers (int): Number of worker processes, see files_to_indicators.
+        cache (ParseCache): Cache of processed indicators. Only members missing
+            from the cache are parsed. Defaults to None (no cache).
+        chunk_size (int): Stream sheets in chunks, see files_to_indicators.
 
     Returns:
-        tuple: Tuple containing the updated buffer and master dataframe.
+        list: Indicator objects in zip member order.
     """
-    for indicator in indicators:
-        if indicator.code in indicator_codes:
-            buffer.append(indicator)
-
-            if len(buffer) == len(indicator_codes):
-                new_indicator = create_new_indicator(buffer, instruction)
-                master_df = add_indicator_to_master_df(new_indicator, master_df)
-                buffer = []
-                # logger.info("new indicator created: %s", new_indicator)
-        else:
-            master_df = add_indicator_to_master_df(indicator, master_df)
+    if cache is None:
+        # files are created lazily -> in sequential mode only one member is held in memory at a time
+        return files_to_indicators(create_files_from_zip(zip_file_path), workers, chunk_size)
+
+    zip_manager = ZipFileManager(zip_file_path)
+    file_infos = zip_manager.member_infos('.xlsx')
+
+    keys = [cache.key(file_info) for file_info in file_infos]
+    indicator_list = [cache.get(key) for key in keys]
+
+    # parse only members missing from the cache
+    missing = [i for i, indicator in enumerate(indicator_list) if indicator is None]
+    logging.info(f"{len(file_infos) - len(missing)} indicators loaded from cache, {len(missing)} to parse")
+
+    excel_files = (
+        ExcelFile(file_infos[i].filename, zip_manager.read_member(file_infos[i]))
+        for i in missing
+    )
+
+    # note: builtin zip is shadowed by the processing.zip package in this module
+    for i, indicator in enumerate(files_to_indicators(excel_files, workers, chunk_size)):
+        cache.put(keys[missing[i]], indicator)
+        indicator_list[missing[i]] = indicator
+
+    return indicator_list
+
+
+# code and config turning a workbook into the cached indicator -> changing any of it invalidates the cache
+# INSTRUCTIONS are applied to cached indicators (IndicatorGraph), so they are not part of the key
+PARSE_CACHE_CONFIG = [
+    # reading
+    Indicator, ExcelFile, ExcelFileProcessor, metadata_from_file_name, iter_sheet_chunks,
+    # general processing
+    BASIC_DATAFRAME_PROCESSING_CONFIG, COMPACT_TYPES, NEEDED_COLUMNS, compact_df, general_processing,
+    process_indicator_df, needed_columns_df, process_indicator_chunks, concat_chunks, MasterDfBuilder,
+    # custom processing, transforms module holds TRANSFORMS, OPERATIONS, TransformPlan and their helpers
+    custom_processing, transforms,
+]
 
-    return buffer, master_df
 
+# cache of processed indicators, invalidated when processing code or config changes
+def create_parse_cache(cache_path=paths.cache_data_path) -> ParseCache:
+    return ParseCache(cache_path, config=config_hash(*PARSE_CACHE_CONFIG))
 
 
-def add_indicator_to_master_df(indicator, master_df):
+# ------------------------------------ api ----------------------------------- #
+
+def api_to_indicators(indicator_codes, unit_level=2, years=None, **client_options) -> list:
     """
-    Add indicator to master dataframe.
+    Create indicators from the BDL API instead of an export archive.
 
     Args:
-        indicator (Indicator): Indicator object to add.
-        master_df (pd.DataFrame): Master dataframe to update.
+        indicator_codes (list): Indicator codes, e.g. ['2167', '3430'].
+        unit_level (int): BDL unit level, 2 = voivodeships.
+        years (list): Years, all available if None.
+        **client_options: BDLClient arguments; responses are cached in
+            paths.api_cache_data_path unless cache_path is given.
 
     Returns:
-        pd.DataFrame: Updated master dataframe.
+        list: Processed Indicator objects in the order of indicator_codes.
     """
-    return master_df.append(indicator.df, ignore_index=True)
+    client_options.setdefault('cache_path', paths.api_cache_data_path)
+    indicator_list = asyncio.run(fetch_indicators(indicator_codes, unit_level, years, **client_options))
+
+    for indicator in indicator_list:
+        indicator.df = process_indicator_df(indicator)
+
+    return indicator_list
 
-def add_indicator_to_master_df(indicator, master_df):
-    # Add indicator to master dataframe
-    return pd.concat([master_df, indicator.df], ignore_index=True)
+
+# --------------------------------- Indicator -------------------------------- #
 
 def save_master_df_to_csv(master_df, output_path):
     # Save master dataframe to CSV file
+    os.makedirs(output_path, exist_ok=True)
     master_df.to_csv(f"{output_path}/master_df.csv", index=False)
     logging.info("master_df saved to csv")
 
-def indicators_to_master_df(indicators: list, indicator_codes: list, instruction: dict, master_df = MASTER_DF, buffer=None):
+def indicators_to_master_df(indicators: list, instructions: list = INSTRUCTIONS, master_df = MASTER_DF, workers=1):
     """
-    Process a set of indicators, either creating a new indicator or adding it to the master dataframe based on the
-    indicator codes provided.
+    Create derived indicators and build the master dataframe.
+
+    Instructions are resolved as a dependency graph, so every derived indicator
+    is created once, in one pass, and may use other derived indicators.
+    Indicators used by an instruction are replaced by the derived indicator.
 
     Args:
         indicators: A list of Indicator objects to be processed.
-        indicator_codes: A list of indicator codes to be processed.
-        instruction: A dictionary mapping indicator codes to their corresponding instructions.
-        master_df: The master dataframe to which new indicators will be added. Defaults to None.
-        buffer: A buffer to store indicators until all indicator codes are present. Defaults to None.
+        instructions: A list of instructions for creating new indicators. Defaults to INSTRUCTIONS.
+        master_df: The master dataframe to which new indicators will be added. Defaults to MASTER_DF.
+        workers: Number of threads creating independent derived indicators.
 
     Returns:
         pd.DataFrame: The resulting master dataframe with all the processed indicators.
     """
-    # if master_df is None:
-    #     master_df = pd.DataFrame()
+    graph = IndicatorGraph(instructions)
 
-    if buffer is None:
-        buffer = []
+    # master_df is built once from all collected dfs
+    master_df_builder = MasterDfBuilder().add(master_df)
 
-    buffer, master_df = process_indicators(indicators, indicator_codes, buffer, instruction, master_df)
+    for indicator in graph.outputs(indicators, workers):
+        master_df_builder.add_indicator(indicator)
+
+    with report_stage('assemble_master_df', rows_in=len(master_df_builder)) as record:
+        master_df = master_df_builder.build()
+        record['rows_out'] = len(master_df)
 
     return master_df
 
 
+# derived indicators of the versioned store, from the current versions of their inputs
+def update_derived_indicators(store: IndicatorStore, changed, instructions: list = INSTRUCTIONS, workers=1, source=None) -> list:
+    """
+    Recompute derived indicators whose inputs changed in the store.
+
+    Inputs are read from the store, so a derived indicator is created once
+    every input has arrived, in one archive or in several.
+
+    Args:
+        store (IndicatorStore): The store.
+        changed (list): Codes of indicators with a new version.
+        instructions (list): Instructions for derived indicators. Defaults to INSTRUCTIONS.
+        workers (int): Number of threads creating independent derived indicators.
+        source (str): Where the changes come from, e.g. archive name.
+
+    Returns:
+        list: Codes of derived indicators with a new version.
+    """
+    graph = IndicatorGraph(instructions)
+    affected = graph.affected(changed)
+
+    # an affected node is computed if its inputs are stored or computed before it
+    available = set(store.indicator_codes())
+    nodes = []
+    for level in graph.levels:
+        for code in level:
+            if code not in affected:
+                continue
+            missing = [dependency for dependency in graph.dependencies(code) if dependency not in available]
+            if missing:
+                logging.info(f"Indicator {code} not updated, missing indicators in the store: {missing}.")
+                continue
+            nodes.append(code)
+            available.add(code)
+
+    if not nodes:
+        return []
+
+    inputs = store.indicators(sorted({dependency for code in nodes for dependency in graph.dependencies(code)} - set(nodes)))
+    results = graph.compute(inputs, workers, nodes)
+    return store.ingest([results[code] for code in nodes], source=source)
+
+
+# master_df of the versioned store -> inputs of stored derived indicators are left out, as in indicators_to_master_df
+def store_master_df(store: IndicatorStore, instructions: list = INSTRUCTIONS) -> pd.DataFrame:
+    indicator_codes = store.indicator_codes()
+    consumed = IndicatorGraph(instructions).consumed_codes(set(indicator_codes))
+    return store.read([indicator_code for indicator_code in indicator_codes if indicator_code not in consumed])
+
+
+# upsert an archive into the versioned indicator store
+def ingest_archive(zip_file_path, store: IndicatorStore, instructions: list = INSTRUCTIONS, workers=1, use_cache=True) -> list:
+    """
+    Ingest an export archive into the versioned indicator store.
+
+    Unchanged workbooks are loaded from the parse cache; the store writes new
+    versions only of indicators whose rows changed. Loaded indicators are
+    stored as they are, derived ones are updated from the store afterwards,
+    so an archive with only some inputs of an instruction loses nothing.
+
+    Args:
+        zip_file_path (str): Path to the zip file.
+        store (IndicatorStore): The store.
+        instructions (list): Instructions for derived indicators. Defaults to INSTRUCTIONS.
+        workers (int): Number of processes parsing workbooks.
+        use_cache (bool): Load unchanged workbooks from the parse cache.
+
+    Returns:
+        list: Codes of indicators with a new version, loaded and derived.
+    """
+    indicator_list = zip_to_indicators(zip_file_path, workers, create_parse_cache() if use_cache else None)
+    source = os.path.basename(zip_file_path)
+
+    # several exports of an indicator in the archive -> the newest is stored
+    changed = store.ingest(list(newest_indicators(indicator_list).values()), source=source)
+    return changed + update_derived_indicators(store, changed, instructions, workers, source)
+
+
 # 
 
 # if master_df.csv exists, ask user if he wants to overwrite it or read it
 def read_or_overwrite_file(
         file_path: str,
+        overwrite: bool = None,
 ):
-    
+    # overwrite given -> no prompt, e.g. under cron or in workers
     if not os.path.exists(file_path):
         return False
+    if overwrite is not None:
+        return overwrite
+    if not sys.stdin.isatty():
+        raise FileExistsError(f"File {file_path} already exists. Pass overwrite=True to replace it or overwrite=False to read it.")
     while True:
         user_input = input(f"File {file_path} already exists. Do you want to overwrite it? [Y/N]: ")
         if user_input.lower() == 'y':
@@ -194,27 +361,76 @@ def read_or_overwrite_file(
 
 # ---------------------------------- main --------------------------------- #
 
-def main(zip_file_path):
+def main(zip_file_path, stream=True, workers=1, use_cache=True, export_csv=False, chunk_size=None,
+         report_path=None, profile=None, trace_memory=None, overwrite=None,
+         output_path=paths.output_data_path):
+    """
+    Build master_df from a zip file with exported indicators.
 
-    # check if master_df.csv exists -> if yes, ask user if he wants to overwrite it or read it
-    if read_or_overwrite_file(f"{paths.output_data_path}/master_df.csv"):
-        # if yes, delete it
-        os.remove(f"{paths.output_data_path}/master_df.csv")
+    Args:
+        zip_file_path (str): Path to the zip file.
+        stream (bool): Read workbooks straight from the zip in memory. If False,
+            files are extracted to the output folder, read and removed.
+        workers (int): Number of processes parsing workbooks, None for all cores.
+        use_cache (bool): Load unchanged workbooks from the parse cache. Only
+            used when streaming.
+        export_csv (bool): Also save master_df.csv next to the Parquet dataset.
+        chunk_size (int): Read sheets in chunks of this many rows, bounds memory
+            for very large workbooks. Defaults to None (read at once).
+        report_path (str): Save a JSON report of every pipeline stage here.
+            Defaults to the BDL_RUN_REPORT environment variable.
+        profile (list): Stages to profile, 'all' for every stage. Defaults to
+            the BDL_PROFILE environment variable (comma separated).
+        trace_memory (bool): Add traced memory peaks to the report. Defaults
+            to the BDL_TRACE_MEMORY environment variable.
+        overwrite (bool): If the dataset exists, True rebuilds it and False
+            reads it. None asks on an interactive terminal and raises
+            FileExistsError otherwise.
+        output_path (str): Folder of the dataset, rollup, cube and CSV; extracted
+            workbooks are read from here too.
+
+    Returns:
+        pd.DataFrame: The master dataframe.
+    """
 
-        # extract files from zip
-        extract_file(zip_file_path, paths.output_data_path)
+    # report of the run, only if asked for
+    options = report_options(report_path, profile, trace_memory, default_report_path=os.path.join(output_path, REPORT_FILE))
 
-        indicator_list = excel_files_to_indicators(paths.output_data_path)
+    with run_report(**options) if options else nullcontext():
 
-        for instruction in INSTRUCTIONS:
-            # add custom indicator
-            master_df = indicators_to_master_df(indicator_list, instruction['codes'], instruction, MASTER_DF, BUFFER)
+        dataset_path = os.path.join(output_path, MASTER_DF_DATASET)
 
-        # save as csv
-        save_master_df_to_csv(master_df, paths.output_data_path)
+        # check if master_df dataset exists -> if yes, ask user if he wants to overwrite it or read it
+        if not master_df_exists(output_path) or read_or_overwrite_file(dataset_path, overwrite):
+            # the dataset is replaced when saving
 
-    else:
-        # if no, read master_df.csv
-        master_df = pd.read_csv(f"{paths.output_data_path}/master_df.csv")
+            if stream:
+                # read files from zip without extracting
+                indicator_list = zip_to_indicators(zip_file_path, workers, create_parse_cache() if use_cache else None, chunk_size)
+            else:
+                # extract files from zip
+                extract_file(zip_file_path, output_path)
+
+                indicator_list = excel_files_to_indicators(output_path, workers, chunk_size)
+
+            # add custom indicators
+            master_df = indicators_to_master_df(indicator_list, INSTRUCTIONS, MASTER_DF, workers)
+
+            # save as parquet dataset
+            save_master_df_to_parquet(master_df, output_path)
+
+            # aggregates at every unit level, next to the dataset
+            save_rollup(rollup_master_df(master_df), output_path)
+
+            # memory-mappable cube for analysis, in paths.cube_data_path by default
+            save_cube(master_df, output_path)
+
+            # csv only on request
+            if export_csv:
+                save_master_df_to_csv(master_df, output_path)
+
+        else:
+            # if no, read master_df dataset
+            master_df = read_master_df(output_path)
     
     return master_df
\ No newline at end of file
@@ -0,0 +1,5 @@
+from .output import *
+from .versioned import *
+from .cube import *
+from .rollup import *
+from .query import *
@@ -0,0 +1,223 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+# folder of the cube next to the master_df dataset -> paths.cube_data_path
+CUBE_FOLDER = 'cube'
+
+
+class IndicatorCube:
+    """
+    Dense indicator x region x year cube of values.
+
+    Indicator codes, region codes and years are integer-encoded axes with
+    label lookup tables; missing cells are NaN and mask tells cells with a
+    row in master_df apart. Saved as .npy files, the cube can be loaded
+    memory-mapped, so several processes share one copy of the data.
+    Slices are NumPy views, no pandas involved.
+    """
+
+    VALUES_FILE = 'values.npy'
+    MASK_FILE = 'mask.npy'
+    LABELS_FILE = 'labels.json'
+
+    def __init__(self, values, mask, indicator_codes, indicator_names, region_codes, region_names, years, version=None):
+        self.values = values
+        self.mask = mask
+        self._version = version
+
+        # labels
+        self.indicator_codes = list(indicator_codes)
+        self.indicator_names = list(indicator_names)
+        self.region_codes = list(region_codes)
+        self.region_names = list(region_names)
+        self.years = [int(year) for year in years]
+
+        # label -> position lookups
+        self.indicator_index = {code: i for i, code in enumerate(self.indicator_codes)}
+        self.region_index = {code: i for i, code in enumerate(self.region_codes)}
+        self.year_index = {year: i for i, year in enumerate(self.years)}
+
+    @property
+    def shape(self) -> tuple:
+        return self.values.shape
+
+    @property
+    def version(self) -> str:
+        # content hash of the data -> key for results derived from the cube
+        if self._version is None:
+            digest = hashlib.sha1()
+            digest.update(np.ascontiguousarray(self.values).tobytes())
+            digest.update(np.ascontiguousarray(self.mask).tobytes())
+            digest.update(json.dumps([self.indicator_codes, self.region_codes, self.years]).encode('utf-8'))
+            self._version = digest.hexdigest()
+        return self._version
+
+    # ---------------------------------- build ---------------------------------- #
+
+    @classmethod
+    def from_master_df(cls, master_df, dtype=np.float64):
+        """
+        Create the cube from a long-format master dataframe.
+
+        Args:
+            master_df (pd.DataFrame): Frame with NEEDED_COLUMNS.
+            dtype: Type of the values, e.g. np.float32 to halve the size.
+
+        Returns:
+            IndicatorCube: The cube.
+
+        Raises:
+            ValueError: If rows share an indicator, region and year, e.g. an
+                indicator with a dimension no transform resolves.
+        """
+        indicator_positions, indicator_codes = pd.factorize(master_df['Indicator code'].astype(str), sort=True)
+        region_positions, region_codes = pd.factorize(master_df['Code'].astype(str), sort=True)
+        year_positions, years = pd.factorize(master_df['Year'].astype(int), sort=True)
+
+        shape = (len(indicator_codes), len(region_codes), len(years))
+        cells = np.ravel_multi_index((indicator_positions, region_positions, year_positions), shape)
+
+        # one value per cell, which of several rows to keep is not for the cube to decide
+        unique_cells, counts = np.unique(cells, return_counts=True)
+        if len(unique_cells) < len(cells):
+            duplicated = np.unravel_index(unique_cells[counts > 1], shape)[0]
+            raise ValueError(
+                f"{len(cells) - len(unique_cells)} rows share an indicator, region and year with another row, "
+                f"indicators {sorted({indicator_codes[i] for i in duplicated})}; resolve their dimensions with a transform."
+            )
+
+        values = np.full(shape, np.nan, dtype=dtype)
+        mask = np.zeros(shape, dtype=bool)
+        values.flat[cells] = master_df['Value'].to_numpy(dtype=dtype)
+        mask.flat[cells] = True
+
+        # names of the first row of every indicator and region
+        _, first_indicator_rows = np.unique(indicator_positions, return_index=True)
+        _, first_region_rows = np.unique(region_positions, return_index=True)
+
+        return cls(
+            values,
+            mask,
+            indicator_codes=indicator_codes.tolist(),
+            indicator_names=master_df['Indicator'].astype(str).to_numpy()[first_indicator_rows].tolist(),
+            region_codes=region_codes.tolist(),
+            region_names=master_df['Name'].astype(str).to_numpy()[first_region_rows].tolist(),
+            years=years.tolist(),
+        )
+
+    # ------------------------------------- < ------------------------------------ #
+
+    # -------------------------------- persistence ------------------------------- #
+
+    def save(self, cube_path) -> str:
+        """
+        Save the cube to a folder, replacing an existing cube atomically.
+
+        Args:
+            cube_path (str): The folder.
+
+        Returns:
+            str: The folder.
+        """
+        temporary_path = f"{cube_path}.tmp"
+        shutil.rmtree(temporary_path, ignore_errors=True)
+        os.makedirs(temporary_path)
+
+        np.save(os.path.join(temporary_path, self.VALUES_FILE), self.values)
+        np.save(os.path.join(temporary_path, self.MASK_FILE), self.mask)
+        with open(os.path.join(temporary_path, self.LABELS_FILE), 'w', encoding='utf-8') as file:
+            json.dump({
+                'indicator_codes': self.indicator_codes,
+                'indicator_names': self.indicator_names,
+                'region_codes': self.region_codes,
+                'region_names': self.region_names,
+                'years': self.years,
+                'version': self.version,
+            }, file, ensure_ascii=False)
+
+        old_path = f"{cube_path}.old"
+        shutil.rmtree(old_path, ignore_errors=True)
+        if os.path.exists(cube_path):
+            os.rename(cube_path, old_path)
+        os.rename(temporary_path, cube_path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+        return cube_path
+
+    @classmethod
+    def load(cls, cube_path, mmap_mode='r'):
+        """
+        Load a saved cube.
+
+        Args:
+            cube_path (str): The folder the cube was saved to.
+            mmap_mode (str): np.load memory-map mode; 'r' shares the pages between
+                processes, None reads the arrays into memory.
+
+        Returns:
+            IndicatorCube: The cube.
+        """
+        with open(os.path.join(cube_path, cls.LABELS_FILE), encoding='utf-8') as file:
+            labels = json.load(file)
+
+        return cls(
+            np.load(os.path.join(cube_path, cls.VALUES_FILE), mmap_mode=mmap_mode),
+            np.load(os.path.join(cube_path, cls.MASK_FILE), mmap_mode=mmap_mode),
+            **labels,
+        )
+
+    # ------------------------------------- < ------------------------------------ #
+
+    # ---------------------------------- slices ---------------------------------- #
+
+    def indicator(self, indicator_code) -> np.ndarray:
+        # regions x years view of one indicator
+        return self.values[self.indicator_index[str(indicator_code)]]
+
+    def region(self, region_code) -> np.ndarray:
+        # indicators x years view of one region
+        return self.values[:, self.region_index[str(region_code)]]
+
+    def year(self, year) -> np.ndarray:
+        # indicators x regions view of one year
+        return self.values[:, :, self.year_index[int(year)]]
+
+    def series(self, region_code, indicator_code) -> np.ndarray:
+        # values of one indicator in one region over years
+        return self.values[self.indicator_index[str(indicator_code)], self.region_index[str(region_code)]]
+
+    def value(self, indicator_code, region_code, year) -> float:
+        return self.values[
+            self.indicator_index[str(indicator_code)],
+            self.region_index[str(region_code)],
+            self.year_index[int(year)],
+        ]
+
+    def indicator_frame(self, indicator_code) -> pd.DataFrame:
+        # labelled regions x years frame, for display
+        return pd.DataFrame(self.indicator(indicator_code), index=self.region_codes, columns=self.years)
+
+    # ------------------------------------- < ------------------------------------ #
+
+
+def save_cube(master_df, output_path, folder_name=CUBE_FOLDER) -> str:
+    """
+    Build the cube of master_df and save it next to the dataset.
+
+    Args:
+        master_df (pd.DataFrame): The master dataframe.
+        output_path (str): Folder the dataset is saved in.
+        folder_name (str): Name of the cube folder.
+
+    Returns:
+        str: Path of the cube, to be opened with IndicatorCube.load.
+    """
+    cube_path = IndicatorCube.from_master_df(master_df).save(os.path.join(output_path, folder_name))
+    logging.info("cube saved")
+    return cube_path
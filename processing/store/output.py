@@ -0,0 +1,207 @@
+import json
+import logging
+import os
+import shutil
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from ..indicator.df.processor import BASIC_DATAFRAME_PROCESSING_CONFIG, compact_df
+from ..instrumentation import instrumented
+
+# ---------------------------------- schema --------------------------------- #
+
+# explicit schema of master_df -> no dtype inference on read
+MASTER_DF_SCHEMA = pa.schema([
+    ('Code', pa.string()),
+    ('Name', pa.string()),
+    ('Year', pa.int32()),
+    ('Indicator', pa.string()),
+    ('Indicator code', pa.string()),
+    ('Value', pa.float64()),
+])
+
+PARTITION_COLUMN = 'Indicator code'
+
+# 'Indicator code' is stored in directory names, values like '3787-1869' stay strings
+PARTITIONING = ds.partitioning(
+    pa.schema([MASTER_DF_SCHEMA.field(PARTITION_COLUMN)]),
+    flavor='hive',
+)
+
+MASTER_DF_DATASET = 'master_df'
+
+# written last by the watch daemon -> lists the archives the processed output includes and points to its folder
+PUBLISH_FILE = 'published.json'
+
+# rows per row group; rows are sorted by year within a partition, so large
+# partitions get several row groups covering a few years each and year filters skip the rest
+ROW_GROUP_SIZE = 8192
+
+# ------------------------------------- < ------------------------------------ #
+
+
+# ----------------------------------- write ---------------------------------- #
+
+def master_df_to_table(master_df: pd.DataFrame) -> pa.Table:
+    # cast to the schema, column order included; missing values stay nulls, not 'nan'
+    master_df = master_df[MASTER_DF_SCHEMA.names].astype({
+        'Code': 'string',
+        'Name': 'string',
+        'Indicator': 'string',
+        'Indicator code': 'string',
+    })
+    return pa.Table.from_pandas(master_df, schema=MASTER_DF_SCHEMA, preserve_index=False)
+
+
+@instrumented('save_master_df', before=lambda master_df, *args, **kwargs: {'rows_in': len(master_df)})
+def save_master_df_to_parquet(master_df, output_path, dataset_name=MASTER_DF_DATASET):
+    """
+    Save master dataframe as a Parquet dataset partitioned by indicator code.
+
+    The dataset is written next to the old one and swapped in afterwards, so
+    readers never see a partially written dataset.
+
+    Args:
+        master_df (pd.DataFrame): The master dataframe.
+        output_path (str): Folder to save the dataset in.
+        dataset_name (str): Name of the dataset folder.
+
+    Returns:
+        str: Path of the dataset.
+    """
+    dataset_path = os.path.join(output_path, dataset_name)
+    temporary_path = f"{dataset_path}.tmp"
+    shutil.rmtree(temporary_path, ignore_errors=True)
+    os.makedirs(output_path, exist_ok=True)
+
+    # sort by year -> row group statistics allow skipping years on read
+    table = master_df_to_table(master_df).sort_by([(PARTITION_COLUMN, 'ascending'), ('Year', 'ascending')])
+
+    ds.write_dataset(
+        table,
+        temporary_path,
+        format='parquet',
+        partitioning=PARTITIONING,
+        min_rows_per_group=ROW_GROUP_SIZE,
+        max_rows_per_group=ROW_GROUP_SIZE,
+    )
+
+    # swap datasets
+    old_path = f"{dataset_path}.old"
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(dataset_path):
+        os.rename(dataset_path, old_path)
+    os.rename(temporary_path, dataset_path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+    logging.info("master_df saved to parquet")
+    return dataset_path
+
+# ------------------------------------- < ------------------------------------ #
+
+
+# ----------------------------------- read ----------------------------------- #
+
+def published_path(output_path) -> str:
+    """
+    Folder of the processed output published in output_path.
+
+    The watch daemon writes every output (dataset, rollup and cube) into a
+    folder of its own and publishes it by replacing published.json, which
+    points to it, so readers never mix two versions. Output saved by main()
+    is in output_path itself.
+
+    Args:
+        output_path (str): Folder of the processed output, as in main().
+
+    Returns:
+        str: The folder to read the dataset, rollup and cube from.
+    """
+    try:
+        with open(os.path.join(output_path, PUBLISH_FILE), encoding='utf-8') as file:
+            folder = json.load(file).get('output')
+    except (FileNotFoundError, json.JSONDecodeError):
+        return output_path
+    return os.path.join(output_path, folder) if folder else output_path
+
+
+def master_df_dataset(output_path, dataset_name=MASTER_DF_DATASET) -> ds.Dataset:
+    return ds.dataset(
+        os.path.join(published_path(output_path), dataset_name),
+        schema=MASTER_DF_SCHEMA,
+        format='parquet',
+        partitioning=PARTITIONING,
+    )
+
+
+def master_df_filter(indicator_codes=None, codes=None, years=None):
+    """
+    Build a dataset filter expression.
+
+    Args:
+        indicator_codes (list): Keep only these indicator codes -> partitions are pruned.
+        codes (list): Keep only these region codes.
+        years (tuple): (first year, last year), both inclusive, either can be None.
+
+    Returns:
+        pyarrow.dataset.Expression: The filter or None if nothing is filtered.
+    """
+    expressions = []
+
+    if indicator_codes is not None:
+        expressions.append(ds.field(PARTITION_COLUMN).isin([str(code) for code in indicator_codes]))
+    if codes is not None:
+        expressions.append(ds.field('Code').isin([str(code) for code in codes]))
+    if years is not None:
+        first_year, last_year = years
+        if first_year is not None:
+            expressions.append(ds.field('Year') >= first_year)
+        if last_year is not None:
+            expressions.append(ds.field('Year') <= last_year)
+
+    if not expressions:
+        return None
+
+    expression = expressions[0]
+    for other in expressions[1:]:
+        expression = expression & other
+    return expression
+
+
+def read_master_df(output_path, columns=None, indicator_codes=None, codes=None, years=None,
+                   dataset_name=MASTER_DF_DATASET) -> pd.DataFrame:
+    """
+    Read the master dataframe, or a part of it, from the Parquet dataset.
+
+    Only the requested columns are read and filters are pushed down to the
+    dataset: indicator codes prune partitions, years skip row groups.
+
+    Args:
+        output_path (str): Folder the dataset was saved in, or published to (see published_path).
+        columns (list): Columns to read. Defaults to all columns.
+        indicator_codes (list): Indicator codes to read.
+        codes (list): Region codes to read.
+        years (tuple): (first year, last year) to read, both inclusive.
+        dataset_name (str): Name of the dataset folder.
+
+    Returns:
+        pd.DataFrame: The master dataframe, in the compact schema if it is configured.
+    """
+    table = master_df_dataset(output_path, dataset_name).to_table(
+        columns=columns,
+        filter=master_df_filter(indicator_codes, codes, years),
+    )
+
+    if 'compact' not in BASIC_DATAFRAME_PROCESSING_CONFIG:
+        return table.to_pandas()
+
+    # strings are decoded straight to categoricals
+    return compact_df(table.to_pandas(strings_to_categorical=True), **BASIC_DATAFRAME_PROCESSING_CONFIG['compact'])
+
+
+def master_df_exists(output_path, dataset_name=MASTER_DF_DATASET) -> bool:
+    return os.path.isdir(os.path.join(published_path(output_path), dataset_name))
+
+# ------------------------------------- < ------------------------------------ #
@@ -0,0 +1,216 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from ..indicator.df.processor import NEEDED_COLUMNS
+from .output import read_master_df
+
+
+class IndicatorQuery:
+    """
+    Indexed lookups into processed indicator data.
+
+    Rows are sorted once by (Indicator code, Code, Year) and kept as NumPy
+    columns. Hash indexes map (indicator code, code) to a run of sorted rows
+    and (indicator code, year) to a run of a second, year-major ordering, so
+    point and range queries touch only the rows they return.
+    """
+
+    def __init__(self, master_df, columns=NEEDED_COLUMNS):
+        indicator_codes = master_df['Indicator code'].astype(str).to_numpy()
+        codes = master_df['Code'].astype(str).to_numpy()
+        years = master_df['Year'].to_numpy(dtype=np.int64)
+
+        # rows by indicator, region, year
+        order = np.lexsort((years, codes, indicator_codes))
+        self.columns = [column for column in columns if column in master_df.columns]
+        self.data = {
+            column: master_df[column].to_numpy()[order]
+            for column in self.columns
+            if column not in ('Indicator code', 'Code', 'Year')
+        }
+        self.data['Indicator code'] = indicator_codes[order]
+        self.data['Code'] = codes[order]
+        self.data['Year'] = years[order]
+
+        self.series_index = self._runs(self.data['Indicator code'], self.data['Code'])
+
+        # row positions by indicator, year, region -> cross sections are runs too
+        self.year_order = np.lexsort((self.data['Code'], self.data['Year'], self.data['Indicator code']))
+        self.cross_section_index = self._runs(
+            self.data['Indicator code'][self.year_order],
+            self.data['Year'][self.year_order],
+        )
+
+        # indicator -> (first, last) run of rows
+        self.indicator_index = {}
+        for (indicator_code, _), (start, stop) in self.series_index.items():
+            first, _ = self.indicator_index.get(indicator_code, (start, stop))
+            self.indicator_index[indicator_code] = (first, stop)
+
+        self._version = None
+
+    def __len__(self):
+        return len(self.data['Code'])
+
+    @staticmethod
+    def _runs(first_keys, second_keys) -> dict:
+        # (first key, second key) -> (start, stop) of every run of equal keys in sorted arrays
+        if len(first_keys) == 0:
+            return {}
+        changes = (first_keys[1:] != first_keys[:-1]) | (second_keys[1:] != second_keys[:-1])
+        starts = np.concatenate(([0], np.flatnonzero(changes) + 1))
+        stops = np.append(starts[1:], len(first_keys))
+        return {
+            (first_key, second_key.item() if isinstance(second_key, np.generic) else second_key): (int(start), int(stop))
+            for first_key, second_key, start, stop in zip(first_keys[starts], second_keys[starts], starts, stops)
+        }
+
+    @classmethod
+    def from_store(cls, output_path, indicator_codes=None, columns=NEEDED_COLUMNS):
+        """
+        Load the Parquet dataset saved by main() and index it.
+
+        Args:
+            output_path (str): Folder the dataset was saved in.
+            indicator_codes (list): Indicator codes to load, all if None.
+            columns (list): Columns to load.
+
+        Returns:
+            IndicatorQuery: The indexed data.
+        """
+        return cls(read_master_df(output_path, columns=list(columns), indicator_codes=indicator_codes), columns)
+
+    @property
+    def version(self) -> str:
+        # content hash of the indexed rows
+        if self._version is None:
+            digest = hashlib.sha1()
+            for column in self.columns:
+                values = self.data[column]
+                if values.dtype == object:
+                    digest.update('\x1f'.join(map(str, values)).encode('utf-8'))
+                else:
+                    digest.update(np.ascontiguousarray(values).tobytes())
+            self._version = digest.hexdigest()
+        return self._version
+
+    @property
+    def indicator_codes(self) -> list:
+        return list(self.indicator_index)
+
+    # ---------------------------------- queries --------------------------------- #
+
+    def _frame(self, rows) -> pd.DataFrame:
+        return pd.DataFrame({column: self.data[column][rows] for column in self.columns})
+
+    def _year_range(self, start, stop, years):
+        # narrow a run of one series to a (first year, last year) range
+        if years is None:
+            return start, stop
+        first_year, last_year = years
+        run = self.data['Year'][start:stop]
+        if first_year is not None:
+            start, stop = start + int(np.searchsorted(run, first_year, 'left')), stop
+            run = self.data['Year'][start:stop]
+        if last_year is not None:
+            stop = start + int(np.searchsorted(run, last_year, 'right'))
+        return start, stop
+
+    def rows(self, indicator_code, codes=None, years=None) -> np.ndarray:
+        """
+        Positions of the rows matching a query, in (Code, Year) order.
+
+        Args:
+            indicator_code (str): The indicator code.
+            codes (list): Region codes, all regions if None.
+            years (tuple): (first year, last year), both inclusive, either can be None.
+
+        Returns:
+            np.ndarray: Row positions.
+        """
+        indicator_code = str(indicator_code)
+
+        if codes is None:
+            start, stop = self.indicator_index.get(indicator_code, (0, 0))
+            rows = np.arange(start, stop)
+            if years is None:
+                return rows
+            # years are sorted per region only -> one vectorized mask over the indicator
+            first_year, last_year = years
+            run = self.data['Year'][start:stop]
+            keep = np.ones(len(run), dtype=bool)
+            if first_year is not None:
+                keep &= run >= first_year
+            if last_year is not None:
+                keep &= run <= last_year
+            return rows[keep]
+
+        runs = []
+        for code in codes:
+            run = self.series_index.get((indicator_code, str(code)))
+            if run is not None:
+                start, stop = self._year_range(*run, years)
+                runs.append(np.arange(start, stop))
+
+        return np.concatenate(runs) if runs else np.arange(0)
+
+    def get(self, indicator_code, codes=None, years=None) -> pd.DataFrame:
+        """
+        Rows of an indicator, optionally for some regions and a year range.
+
+        Args:
+            indicator_code (str): The indicator code.
+            codes (list): Region codes, all regions if None.
+            years (tuple): (first year, last year), both inclusive, either can be None.
+
+        Returns:
+            pd.DataFrame: Matching rows, empty if there are none.
+        """
+        return self._frame(self.rows(indicator_code, codes, years))
+
+    def series(self, code, indicator_code, years=None) -> pd.Series:
+        """
+        Values of an indicator in one region over years.
+
+        Args:
+            code (str): The region code.
+            indicator_code (str): The indicator code.
+            years (tuple): (first year, last year), both inclusive, either can be None.
+
+        Returns:
+            pd.Series: Values indexed by year.
+        """
+        start, stop = self._year_range(*self.series_index.get((str(indicator_code), str(code)), (0, 0)), years)
+        return pd.Series(
+            self.data['Value'][start:stop],
+            index=pd.Index(self.data['Year'][start:stop], name='Year'),
+            name=str(indicator_code),
+        )
+
+    def cross_section(self, indicator_code, year) -> pd.Series:
+        """
+        Values of an indicator in every region in one year.
+
+        Args:
+            indicator_code (str): The indicator code.
+            year (int): The year.
+
+        Returns:
+            pd.Series: Values indexed by region code.
+        """
+        start, stop = self.cross_section_index.get((str(indicator_code), int(year)), (0, 0))
+        rows = self.year_order[start:stop]
+        return pd.Series(
+            self.data['Value'][rows],
+            index=pd.Index(self.data['Code'][rows], name='Code'),
+            name=str(indicator_code),
+        )
+
+    def value(self, indicator_code, code, year) -> float:
+        # NaN if there is no row
+        start, stop = self._year_range(*self.series_index.get((str(indicator_code), str(code)), (0, 0)), (year, year))
+        return float(self.data['Value'][start]) if stop > start else np.nan
+
+    # ------------------------------------- < ------------------------------------ #
@@ -0,0 +1,302 @@
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from ..instrumentation import instrumented
+from .output import published_path
+
+# ------------------------------------ config ---------------------------------- #
+
+# unit levels by code length, (level name, length of the code prefix identifying the unit)
+# 7 digits -> TERYT as in BDL exports: WW PP GG R
+# 12 digits -> BDL unit id: MM WW R SS PP GG T (macroregion, voivodeship, region, subregion, ...)
+LEVELS = {
+    7: [
+        ('national', 0),
+        ('voivodeship', 2),
+        ('powiat', 4),
+        ('gmina', 7),
+    ],
+    12: [
+        ('national', 0),
+        ('macroregion', 2),
+        ('voivodeship', 4),
+        ('region', 5),
+        ('subregion', 7),
+        ('powiat', 9),
+        ('gmina', 12),
+    ],
+}
+
+ROLLUP_CONFIG = {
+    # indicator code -> code of the indicator used as weight (e.g. population) for the weighted mean
+    'weights': {},
+}
+
+ROLLUP_FILE = 'rollup.parquet'
+
+ROLLUP_SCHEMA = pa.schema([
+    ('Indicator code', pa.string()),
+    ('Level', pa.string()),
+    ('Code', pa.string()),
+    ('Year', pa.int32()),
+    ('Count', pa.int32()),
+    ('Sum', pa.float64()),
+    ('Mean', pa.float64()),
+    ('Weighted mean', pa.float64()),
+    ('Min', pa.float64()),
+    ('Max', pa.float64()),
+])
+
+# ------------------------------------- < ------------------------------------ #
+
+
+# --------------------------------- hierarchy ---------------------------------- #
+
+def normalize_codes(codes) -> pd.Series:
+    # codes read as numbers lose leading zeros -> '200000' is '0200000'
+    codes = pd.Series(codes, dtype=str)
+    return codes.str.zfill(7).where(codes.str.len() <= 7, codes.str.zfill(12))
+
+
+def teryt_hierarchy(codes) -> pd.DataFrame:
+    """
+    Derive the unit hierarchy from TERYT/BDL unit codes.
+
+    Args:
+        codes (iterable): Unit codes, e.g. master_df['Code'].unique().
+
+    Returns:
+        pd.DataFrame: Indexed by the given code; 'level' is the depth of the unit
+            (0 = national) and 'level name' its name; one column per level name
+            holds the code of the ancestor at that level (None below the unit's depth).
+    """
+    codes = pd.Series(pd.unique(pd.Series(codes, dtype=str)))
+    normalized = normalize_codes(codes)
+
+    rows = []
+    for code, full_code in zip(codes, normalized):
+        levels = LEVELS.get(len(full_code))
+        if levels is None:
+            logging.warning(f"Unit code {code} has an unknown format, left out of the hierarchy.")
+            continue
+
+        # depth -> first level whose prefix identifies the unit, the rest are zeros
+        depth = next(
+            depth for depth, (_, length) in enumerate(levels)
+            if not full_code[length:].strip('0')
+        )
+        row = {'Code': code, 'level': depth, 'level name': levels[depth][0]}
+        for ancestor_depth, (name, length) in enumerate(levels):
+            row[name] = full_code[:length].ljust(len(full_code), '0') if ancestor_depth <= depth else None
+        rows.append(row)
+
+    return pd.DataFrame(rows).set_index('Code')
+
+# ------------------------------------- < ------------------------------------ #
+
+
+# ----------------------------------- rollup ----------------------------------- #
+
+def aggregate_level(base, ancestors, weights=None) -> pd.DataFrame:
+    """
+    Aggregate base rows of one indicator to the units of one level.
+
+    Args:
+        base (pd.DataFrame): Rows with 'Code', 'Year' and 'Value'.
+        ancestors (np.ndarray): Code of the ancestor unit of every base row.
+        weights (np.ndarray): Weight of every base row, NaN if missing.
+
+    Returns:
+        pd.DataFrame: One row per ancestor and year.
+    """
+    values = base['Value'].to_numpy(dtype=float)
+    present = ~np.isnan(values)
+    if weights is None:
+        weights = np.full(len(values), np.nan)
+    weighted = present & ~np.isnan(weights)
+
+    frame = pd.DataFrame({
+        'Code': ancestors,
+        'Year': base['Year'].to_numpy(),
+        'Value': values,
+        'count': present.astype(np.int32),
+        # products and weights only where both exist
+        'weighted value': np.where(weighted, values * np.nan_to_num(weights), 0.0),
+        'weight': np.where(weighted, np.nan_to_num(weights), 0.0),
+    })
+
+    aggregated = frame.groupby(['Code', 'Year'], sort=True).agg(**{
+        'Count': ('count', 'sum'),
+        'Sum': ('Value', 'sum'),
+        'Mean': ('Value', 'mean'),
+        'Min': ('Value', 'min'),
+        'Max': ('Value', 'max'),
+        'weighted value': ('weighted value', 'sum'),
+        'weight': ('weight', 'sum'),
+    })
+
+    # sum of no values is missing, not 0, like Mean, Min and Max
+    aggregated['Sum'] = aggregated['Sum'].where(aggregated['Count'] > 0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        aggregated['Weighted mean'] = aggregated['weighted value'] / aggregated['weight'].where(aggregated['weight'] > 0)
+
+    return aggregated.drop(columns=['weighted value', 'weight']).reset_index()
+
+
+@instrumented(
+    'rollup',
+    before=lambda master_df, *args, **kwargs: {'rows_in': len(master_df)},
+    after=lambda rollup_df, *args, **kwargs: {'rows_out': len(rollup_df)},
+)
+def rollup_master_df(master_df, config=ROLLUP_CONFIG) -> pd.DataFrame:
+    """
+    Precompute aggregates of every indicator at every coarser unit level.
+
+    For each indicator, rows of the deepest level it has (e.g. gminas) are
+    aggregated to each level above it (powiat, voivodeship, national), per year.
+    The weighted mean uses the weight indicator configured for the indicator,
+    it is NaN if there is none.
+
+    Args:
+        master_df (pd.DataFrame): Frame with 'Indicator code', 'Code', 'Year' and 'Value'.
+        config (dict): Rollup config, see ROLLUP_CONFIG.
+
+    Returns:
+        pd.DataFrame: Rows with ROLLUP_SCHEMA columns.
+
+    Raises:
+        ValueError: If rows share an indicator, region and year; summing them
+            would count a unit twice (e.g. one row per sex).
+    """
+    df = pd.DataFrame({
+        'Indicator code': master_df['Indicator code'].astype(str).to_numpy(),
+        'Code': master_df['Code'].astype(str).to_numpy(),
+        'Year': master_df['Year'].astype(int).to_numpy(),
+        'Value': master_df['Value'].astype(float).to_numpy(),
+    })
+
+    duplicated = df.duplicated(['Indicator code', 'Code', 'Year'])
+    if duplicated.any():
+        raise ValueError(
+            f"{int(duplicated.sum())} rows share an indicator, region and year with another row, "
+            f"indicators {sorted(df.loc[duplicated, 'Indicator code'].unique())}; resolve their dimensions with a transform."
+        )
+
+    hierarchy = teryt_hierarchy(df['Code'])
+    df = df[df['Code'].isin(hierarchy.index)]
+    df = df.assign(
+        level=hierarchy['level'].reindex(df['Code']).to_numpy(),
+        code_length=hierarchy['national'].str.len().reindex(df['Code']).to_numpy(),
+    )
+
+    weights = config.get('weights', {})
+    results = []
+
+    # one code format per group -> level names are the same for every row
+    for (indicator_code, code_length), indicator_df in df.groupby(['Indicator code', 'code_length'], sort=False):
+        base = indicator_df[indicator_df['level'] == indicator_df['level'].max()]
+        base_hierarchy = hierarchy.reindex(base['Code'])
+
+        weight_values = None
+        if (weight_code := weights.get(indicator_code)) is not None:
+            weight = df.loc[df['Indicator code'] == weight_code].set_index(['Code', 'Year'])['Value']
+            weight = weight[~weight.index.duplicated(keep='last')]
+            weight_values = weight.reindex(pd.MultiIndex.from_frame(base[['Code', 'Year']])).to_numpy(dtype=float)
+            if np.isnan(weight_values).all():
+                logging.warning(f"Weight indicator {weight_code} has no values for indicator {indicator_code}.")
+
+        # every level above the base level
+        for level_name, _ in LEVELS[code_length][:int(base['level'].max())]:
+            aggregated = aggregate_level(base, base_hierarchy[level_name].to_numpy(), weight_values)
+            aggregated.insert(0, 'Level', level_name)
+            aggregated.insert(0, 'Indicator code', indicator_code)
+            results.append(aggregated)
+
+    if not results:
+        return ROLLUP_SCHEMA.empty_table().to_pandas()
+
+    return pd.concat(results, ignore_index=True)[ROLLUP_SCHEMA.names]
+
+# ------------------------------------- < ------------------------------------ #
+
+
+# ----------------------------------- store ----------------------------------- #
+
+def save_rollup(rollup_df, output_path, file_name=ROLLUP_FILE) -> str:
+    """
+    Save rollup aggregates as a Parquet file next to the master dataframe.
+
+    Args:
+        rollup_df (pd.DataFrame): Result of rollup_master_df.
+        output_path (str): Folder to save the file in.
+        file_name (str): Name of the file.
+
+    Returns:
+        str: Path of the file.
+    """
+    file_path = os.path.join(output_path, file_name)
+    temporary_path = f"{file_path}.tmp"
+    os.makedirs(output_path, exist_ok=True)
+
+    table = pa.Table.from_pandas(
+        rollup_df[ROLLUP_SCHEMA.names],
+        schema=ROLLUP_SCHEMA,
+        preserve_index=False,
+    ).sort_by([('Indicator code', 'ascending'), ('Level', 'ascending'), ('Year', 'ascending')])
+
+    pq.write_table(table, temporary_path)
+    os.replace(temporary_path, file_path)
+
+    logging.info("rollup saved to parquet")
+    return file_path
+
+
+def read_rollup(output_path, indicator_codes=None, levels=None, codes=None, years=None,
+                file_name=ROLLUP_FILE) -> pd.DataFrame:
+    """
+    Read rollup aggregates, or a part of them.
+
+    Args:
+        output_path (str): Folder the file was saved in, or published to (see published_path).
+        indicator_codes (list): Indicator codes to read.
+        levels (list): Level names to read, e.g. ['voivodeship'].
+        codes (list): Unit codes to read, in the normalized form ('0200000').
+        years (tuple): (first year, last year) to read, both inclusive.
+        file_name (str): Name of the file.
+
+    Returns:
+        pd.DataFrame: The aggregates.
+    """
+    expressions = []
+    if indicator_codes is not None:
+        expressions.append(ds.field('Indicator code').isin([str(code) for code in indicator_codes]))
+    if levels is not None:
+        expressions.append(ds.field('Level').isin(list(levels)))
+    if codes is not None:
+        expressions.append(ds.field('Code').isin(list(normalize_codes(list(codes)))))
+    if years is not None:
+        first_year, last_year = years
+        if first_year is not None:
+            expressions.append(ds.field('Year') >= first_year)
+        if last_year is not None:
+            expressions.append(ds.field('Year') <= last_year)
+
+    expression = None
+    for other in expressions:
+        expression = other if expression is None else expression & other
+
+    dataset = ds.dataset(os.path.join(published_path(output_path), file_name), schema=ROLLUP_SCHEMA, format='parquet')
+    return dataset.to_table(filter=expression).to_pandas(strings_to_categorical=True)
+
+
+def rollup_exists(output_path, file_name=ROLLUP_FILE) -> bool:
+    return os.path.isfile(os.path.join(published_path(output_path), file_name))
+
+# ------------------------------------- < ------------------------------------ #
@@ -0,0 +1,243 @@
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from ..indicator import Indicator
+from ..indicator.df.processor import BASIC_DATAFRAME_PROCESSING_CONFIG, NEEDED_COLUMNS, compact_df
+from .output import MASTER_DF_SCHEMA, master_df_filter, master_df_to_table
+
+
+class IndicatorStore:
+    """
+    Persistent, versioned store of processed indicators.
+
+    Every indicator code is a partition holding numbered versions, one Parquet
+    file each. Ingesting a snapshot upserts its rows by (Indicator code, Code,
+    Year) into the current version of the partition and writes the result as
+    a new version, so only changed partitions are touched and older versions
+    stay readable. manifest.json lists the versions with their export timestamps.
+    """
+
+    MANIFEST = 'manifest.json'
+
+    # rows are identified by these columns within a partition of one indicator code
+    KEY = ['Code', 'Year']
+
+    def __init__(self, store_path):
+        self.store_path = store_path
+        os.makedirs(self.store_path, exist_ok=True)
+        self.manifest = self.read_manifest()
+
+    # ---------------------------------- manifest --------------------------------- #
+
+    def read_manifest(self) -> dict:
+        try:
+            with open(os.path.join(self.store_path, self.MANIFEST), encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+
+    def save_manifest(self):
+        path = os.path.join(self.store_path, self.MANIFEST)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as file:
+            json.dump(self.manifest, file, ensure_ascii=False, indent=1)
+        os.replace(f"{path}.tmp", path)
+
+    def indicator_codes(self) -> list:
+        return list(self.manifest)
+
+    def versions(self, indicator_code) -> list:
+        """
+        Versions of an indicator, oldest first.
+
+        Returns:
+            list: dicts with version, timestamp (export), ingested_at, source, rows and digest.
+        """
+        return self.manifest.get(indicator_code, {}).get('versions', [])
+
+    def current(self, indicator_code) -> dict:
+        versions = self.versions(indicator_code)
+        return versions[-1] if versions else None
+
+    # ------------------------------------- < ------------------------------------ #
+
+    # ----------------------------------- files ----------------------------------- #
+
+    def version_path(self, indicator_code, version) -> str:
+        return os.path.join(self.store_path, f"Indicator code={indicator_code}", f"v{version:05d}.parquet")
+
+    def read_version_table(self, indicator_code, version) -> pa.Table:
+        return pq.read_table(self.version_path(indicator_code, version), schema=MASTER_DF_SCHEMA)
+
+    def write_version_table(self, indicator_code, version, table):
+        path = self.version_path(indicator_code, version)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        pq.write_table(table, f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+
+    # ------------------------------------- < ------------------------------------ #
+
+    # ---------------------------------- upsert ----------------------------------- #
+
+    @staticmethod
+    def digest(df) -> str:
+        # content hash independent of row order
+        hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        hashes.sort()
+        return hashlib.sha1(hashes.tobytes()).hexdigest()
+
+    def upsert_rows(self, current_df, new_df) -> pd.DataFrame:
+        # rows of the new snapshot replace rows with the same key, other current rows stay
+        replaced = pd.MultiIndex.from_frame(current_df[self.KEY]).isin(pd.MultiIndex.from_frame(new_df[self.KEY]))
+        kept = current_df[~replaced]
+        return (
+            pd.concat([kept, new_df] if len(kept) else [new_df], ignore_index=True)
+            .sort_values(self.KEY, ignore_index=True)
+        )
+
+    def upsert(self, indicator, source=None) -> bool:
+        """
+        Upsert an indicator snapshot; the manifest is saved by ingest().
+
+        Snapshots older than the current version are ignored, and so are
+        snapshots that don't change any row.
+
+        Args:
+            indicator (Indicator): Processed indicator.
+            source (str): Where the snapshot comes from, e.g. archive name.
+
+        Returns:
+            bool: True if a new version was written.
+        """
+        current = self.current(indicator.code)
+
+        timestamp = indicator.timestamp.isoformat() if indicator.timestamp is not None else None
+        if current is not None and None not in (timestamp, current['timestamp']) and timestamp < current['timestamp']:
+            logging.info(f"Indicator {indicator.code}: snapshot {timestamp} is older than stored {current['timestamp']}, skipped.")
+            return False
+
+        # plain types of the schema -> same representation as stored versions
+        new_df = master_df_to_table(indicator.df[NEEDED_COLUMNS]).to_pandas()
+
+        if current is None:
+            df = new_df.sort_values(self.KEY, ignore_index=True)
+        else:
+            df = self.upsert_rows(self.read_version_table(indicator.code, current['version']).to_pandas(), new_df)
+
+        digest = self.digest(df)
+        if current is not None and digest == current['digest']:
+            return False
+
+        version = current['version'] + 1 if current is not None else 1
+        self.write_version_table(indicator.code, version, pa.Table.from_pandas(df, schema=MASTER_DF_SCHEMA, preserve_index=False))
+
+        self.manifest.setdefault(indicator.code, {'versions': []})['versions'].append({
+            'version': version,
+            'timestamp': timestamp,
+            'ingested_at': datetime.now().isoformat(timespec='seconds'),
+            'source': source,
+            'rows': len(df),
+            'digest': digest,
+        })
+        logging.info(f"Indicator {indicator.code}: version {version} written.")
+        return True
+
+    def ingest(self, indicators, source=None) -> list:
+        """
+        Upsert indicators and save the manifest.
+
+        Args:
+            indicators (list): Processed Indicator objects, loaded or derived.
+            source (str): Where the snapshot comes from, e.g. archive name.
+
+        Returns:
+            list: Codes of indicators with a new version.
+        """
+        changed = [indicator.code for indicator in indicators if self.upsert(indicator, source)]
+        if changed:
+            self.save_manifest()
+        return changed
+
+    # ------------------------------------- < ------------------------------------ #
+
+    # ----------------------------------- read ------------------------------------ #
+
+    def version_as_of(self, indicator_code, as_of=None) -> dict:
+        # newest version, or newest exported no later than as_of
+        if as_of is None:
+            return self.current(indicator_code)
+
+        as_of = as_of.isoformat() if isinstance(as_of, datetime) else as_of
+        candidates = [
+            version for version in self.versions(indicator_code)
+            if version['timestamp'] is not None and version['timestamp'] <= as_of
+        ]
+        return candidates[-1] if candidates else None
+
+    def read(self, indicator_codes=None, codes=None, years=None, columns=None, as_of=None, versions=None) -> pd.DataFrame:
+        """
+        Read indicators from the store.
+
+        Args:
+            indicator_codes (list): Indicator codes to read. Defaults to all.
+            codes (list): Region codes to read.
+            years (tuple): (first year, last year) to read, both inclusive.
+            columns (list): Columns to read.
+            as_of (datetime | str): Read the versions exported no later than this.
+            versions (dict): Indicator code -> version number, overrides as_of.
+
+        Returns:
+            pd.DataFrame: Rows of the chosen versions, in the compact schema if it is configured.
+        """
+        versions = versions or {}
+        paths = []
+        for indicator_code in indicator_codes if indicator_codes is not None else self.indicator_codes():
+            if indicator_code in versions:
+                paths.append(self.version_path(indicator_code, versions[indicator_code]))
+            elif (version := self.version_as_of(indicator_code, as_of)) is not None:
+                paths.append(self.version_path(indicator_code, version['version']))
+
+        table = ds.dataset(paths, schema=MASTER_DF_SCHEMA, format='parquet').to_table(
+            columns=columns,
+            filter=master_df_filter(codes=codes, years=years),
+        )
+
+        if 'compact' not in BASIC_DATAFRAME_PROCESSING_CONFIG:
+            return table.to_pandas()
+        return compact_df(table.to_pandas(strings_to_categorical=True), **BASIC_DATAFRAME_PROCESSING_CONFIG['compact'])
+
+    def indicators(self, indicator_codes, as_of=None) -> list:
+        """
+        Read indicators from the store as Indicator objects, e.g. inputs of derived indicators.
+
+        Args:
+            indicator_codes (list): Indicator codes; codes without a version are left out.
+            as_of (datetime | str): Read the versions exported no later than this.
+
+        Returns:
+            list: Indicator objects; the timestamp is the export timestamp of the version.
+        """
+        indicators = []
+        for indicator_code in indicator_codes:
+            version = self.version_as_of(indicator_code, as_of)
+            if version is None:
+                continue
+
+            df = self.read([indicator_code], versions={indicator_code: version['version']})
+            indicators.append(Indicator(
+                name=str(df['Indicator'].iloc[0]) if len(df) else None,
+                code=indicator_code,
+                years=sorted(df['Year'].unique().tolist()),
+                df=df,
+                timestamp=datetime.fromisoformat(version['timestamp']) if version['timestamp'] is not None else None,
+            ))
+        return indicators
+
+    # ------------------------------------- < ------------------------------------ #
@@ -0,0 +1,395 @@
+# watch a folder for export archives and ingest them as they arrive
+
+import ctypes
+import ctypes.util
+import json
+import logging
+import os
+import select
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from .indicator.graph import newest_indicators
+from .processor import INSTRUCTIONS, excel_files_to_indicators, store_master_df, update_derived_indicators
+from .store import (PUBLISH_FILE, IndicatorStore, master_df_exists, rollup_master_df, save_cube, save_master_df_to_parquet,
+                    save_rollup)
+from .zip.manage_files import ZipFileManager
+
+# every published output is a folder in here, named after its version
+VERSIONS_FOLDER = 'versions'
+
+# published outputs kept -> readers of the previous one can finish
+KEEP_VERSIONS = 2
+
+
+# ---------------------------------- events ---------------------------------- #
+
+class PollingEvents:
+    """Wake-ups only on timeouts or wake(), where inotify is not available."""
+
+    def __init__(self):
+        self.woken = threading.Event()
+
+    def wait(self, timeout) -> bool:
+        woken = self.woken.wait(timeout)
+        self.woken.clear()
+        return woken
+
+    def wake(self):
+        self.woken.set()
+
+    def close(self):
+        pass
+
+
+class InotifyEvents:
+    """
+    Wake-ups on files created, written or moved into a folder (Linux inotify).
+
+    Events only wake the watcher up, the folder is scanned anyway, so no
+    event is parsed. Raises OSError where inotify is not available.
+
+    Args:
+        path (str): The folder.
+    """
+
+    # IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+    MASK = 0x002 | 0x008 | 0x080 | 0x100
+
+    def __init__(self, path):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError('inotify is not available')
+
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        if libc.inotify_add_watch(self.fd, os.fsencode(path), self.MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f'inotify_add_watch failed for {path}')
+
+        # wake() writes here -> wait() returns early
+        self.wake_read, self.wake_write = os.pipe()
+        os.set_blocking(self.wake_read, False)
+
+    def wait(self, timeout) -> bool:
+        ready, _, _ = select.select([self.fd, self.wake_read], [], [], timeout)
+        for fd in ready:
+            try:
+                while os.read(fd, 65536):
+                    pass
+            except BlockingIOError:
+                pass
+        return bool(ready)
+
+    def wake(self):
+        os.write(self.wake_write, b'\0')
+
+    def close(self):
+        for fd in (self.fd, self.wake_read, self.wake_write):
+            os.close(fd)
+
+# ------------------------------------- < ------------------------------------ #
+
+
+# --------------------------------- archives --------------------------------- #
+
+class ArchiveWatcher:
+    """
+    Find export archives in a folder once they are completely written.
+
+    An archive is ready when its size and modification time have not changed
+    for settle seconds and it opens as a zip file (the central directory is
+    written last). Every archive is reported once per signature, so a file
+    replaced by a newer export is reported again.
+
+    Args:
+        watch_path (str): The folder.
+        settle (float): Seconds an archive must stay unchanged.
+        seen (dict): Archive name -> signature of archives already handled.
+    """
+
+    def __init__(self, watch_path, settle=2.0, seen=None):
+        self.watch_path = watch_path
+        self.settle = settle
+        self.seen = dict(seen or {})
+        # name -> {'signature', 'changed_at' (monotonic), 'detected_at' (epoch)}
+        self.pending = {}
+
+    def scan(self) -> dict:
+        # name -> [size, mtime in ns] of zip files, hidden files are uploads in progress
+        archives = {}
+        with os.scandir(self.watch_path) as entries:
+            for entry in entries:
+                if entry.name.endswith('.zip') and not entry.name.startswith('.') and entry.is_file():
+                    stat = entry.stat()
+                    archives[entry.name] = [stat.st_size, stat.st_mtime_ns]
+        return archives
+
+    def poll(self) -> list:
+        """
+        Scan the folder.
+
+        Returns:
+            list: dicts with name, signature and detected_at of archives that
+                became ready, in order of detection.
+        """
+        now = time.monotonic()
+        archives = self.scan()
+
+        # removed before they were ready
+        for name in set(self.pending) - set(archives):
+            del self.pending[name]
+
+        ready = []
+        for name, signature in archives.items():
+            if self.seen.get(name) == signature:
+                continue
+
+            pending = self.pending.get(name)
+            if pending is None or pending['signature'] != signature:
+                # new or still being written
+                self.pending[name] = {
+                    'signature': signature,
+                    'changed_at': now,
+                    'detected_at': pending['detected_at'] if pending else time.time(),
+                }
+                continue
+
+            if now - pending['changed_at'] >= self.settle and zipfile.is_zipfile(os.path.join(self.watch_path, name)):
+                del self.pending[name]
+                self.seen[name] = signature
+                ready.append({'name': name, 'signature': signature, 'detected_at': pending['detected_at']})
+
+        return sorted(ready, key=lambda archive: archive['detected_at'])
+
+    def next_timeout(self):
+        # seconds until a pending archive may be ready, None if nothing is pending
+        if not self.pending:
+            return None
+        now = time.monotonic()
+        return max(0.0, min(self.settle - (now - pending['changed_at']) for pending in self.pending.values()))
+
+
+def archive_to_indicators(zip_path, work_path=None) -> list:
+    """
+    Parse an archive into the indicators kept in the store; runs in a worker process.
+
+    Workbooks are extracted into a temporary folder of their own and read
+    with excel_files_to_indicators, so archives parsed at the same time
+    don't see each other's files. Derived indicators are not created here:
+    an archive may hold only some of their inputs, they are derived from
+    the store when publishing.
+
+    Args:
+        zip_path (str): Path to the archive.
+        work_path (str): Folder for the temporary folders, the system temp folder if None.
+
+    Returns:
+        list: Indicator objects as loaded, the newest export of every code.
+    """
+    if work_path is not None:
+        os.makedirs(work_path, exist_ok=True)
+    folder = tempfile.mkdtemp(prefix='archive_', dir=work_path)
+    try:
+        ZipFileManager(zip_path, folder).extract_with_progress(progress=False)
+        indicators = excel_files_to_indicators(folder)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    # several exports of an indicator in the archive -> the newest is stored
+    return list(newest_indicators(indicators).values())
+
+# ------------------------------------- < ------------------------------------ #
+
+
+# ---------------------------------- daemon ---------------------------------- #
+
+def read_published(output_path) -> dict:
+    try:
+        with open(os.path.join(output_path, PUBLISH_FILE), encoding='utf-8') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {'archives': {}}
+
+
+class IngestDaemon:
+    """
+    Ingest export archives dropped into a folder, incrementally.
+
+    Ready archives (see ArchiveWatcher) are queued and parsed by at most
+    workers processes. The daemon upserts the results into the versioned
+    store, so only indicators that changed get new versions, and updates the
+    derived indicators whose inputs changed from the store. It then writes
+    the processed output (master_df dataset, rollup and cube) of the store
+    into a new folder in versions/ and publishes it by replacing
+    published.json, which points to that folder (see published_path). It
+    also lists the handled archives and is read on start, so a restart only
+    picks up new archives.
+
+    Args:
+        watch_path (str): Folder to watch.
+        output_path (str): Folder of the processed output, as in main().
+        store_path (str): Folder of the versioned store.
+        workers (int): Archives parsed at the same time.
+        settle (float): Seconds an archive must stay unchanged before it is read.
+        poll_interval (float): Seconds between scans of the folder; with
+            inotify the folder is also scanned on every event.
+        instructions (list): Instructions for derived indicators.
+        use_inotify (bool): Wake up on inotify events where available.
+        work_path (str): Folder for extracted workbooks, the system temp folder if None.
+    """
+
+    def __init__(self, watch_path, output_path, store_path, workers=2, settle=2.0, poll_interval=1.0,
+                 instructions=INSTRUCTIONS, use_inotify=True, work_path=None):
+        self.watch_path = watch_path
+        self.output_path = output_path
+        self.store_path = store_path
+        self.workers = workers
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self.instructions = instructions
+        self.use_inotify = use_inotify
+        self.work_path = work_path
+
+        self.queue = deque()
+        self.stop_event = threading.Event()
+        self.events = None
+
+    def stop(self):
+        # safe to call from a signal handler or another thread
+        self.stop_event.set()
+        if self.events is not None:
+            self.events.wake()
+
+    def create_events(self):
+        if self.use_inotify:
+            try:
+                return InotifyEvents(self.watch_path)
+            except OSError as error:
+                logging.info(f'inotify not available ({error}), polling every {self.poll_interval} s.')
+        return PollingEvents()
+
+    # ---------------------------------- publish ---------------------------------- #
+
+    def write_version(self, store, version) -> str:
+        # the whole output in a folder of its own -> nothing published is written to
+        version_path = os.path.join(self.output_path, VERSIONS_FOLDER, f'{version:06d}')
+        # left over by a run stopped before publishing it
+        shutil.rmtree(version_path, ignore_errors=True)
+
+        master_df = store_master_df(store, self.instructions)
+        save_master_df_to_parquet(master_df, version_path)
+        save_rollup(rollup_master_df(master_df), version_path)
+        save_cube(master_df, version_path)
+        return version_path
+
+    def remove_old_versions(self, version):
+        versions_path = os.path.join(self.output_path, VERSIONS_FOLDER)
+        for name in os.listdir(versions_path):
+            if name.isdigit() and int(name) <= version - KEEP_VERSIONS:
+                shutil.rmtree(os.path.join(versions_path, name), ignore_errors=True)
+
+    def publish(self, store, published, finished):
+        """
+        Upsert finished archives into the store and publish the processed output.
+
+        Args:
+            store (IndicatorStore): The store.
+            published (dict): Content of published.json, updated in place.
+            finished (list): (archive, future) pairs of parsed archives.
+        """
+        changed = []
+        records = {}
+        for archive, future in finished:
+            record = {'signature': archive['signature'], 'detected_at': archive['detected_at']}
+            try:
+                record['changed'] = store.ingest(future.result(), source=archive['name'])
+                # inputs may have come in earlier archives -> derived from the store
+                record['changed'] += update_derived_indicators(store, record['changed'], self.instructions, source=archive['name'])
+                changed.extend(record['changed'])
+            except Exception as error:
+                # a broken archive must not stop the daemon; it is retried once it changes
+                logging.exception(f"Archive {archive['name']} could not be ingested.")
+                record['error'] = repr(error)
+            records[archive['name']] = record
+
+        version = None
+        if changed or not master_df_exists(self.output_path):
+            version = published.get('version', 0) + 1
+            version_path = self.write_version(store, version)
+            published['version'] = version
+            published['output'] = os.path.relpath(version_path, self.output_path)
+
+        published_at = time.time()
+        for name, record in records.items():
+            if 'error' not in record:
+                record['published_at'] = published_at
+                logging.info(f"{name}: {len(record['changed'])} indicators changed, published {published_at - record['detected_at']:.2f} s after detection.")
+        published['archives'].update(records)
+        published['published_at'] = datetime.fromtimestamp(published_at).isoformat(timespec='seconds')
+
+        path = os.path.join(self.output_path, PUBLISH_FILE)
+        os.makedirs(self.output_path, exist_ok=True)
+        with open(f'{path}.tmp', 'w', encoding='utf-8') as file:
+            json.dump(published, file, ensure_ascii=False, indent=1)
+        # the one step publishing the new version
+        os.replace(f'{path}.tmp', path)
+
+        if version is not None:
+            self.remove_old_versions(version)
+
+    # ------------------------------------- < ------------------------------------ #
+
+    def run(self):
+        """
+        Watch the folder until stop() is called.
+        """
+        os.makedirs(self.watch_path, exist_ok=True)
+        published = read_published(self.output_path)
+        watcher = ArchiveWatcher(self.watch_path, self.settle, {
+            name: record['signature'] for name, record in published['archives'].items()
+        })
+        store = IndicatorStore(self.store_path)
+
+        self.events = self.create_events()
+        # future -> archive; a finished parse wakes the loop up
+        running = {}
+
+        logging.info(f'Watching {self.watch_path} for export archives.')
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                while not self.stop_event.is_set():
+                    self.queue.extend(watcher.poll())
+
+                    # bounded: the queue holds archives until a worker is free
+                    while self.queue and len(running) < self.workers:
+                        archive = self.queue.popleft()
+                        future = executor.submit(
+                            archive_to_indicators, os.path.join(self.watch_path, archive['name']), self.work_path,
+                        )
+                        future.add_done_callback(lambda _: self.events.wake())
+                        running[future] = archive
+
+                    finished = [(running.pop(future), future) for future in list(running) if future.done()]
+                    if finished:
+                        self.publish(store, published, finished)
+                        continue
+
+                    timeout = watcher.next_timeout()
+                    self.events.wait(self.poll_interval if timeout is None else min(timeout, self.poll_interval))
+
+                # parses in progress are dropped, their archives are picked up on the next start
+                executor.shutdown(wait=True, cancel_futures=True)
+        finally:
+            self.events.close()
+            self.events = None
+
+# ------------------------------------- < ------------------------------------ #
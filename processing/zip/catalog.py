@@ -0,0 +1,276 @@
+# catalog of an archive -> which indicators it contains, without loading the data
+
+import json
+import os
+import posixpath
+import re
+import sys
+import zipfile
+from dataclasses import asdict, dataclass, fields
+from xml.etree.ElementTree import iterparse
+
+from ..excel.metadata import metadata_from_file_name
+
+# namespaces of xlsx parts
+MAIN_NAMESPACE = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+RELATIONSHIPS_NAMESPACE = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PACKAGE_RELATIONSHIPS_NAMESPACE = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+# cell holding the indicator name in the first sheet, as in ExcelFileProcessor.read_workbook
+NAME_CELL = 'B5'
+
+CATALOG_VERSION = 1
+
+
+@dataclass
+class CatalogEntry:
+    """Indicator workbook in an archive"""
+    member: str = None
+    crc: int = None
+    file_size: int = None
+    category: str = None
+    indicator_code: str = None
+    timestamp: str = None
+    alternative_indicator_name: str = None
+    indicator_name: str = None
+    # data rows of the second sheet, header excluded
+    row_count: int = None
+    # filled in from the parse cache, the second sheet is not read
+    first_year: int = None
+    last_year: int = None
+
+
+# --------------------------------- workbook --------------------------------- #
+
+def sheet_paths(workbook_zip) -> list:
+    """
+    Paths of the worksheets in workbook order.
+
+    Args:
+        workbook_zip (zipfile.ZipFile): The xlsx file opened as zip.
+
+    Returns:
+        list: Paths of worksheet parts, e.g. ['xl/worksheets/sheet1.xml', ...].
+    """
+    relationships = {}
+    for _, element in iterparse(workbook_zip.open('xl/_rels/workbook.xml.rels')):
+        if element.tag == f'{PACKAGE_RELATIONSHIPS_NAMESPACE}Relationship':
+            target = element.get('Target')
+            # targets are relative to xl/ unless absolute
+            relationships[element.get('Id')] = target.lstrip('/') if target.startswith('/') else posixpath.join('xl', target)
+
+    return [
+        relationships[element.get(f'{RELATIONSHIPS_NAMESPACE}id')]
+        for _, element in iterparse(workbook_zip.open('xl/workbook.xml'))
+        if element.tag == f'{MAIN_NAMESPACE}sheet'
+    ]
+
+
+def shared_string(workbook_zip, index) -> str:
+    # shared strings are parsed only up to the needed one
+    position = 0
+    for _, element in iterparse(workbook_zip.open('xl/sharedStrings.xml')):
+        if element.tag == f'{MAIN_NAMESPACE}si':
+            if position == index:
+                return ''.join(text.text or '' for text in element.iter(f'{MAIN_NAMESPACE}t'))
+            position += 1
+            element.clear()
+    return None
+
+
+def cell_value(workbook_zip, sheet_path, reference) -> str:
+    """
+    Read a single cell, parsing the sheet only up to it.
+
+    Args:
+        workbook_zip (zipfile.ZipFile): The xlsx file opened as zip.
+        sheet_path (str): Path of the worksheet part.
+        reference (str): Cell reference, e.g. 'B5'.
+
+    Returns:
+        str: The cell value or None if the cell is empty.
+    """
+    for _, element in iterparse(workbook_zip.open(sheet_path)):
+        if element.tag == f'{MAIN_NAMESPACE}c' and element.get('r') == reference:
+            cell_type = element.get('t')
+            if cell_type == 'inlineStr':
+                return ''.join(text.text or '' for text in element.iter(f'{MAIN_NAMESPACE}t'))
+
+            value = element.find(f'{MAIN_NAMESPACE}v')
+            if value is None:
+                return None
+            if cell_type == 's':
+                return shared_string(workbook_zip, int(value.text))
+            return value.text
+
+        if element.tag == f'{MAIN_NAMESPACE}row':
+            element.clear()
+
+    return None
+
+
+def sheet_row_count(workbook_zip, sheet_path) -> int:
+    """
+    Number of rows of a sheet from its <dimension> element, without reading rows.
+
+    Returns:
+        int: Rows including the header or None if the sheet has no dimension.
+    """
+    with workbook_zip.open(sheet_path) as sheet:
+        # dimension is in the head of the part, before sheetData
+        head = sheet.read(4096).decode('utf-8', errors='ignore')
+
+    match = re.search(r'<dimension ref="[A-Z]+(\d+)(?::[A-Z]+(\d+))?"', head)
+    if match is None:
+        return None
+    return int(match[2] or match[1])
+
+# ------------------------------------- < ------------------------------------ #
+
+
+# ---------------------------------- catalog --------------------------------- #
+
+def scan_member(zip_ref, file_info) -> CatalogEntry:
+    """
+    Create a catalog entry of a workbook in the archive.
+
+    Reads the file name, cell B5 of the first sheet and the dimension of the
+    second sheet; rows of the second sheet are never parsed.
+
+    Args:
+        zip_ref (zipfile.ZipFile): The open archive.
+        file_info (zipfile.ZipInfo): The workbook member.
+
+    Returns:
+        CatalogEntry: The entry.
+    """
+    entry = CatalogEntry(member=file_info.filename, crc=file_info.CRC, file_size=file_info.file_size)
+
+    metadata = metadata_from_file_name(posixpath.basename(file_info.filename))
+    if metadata is not None:
+        entry.category = metadata.category
+        entry.indicator_code = metadata.indicator_code
+        entry.timestamp = metadata.timestamp.isoformat()
+        entry.alternative_indicator_name = metadata.alternative_indicator_name
+
+    with zip_ref.open(file_info) as member, zipfile.ZipFile(member) as workbook_zip:
+        sheets = sheet_paths(workbook_zip)
+        entry.indicator_name = cell_value(workbook_zip, sheets[0], NAME_CELL)
+        if len(sheets) > 1 and (row_count := sheet_row_count(workbook_zip, sheets[1])) is not None:
+            entry.row_count = row_count - 1
+
+    return entry
+
+
+def catalog_path(zip_path) -> str:
+    # catalog is stored next to the archive
+    return os.path.splitext(zip_path)[0] + '.catalog.json'
+
+
+def build_catalog(zip_path, previous=None, cache=None) -> list:
+    """
+    Scan the archive and create catalog entries of its workbooks.
+
+    Args:
+        zip_path (str): Path to the archive.
+        previous (list): Entries of an earlier scan; members with the same name
+            and CRC are reused instead of scanned.
+        cache (ParseCache): Parse cache to take year ranges from, if a member is cached.
+
+    Returns:
+        list: CatalogEntry objects in member order.
+    """
+    previous = {(entry.member, entry.crc): entry for entry in previous or []}
+    entries = []
+
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        for file_info in zip_ref.infolist():
+            if file_info.is_dir() or not file_info.filename.endswith('.xlsx'):
+                continue
+
+            entry = previous.get((file_info.filename, file_info.CRC)) or scan_member(zip_ref, file_info)
+
+            if cache is not None and entry.first_year is None:
+                indicator = cache.get(cache.key(file_info))
+                if indicator is not None and indicator.years:
+                    entry.first_year, entry.last_year = int(min(indicator.years)), int(max(indicator.years))
+
+            entries.append(entry)
+
+    return entries
+
+
+def save_catalog(zip_path, entries) -> str:
+    path = catalog_path(zip_path)
+    stat = os.stat(zip_path)
+
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'w', encoding='utf-8') as file:
+        json.dump({
+            'version': CATALOG_VERSION,
+            'archive_size': stat.st_size,
+            'archive_mtime': stat.st_mtime,
+            'entries': [asdict(entry) for entry in entries],
+        }, file, ensure_ascii=False, indent=1)
+    os.replace(temporary_path, path)
+
+    return path
+
+
+def read_catalog(zip_path) -> tuple:
+    """
+    Read the stored catalog of the archive.
+
+    Returns:
+        tuple: (entries, True if the catalog matches the archive size and mtime),
+            entries is None if there is no readable catalog.
+    """
+    try:
+        with open(catalog_path(zip_path), encoding='utf-8') as file:
+            stored = json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None, False
+
+    if stored.get('version') != CATALOG_VERSION:
+        return None, False
+
+    names = {field.name for field in fields(CatalogEntry)}
+    entries = [CatalogEntry(**{key: value for key, value in entry.items() if key in names}) for entry in stored['entries']]
+
+    stat = os.stat(zip_path)
+    up_to_date = stored['archive_size'] == stat.st_size and stored['archive_mtime'] == stat.st_mtime
+    return entries, up_to_date
+
+
+def load_catalog(zip_path, refresh=False, cache=None) -> list:
+    """
+    Return the catalog of the archive, scanning it only if needed.
+
+    The stored catalog is used as is if the archive did not change; otherwise
+    only new or changed members are scanned and the catalog is saved again.
+
+    Args:
+        zip_path (str): Path to the archive.
+        refresh (bool): Scan every member again.
+        cache (ParseCache): Parse cache to take year ranges from.
+
+    Returns:
+        list: CatalogEntry objects.
+    """
+    entries, up_to_date = (None, False) if refresh else read_catalog(zip_path)
+
+    if up_to_date and (cache is None or all(entry.first_year is not None for entry in entries)):
+        return entries
+
+    entries = build_catalog(zip_path, previous=entries, cache=cache)
+    save_catalog(zip_path, entries)
+    return entries
+
+# ------------------------------------- < ------------------------------------ #
+
+
+if __name__ == '__main__':
+    # python -m processing.zip.catalog data/data_original.zip [--refresh]
+    for entry in load_catalog(sys.argv[1], refresh='--refresh' in sys.argv[2:]):
+        years = f"{entry.first_year}-{entry.last_year}" if entry.first_year is not None else '-'
+        print(f"{entry.category}\t{entry.indicator_code}\t{entry.timestamp}\t{entry.row_count}\t{years}\t{entry.indicator_name}")
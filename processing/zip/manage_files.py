@@ -1,5 +1,6 @@
 import sys  # for printing progress
 import zipfile
+import io
 import os
 from paths import paths
 
@@ -16,20 +17,65 @@ class ZipFileManager:
 
     # unpack selected zip file to selected folder
 
-    def extract_with_progress(self):
+    # progress=False -> quiet, e.g. in a daemon
+    def extract_with_progress(self, progress=True):
         with zipfile.ZipFile(self.zip_path, 'r') as zip_ref:
             total_size = sum(file_info.file_size for file_info in zip_ref.infolist())
             extracted_size = 0
 
             for file_info in zip_ref.infolist():
                 extracted_size += file_info.file_size
-                extracted_percent = (extracted_size / total_size) * 100
-                sys.stdout.write('\rExtracting: {:.2f}%'.format(extracted_percent))
-                sys.stdout.flush()
+                if progress:
+                    extracted_percent = (extracted_size / total_size) * 100
+                    sys.stdout.write('\rExtracting: {:.2f}%'.format(extracted_percent))
+                    sys.stdout.flush()
 
                 zip_ref.extract(file_info, self.output_path)
 
-            sys.stdout.write('\rExtraction Complete!     \n')
-            sys.stdout.flush()
+            if progress:
+                sys.stdout.write('\rExtraction Complete!     \n')
+                sys.stdout.flush()
+
+    # read members in memory instead of extracting them
+
+    def member_infos(self, extension='.xlsx') -> list:
+        """
+        List members of the zip file without reading them.
+
+        Args:
+            extension (str): Only members ending with this extension are listed.
+
+        Returns:
+            list: zipfile.ZipInfo objects, holding name, size and CRC32 of the members.
+        """
+        with zipfile.ZipFile(self.zip_path, 'r') as zip_ref:
+            return [
+                file_info for file_info in zip_ref.infolist()
+                if not file_info.is_dir() and file_info.filename.endswith(extension)
+            ]
+
+    def read_member(self, file_info) -> io.BytesIO:
+        with zipfile.ZipFile(self.zip_path, 'r') as zip_ref:
+            return io.BytesIO(zip_ref.read(file_info))
+
+    def iter_members(self, extension='.xlsx'):
+        """
+        Yield members of the zip file as in-memory file-like objects.
+
+        Nothing is written to disk; each member is decompressed into a BytesIO
+        only when the generator reaches it.
+
+        Args:
+            extension (str): Only members ending with this extension are yielded.
+
+        Yields:
+            tuple: (member name, io.BytesIO with the member content)
+        """
+        with zipfile.ZipFile(self.zip_path, 'r') as zip_ref:
+            for file_info in zip_ref.infolist():
+                if file_info.is_dir() or not file_info.filename.endswith(extension):
+                    continue
+
+                yield file_info.filename, io.BytesIO(zip_ref.read(file_info))
 
 # ------------------------------------- < ------------------------------------ #
\ No newline at end of file
@@ -0,0 +1,30 @@
+# serve the processed indicator data over HTTP
+# python -m service [--host 127.0.0.1] [--port 8000] [--reload-interval 5]
+
+import argparse
+import asyncio
+import logging
+
+from paths import paths
+from .server import QueryService, ResponseCache
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m service', description='Serve indicator data over HTTP.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--output-path', default=paths.output_data_path, help='folder with the master_df dataset')
+    parser.add_argument('--cache-entries', type=int, default=1024, help='responses kept in the cache')
+    parser.add_argument('--reload-interval', type=float, default=5, help='seconds between checks for new data, 0 to disable')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    service = QueryService.from_store(args.output_path, ResponseCache(args.cache_entries))
+    try:
+        asyncio.run(service.serve(args.host, args.port, args.reload_interval or None))
+    except KeyboardInterrupt:
+        pass
+
+
+main()
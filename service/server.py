@@ -0,0 +1,347 @@
+import asyncio
+import io
+import json
+import logging
+import os
+from collections import OrderedDict
+from email.utils import formatdate
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import pandas as pd
+import pyarrow as pa
+
+from processing.store import MASTER_DF_DATASET, IndicatorQuery, published_path
+
+# ---------------------------------- config ---------------------------------- #
+
+CONTENT_TYPES = {
+    'json': 'application/json; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+# idle keep-alive connections are closed after this many seconds
+KEEP_ALIVE_TIMEOUT = 15
+
+# ------------------------------------- < ------------------------------------ #
+
+
+# ------------------------------- response cache ------------------------------- #
+
+class ResponseCache:
+    """
+    LRU cache of encoded responses, bounded by entries and bytes.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=256 * 1024 ** 2):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        content_type, body = entry
+        if len(body) > self.max_bytes:
+            return
+        if key in self.entries:
+            self.size -= len(self.entries.pop(key)[1])
+        self.entries[key] = entry
+        self.size += len(body)
+
+        # least recently used first
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            _, (_, evicted) = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+# ------------------------------------- < ------------------------------------ #
+
+
+# ---------------------------------- encoding ---------------------------------- #
+
+def encode_frame(df, response_format) -> bytes:
+    if response_format == 'json':
+        return df.to_json(orient='records', force_ascii=False).encode('utf-8')
+    if response_format == 'csv':
+        return df.to_csv(index=False).encode('utf-8')
+
+    # arrow IPC stream
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message=None):
+        super().__init__(message or status.phrase)
+        self.status = status
+
+# ------------------------------------- < ------------------------------------ #
+
+
+# ---------------------------------- service ---------------------------------- #
+
+class QueryService:
+    """
+    HTTP service answering indicator queries from an IndicatorQuery.
+
+    Routes (GET or HEAD, '?format=json|csv|arrow', json by default):
+        /version                                   data version
+        /indicators                                indicator codes and names
+        /indicators/<code>?codes=a,b&from=&to=     rows of an indicator
+        /indicators/<code>/regions/<region>        series of one region
+        /indicators/<code>/years/<year>            cross section of one year
+
+    Encoded responses are kept in an LRU cache keyed by the data version and
+    the request target; the version is also the ETag, so clients revalidate
+    with If-None-Match and get 304 until the data changes.
+    """
+
+    def __init__(self, query: IndicatorQuery, output_path=None, cache=None):
+        self.output_path = output_path
+        self.cache = cache if cache is not None else ResponseCache()
+        self.set_query(query)
+
+    def set_query(self, query: IndicatorQuery):
+        # entries of the old version can't be hit anymore, drop them right away
+        self.query = query
+        self.version = query.version
+        self.etag = f'"{self.version}"'
+        self.cache.clear()
+
+        self.indicators = (
+            pd.DataFrame({'Indicator code': query.data['Indicator code'], 'Indicator': query.data['Indicator']})
+            .drop_duplicates('Indicator code')
+            .reset_index(drop=True)
+            if 'Indicator' in query.data else
+            pd.DataFrame({'Indicator code': query.indicator_codes})
+        )
+
+    @classmethod
+    def from_store(cls, output_path, cache=None):
+        return cls(IndicatorQuery.from_store(output_path), output_path, cache)
+
+    # ---------------------------------- routing --------------------------------- #
+
+    def route(self, path, parameters) -> pd.DataFrame:
+        parts = [unquote(part) for part in path.strip('/').split('/')]
+
+        if parts == ['indicators']:
+            return self.indicators
+
+        if len(parts) < 2 or parts[0] != 'indicators':
+            raise HTTPError(HTTPStatus.NOT_FOUND)
+
+        indicator_code = parts[1]
+        if indicator_code not in self.query.indicator_index:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f'Unknown indicator {indicator_code}')
+
+        try:
+            years = (
+                int(parameters['from'][0]) if 'from' in parameters else None,
+                int(parameters['to'][0]) if 'to' in parameters else None,
+            )
+            if len(parts) == 2:
+                codes = parameters['codes'][0].split(',') if 'codes' in parameters else None
+                return self.query.get(indicator_code, codes=codes, years=years)
+
+            if len(parts) == 4 and parts[2] == 'regions':
+                return self.query.series(parts[3], indicator_code, years=years).rename('Value').reset_index()
+
+            if len(parts) == 4 and parts[2] == 'years':
+                return self.query.cross_section(indicator_code, int(parts[3])).rename('Value').reset_index()
+
+        except ValueError as error:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, str(error))
+
+        raise HTTPError(HTTPStatus.NOT_FOUND)
+
+    def render(self, target) -> tuple:
+        """
+        Encode the response to a request target, without the cache.
+
+        Args:
+            target (str): Path and query string, e.g. '/indicators/3430?format=csv'.
+
+        Returns:
+            tuple: (content type, body).
+        """
+        url = urlsplit(target)
+        parameters = parse_qs(url.query)
+
+        if url.path.rstrip('/') == '/version':
+            return CONTENT_TYPES['json'], json.dumps({'version': self.version}).encode('utf-8')
+
+        response_format = parameters.get('format', ['json'])[0]
+        if response_format not in CONTENT_TYPES:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f'Unknown format {response_format}')
+
+        return CONTENT_TYPES[response_format], encode_frame(self.route(url.path, parameters), response_format)
+
+    async def respond(self, target) -> tuple:
+        key = (self.version, target)
+        entry = self.cache.get(key)
+        if entry is None:
+            # encoding big slices off the event loop -> cached requests are served meanwhile
+            entry = await asyncio.get_running_loop().run_in_executor(None, self.render, target)
+            # the data may have been reloaded while encoding
+            if key[0] == self.version:
+                self.cache.put(key, entry)
+        return entry
+
+    # ------------------------------------- < ------------------------------------ #
+
+    # ----------------------------------- http ----------------------------------- #
+
+    @staticmethod
+    async def read_request(reader):
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+
+        headers = {}
+        while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        # bodies are not used, but have to be consumed on keep-alive connections
+        if (length := int(headers.get('content-length', 0) or 0)) > 0:
+            await reader.readexactly(length)
+
+        method, target, version = request_line.decode('latin-1').split()
+        return method, target, version, headers
+
+    @staticmethod
+    def response_head(status, headers) -> bytes:
+        lines = [f'HTTP/1.1 {status.value} {status.phrase}']
+        lines += [f'{name}: {value}' for name, value in headers.items()]
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+    async def handle(self, method, target, headers) -> tuple:
+        # (status, headers, body)
+        if method not in ('GET', 'HEAD'):
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED)
+
+        response_headers = {'ETag': self.etag, 'Cache-Control': 'no-cache'}
+
+        # route first -> unknown paths and bad parameters are 404/400 whatever the ETag,
+        # revalidations of known targets are cache hits
+        content_type, body = await self.respond(target)
+
+        if headers.get('if-none-match') in (self.etag, '*'):
+            return HTTPStatus.NOT_MODIFIED, response_headers, b''
+
+        response_headers['Content-Type'] = content_type
+        return HTTPStatus.OK, response_headers, body
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self.read_request(reader), KEEP_ALIVE_TIMEOUT)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                    break
+                if request is None:
+                    break
+                method, target, http_version, headers = request
+
+                try:
+                    status, response_headers, body = await self.handle(method, target, headers)
+                except HTTPError as error:
+                    status, response_headers = error.status, {'Content-Type': CONTENT_TYPES['json']}
+                    body = json.dumps({'error': str(error)}).encode('utf-8')
+                except Exception:
+                    logging.exception(f'Request {target} failed.')
+                    status, response_headers, body = HTTPStatus.INTERNAL_SERVER_ERROR, {}, b''
+
+                keep_alive = (
+                    headers.get('connection', '').lower() != 'close'
+                    and (http_version == 'HTTP/1.1' or headers.get('connection', '').lower() == 'keep-alive')
+                )
+                response_headers.update({
+                    'Content-Length': len(body),
+                    'Date': formatdate(usegmt=True),
+                    'Connection': 'keep-alive' if keep_alive else 'close',
+                })
+
+                writer.write(self.response_head(status, response_headers))
+                if method != 'HEAD':
+                    writer.write(body)
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    # ------------------------------------- < ------------------------------------ #
+
+    # ---------------------------------- reload ---------------------------------- #
+
+    def dataset_stamp(self):
+        # the dataset folder is swapped in on save, or published in a new folder -> a new inode and mtime
+        stat = os.stat(os.path.join(published_path(self.output_path), MASTER_DF_DATASET))
+        return stat.st_ino, stat.st_mtime_ns
+
+    async def watch_store(self, interval):
+        stamp = self.dataset_stamp()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                new_stamp = self.dataset_stamp()
+            except FileNotFoundError:
+                continue
+            if new_stamp == stamp:
+                continue
+
+            query = await asyncio.get_running_loop().run_in_executor(None, IndicatorQuery.from_store, self.output_path)
+            stamp = new_stamp
+            self.set_query(query)
+            logging.info(f'Data reloaded, version {self.version}')
+
+    # ------------------------------------- < ------------------------------------ #
+
+    async def serve(self, host='127.0.0.1', port=8000, reload_interval=None):
+        """
+        Serve requests until cancelled.
+
+        Args:
+            host (str): Address to listen on.
+            port (int): Port to listen on.
+            reload_interval (float): Seconds between checks for a new dataset in
+                output_path, no checks if None.
+        """
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        logging.info(f'Serving {len(self.query)} rows, version {self.version}, on http://{host}:{port}')
+
+        watcher = None
+        if reload_interval and self.output_path is not None:
+            watcher = asyncio.create_task(self.watch_store(reload_interval))
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+
+# ------------------------------------- < ------------------------------------ #
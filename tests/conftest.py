@@ -0,0 +1,5 @@
+# the repository root is the import root, as for python main.py
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,47 @@
+import asyncio
+import os
+
+import pandas as pd
+
+from benchmarks.synthetic_archive import generate_archive
+from benchmarks.synthetic_recording import record_archive
+import processing.processor as processor
+from processing.bdl import ReplayServer, fetch_indicators
+
+MASTER_DF_KEY = ['Indicator code', 'Code', 'Year']
+
+
+def sorted_master_df(master_df):
+    master_df = master_df.astype({'Indicator code': str, 'Code': str, 'Year': int, 'Value': float})
+    # rows sharing a key (e.g. both sexes of 3895) in value order
+    return master_df.sort_values(MASTER_DF_KEY + ['Value'], ignore_index=True)
+
+
+async def replay(recording_path, indicator_codes, fail_rate):
+    async with ReplayServer(recording_path, fail_rate=fail_rate) as replay_server:
+        base_url = await replay_server.start()
+        # no throttling and quick retries; a request fails 11 times in a row with a negligible chance
+        indicators = await fetch_indicators(indicator_codes, base_url=base_url, quotas=[(1000, 1)],
+                                            max_retries=10, backoff=0.001)
+        return indicators, replay_server.requests
+
+
+def test_api_matches_archive(tmp_path):
+    zip_path = str(tmp_path / 'export.zip')
+    generate_archive(zip_path, indicators=8, first_year=2016, last_year=2021)
+    recording_path = str(tmp_path / 'recording')
+    indicator_codes = record_archive(zip_path, recording_path)
+
+    indicators, requests = asyncio.run(replay(recording_path, indicator_codes, fail_rate=0.3))
+    # failed requests were retried
+    assert requests > len(os.listdir(recording_path))
+
+    for indicator in indicators:
+        indicator.df = processor.process_indicator_df(indicator)
+    api_df = processor.indicators_to_master_df(indicators)
+
+    archive_df = processor.main(zip_path, use_cache=False, overwrite=True, output_path=str(tmp_path / 'output'))
+
+    assert list(api_df.columns) == list(archive_df.columns)
+    # categories are in the order indicators were built in
+    pd.testing.assert_frame_equal(sorted_master_df(api_df), sorted_master_df(archive_df), check_categorical=False)
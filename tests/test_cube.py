@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from processing.store import IndicatorCube
+
+
+def master_df(codes, years, values) -> pd.DataFrame:
+    return pd.DataFrame({
+        'Code': codes,
+        'Name': [f'REGION {code}' for code in codes],
+        'Year': years,
+        'Indicator': 'Wskaźnik',
+        'Indicator code': '5000',
+        'Value': values,
+    })
+
+
+def test_cells():
+    cube = IndicatorCube.from_master_df(master_df(['200000', '400000', '200000'], [2020, 2020, 2021], [1.0, 2.0, 3.0]))
+
+    assert cube.shape == (1, 2, 2)
+    assert cube.value('5000', '200000', 2021) == 3.0
+    assert cube.value('5000', '400000', 2020) == 2.0
+    assert np.isnan(cube.value('5000', '400000', 2021))
+
+
+def test_duplicated_cells_raise():
+    # e.g. an indicator exported per sex without a transform resolving it
+    with pytest.raises(ValueError, match=r"1 rows share .* \['5000'\]"):
+        IndicatorCube.from_master_df(master_df(['200000', '200000'], [2020, 2020], [60.0, 64.0]))
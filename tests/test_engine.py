@@ -0,0 +1,45 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import analysis.engine as engine
+from analysis import AnalysisEngine
+from processing.store import IndicatorCube
+
+
+def gap_cube() -> IndicatorCube:
+    # 2002 is missing from the year axis
+    return IndicatorCube.from_master_df(pd.DataFrame({
+        'Code': '200000',
+        'Name': 'DOLNOŚLĄSKIE',
+        'Year': [2000, 2001, 2003, 2004],
+        'Indicator': 'Wskaźnik',
+        'Indicator code': '5000',
+        'Value': [1.0, 2.0, 4.0, 8.0],
+    }))
+
+
+def test_yoy_growth_masks_gaps():
+    growth = AnalysisEngine(gap_cube()).yoy_growth()
+    np.testing.assert_array_equal(growth[0, 0], [np.nan, 1.0, np.nan, 1.0])
+
+
+def test_results_are_cached_per_function_source(tmp_path, monkeypatch):
+    cube = gap_cube()
+    AnalysisEngine(cube, str(tmp_path)).yoy_growth()
+    files = os.listdir(os.path.join(tmp_path, cube.version))
+    assert len(files) == 1 and files[0].startswith('yoy_growth.')
+
+    # the cached file is loaded while the function is unchanged
+    cached_path = os.path.join(tmp_path, cube.version, files[0])
+    np.save(cached_path, np.full((1, 1, 4), 7.0))
+    assert (AnalysisEngine(cube, str(tmp_path)).yoy_growth() == 7.0).all()
+
+    # other code -> computed again, next to the old result
+    def yoy_growth(values, years):
+        return np.zeros(values.shape)
+
+    monkeypatch.setattr(engine, 'yoy_growth', yoy_growth)
+    assert (AnalysisEngine(cube, str(tmp_path)).yoy_growth() == 0).all()
+    assert len(os.listdir(os.path.join(tmp_path, cube.version))) == 2
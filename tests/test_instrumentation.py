@@ -0,0 +1,78 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+from benchmarks.synthetic_archive import generate_archive
+import processing.processor as processor
+from processing.instrumentation import active_report, map_in_workers, report_stage, run_report
+
+
+@pytest.fixture(scope='module')
+def archive(tmp_path_factory):
+    zip_path = str(tmp_path_factory.mktemp('archives') / 'archive.zip')
+    generate_archive(zip_path, indicators=7, first_year=2016, last_year=2021)
+    return zip_path
+
+
+def allocate(mib) -> int:
+    # touches every page -> resident
+    with report_stage('allocate', rows_in=mib):
+        return int(np.ones(mib * 1024 ** 2, dtype=np.uint8).sum())
+
+
+def test_stages_of_worker_processes_are_recorded(archive):
+    with run_report() as report:
+        indicator_list = processor.zip_to_indicators(archive, workers=2)
+        processor.indicators_to_master_df(indicator_list, workers=2)
+
+    parsed = [record for record in report.records if record['stage'] == 'process_indicator_df']
+    assert sorted(record['indicator'] for record in parsed) == sorted(indicator.code for indicator in indicator_list)
+    assert all(record['worker'] != os.getpid() for record in parsed)
+
+    # derived indicators are created in threads of this process
+    created = [record for record in report.records if record['stage'] == 'create_new_indicator']
+    assert [record['indicator'] for record in created] == ['1869-3787']
+    assert 'worker' not in created[0]
+
+
+def test_peak_memory_of_a_stage():
+    # a fresh process -> its peak RSS so far, from imports, is well below what the stage allocates
+    with run_report(trace_memory=True) as report:
+        with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as executor:
+            assert map_in_workers(executor, allocate, [256]) == [256 * 1024 ** 2]
+
+    record, = [record for record in report.records if record['stage'] == 'allocate']
+    # the array is freed before the stage ends, only the peak sees it
+    assert record['max_rss_delta_mib'] >= 192
+    assert record['traced_peak_mib'] >= 256
+    assert record['rss_delta_mib'] < 64
+
+
+def test_concurrent_runs_keep_their_own_report():
+    barrier = threading.Barrier(2)
+    reports = {}
+
+    def run(name):
+        with run_report() as report:
+            # both runs are active at the same time
+            barrier.wait()
+            for _ in range(20):
+                with report_stage(name):
+                    pass
+            barrier.wait()
+            reports[name] = report
+        assert active_report() is None
+
+    threads = [threading.Thread(target=run, args=(name,)) for name in ('first', 'second')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for name, report in reports.items():
+        assert sorted({record['stage'] for record in report.records}) == sorted({name, 'run'})
+        assert len(report.records) == 21
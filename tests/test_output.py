@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+
+from processing.store import ROW_GROUP_SIZE, master_df_filter, master_df_to_table, read_master_df, save_master_df_to_parquet
+
+
+def synthetic_master_df(regions, years) -> pd.DataFrame:
+    codes = np.char.add('2', np.arange(regions).astype(str)).astype(object)
+    return pd.DataFrame({
+        'Code': np.repeat(codes, len(years)),
+        'Name': 'GMINA',
+        'Year': np.tile(years, regions),
+        'Indicator': 'Wskaźnik',
+        'Indicator code': '5000',
+        'Value': np.arange(regions * len(years), dtype=float),
+    })
+
+
+def test_years_form_row_groups(tmp_path):
+    years = np.arange(2002, 2022)
+    master_df = synthetic_master_df(2477, years)
+    save_master_df_to_parquet(master_df, str(tmp_path))
+
+    fragments = list(ds.dataset(str(tmp_path / 'master_df'), format='parquet').get_fragments())
+    assert len(fragments) == 1
+    row_groups = fragments[0].row_groups
+    assert len(row_groups) == -(-len(master_df) // ROW_GROUP_SIZE)
+
+    # row groups hold a few consecutive years -> a year filter reads only some of them
+    year_filter = master_df_filter(years=(2020, 2021))
+    assert 0 < len(fragments[0].split_by_row_group(year_filter)) < len(row_groups)
+
+    df = read_master_df(str(tmp_path), years=(2020, 2021))
+    expected = master_df[master_df['Year'] >= 2020]
+    assert len(df) == len(expected)
+    assert sorted(df['Value']) == sorted(expected['Value'])
+
+
+def test_missing_strings_stay_null():
+    master_df = synthetic_master_df(2, [2020])
+    master_df['Name'] = pd.Categorical(['GMINA', None])
+
+    table = master_df_to_table(master_df)
+
+    assert table.column('Name').to_pylist() == ['GMINA', None]
+    assert table.column('Code').to_pylist() == ['20', '21']
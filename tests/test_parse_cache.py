@@ -0,0 +1,80 @@
+import importlib
+import logging
+import os
+import sys
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic_archive import generate_archive
+import processing.processor as processor
+from processing.cache import ParseCache, config_hash
+
+
+def cache_log(caplog) -> list:
+    return [record.getMessage() for record in caplog.records if 'loaded from cache' in record.getMessage()]
+
+
+def test_fingerprint_follows_source(tmp_path, monkeypatch):
+    # a module of processing code, edited between imports
+    module_path = tmp_path / 'cached_processing.py'
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    module_path.write_text('def process(df):\n    return df\n')
+    module = importlib.import_module('cached_processing')
+    before = config_hash(module.process), config_hash(module)
+
+    module_path.write_text('def process(df):\n    return df.dropna()\n')
+    module = importlib.reload(module)
+    after = config_hash(module.process), config_hash(module)
+    sys.modules.pop('cached_processing')
+
+    assert before[0] != after[0]
+    assert before[1] != after[1]
+    assert config_hash({'subset': ['Code']}) != config_hash({'subset': ['Code', 'Year']})
+
+
+def test_cache_hits_and_config_change(tmp_path, caplog):
+    zip_path = str(tmp_path / 'export.zip')
+    generate_archive(zip_path, indicators=4, first_year=2019, last_year=2021)
+    cache_path = str(tmp_path / 'cache')
+    caplog.set_level(logging.INFO)
+
+    parsed = processor.zip_to_indicators(zip_path, cache=ParseCache(cache_path, config='a'))
+    cached = processor.zip_to_indicators(zip_path, cache=ParseCache(cache_path, config='a'))
+    # other processing code -> every member is parsed again
+    reparsed = processor.zip_to_indicators(zip_path, cache=ParseCache(cache_path, config='b'))
+
+    assert cache_log(caplog) == [
+        '0 indicators loaded from cache, 4 to parse',
+        '4 indicators loaded from cache, 0 to parse',
+        '0 indicators loaded from cache, 4 to parse',
+    ]
+    for first, second in zip(parsed, cached):
+        assert first.code == second.code
+        pd.testing.assert_frame_equal(first.df, second.df)
+    assert [indicator.code for indicator in reparsed] == [indicator.code for indicator in parsed]
+    assert len(os.listdir(cache_path)) == 8
+
+    # the key of the repo's cache changes with the processing code
+    assert processor.create_parse_cache(cache_path).config == config_hash(*processor.PARSE_CACHE_CONFIG)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ParseCache(str(tmp_path / 'cache'))
+    cache.put('a', list(range(1000)))
+    cache.put('b', list(range(1000)))
+    entry_size = os.path.getsize(cache.entry_path('a'))
+
+    # a was written first but read last
+    now = time.time()
+    os.utime(cache.entry_path('a'), (now - 20, now - 20))
+    os.utime(cache.entry_path('b'), (now - 10, now - 10))
+    assert cache.get('a') == list(range(1000))
+
+    cache.max_size = 2 * entry_size
+    cache.put('c', list(range(1000)))
+
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert cache.size() <= cache.max_size
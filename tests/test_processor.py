@@ -0,0 +1,36 @@
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic_archive import generate_archive
+import processing.processor as processor
+
+
+@pytest.fixture(scope='module')
+def archive(tmp_path_factory):
+    zip_path = str(tmp_path_factory.mktemp('archives') / 'archive.zip')
+    generate_archive(zip_path, indicators=7, first_year=2016, last_year=2021)
+    return zip_path
+
+
+def build(archive, output_path, **options) -> pd.DataFrame:
+    master_df = processor.main(archive, use_cache=False, overwrite=True, output_path=str(output_path), **options)
+    # extracted workbooks are listed from the folder -> indicators, and categories, may come in another order
+    master_df = master_df.astype({column: str for column in master_df.select_dtypes('category').columns})
+    return master_df.sort_values(['Indicator code', 'Code', 'Year']).reset_index(drop=True)
+
+
+@pytest.fixture(scope='module')
+def streamed(archive, tmp_path_factory) -> pd.DataFrame:
+    # default mode: workbooks read from the zip at once, in this process
+    return build(archive, tmp_path_factory.mktemp('stream'), stream=True)
+
+
+@pytest.mark.parametrize('options', [
+    {'stream': True, 'chunk_size': 50},
+    {'stream': False},
+    {'stream': False, 'chunk_size': 50},
+    {'stream': True, 'workers': 2},
+])
+def test_modes_give_the_same_master_df(archive, streamed, tmp_path, options):
+    assert len(streamed)
+    pd.testing.assert_frame_equal(build(archive, tmp_path, **options), streamed)
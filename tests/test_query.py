@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from processing.store import IndicatorQuery
+
+
+@pytest.fixture(scope='module')
+def master_df() -> pd.DataFrame:
+    # 3 indicators x 5 regions x 2010-2019, shuffled, some region-years missing
+    rng = np.random.default_rng(0)
+    rows = [
+        (indicator_code, code, year)
+        for indicator_code in ('3430', '1869', '60')
+        for code in ('200000', '400000', '1061000', '2262000', '3000000')
+        for year in range(2010, 2020)
+    ]
+    df = pd.DataFrame(rows, columns=['Indicator code', 'Code', 'Year'])
+    df['Name'] = 'REGION ' + df['Code']
+    df['Indicator'] = 'Wskaźnik ' + df['Indicator code']
+    df['Value'] = rng.normal(size=len(df))
+    return df.sample(frac=0.8, random_state=0).reset_index(drop=True)
+
+
+def expected(master_df, indicator_code, codes=None, years=(None, None)) -> pd.DataFrame:
+    # the same query as a pandas filter
+    first_year, last_year = years
+    keep = master_df['Indicator code'] == indicator_code
+    if codes is not None:
+        keep &= master_df['Code'].isin(codes)
+    if first_year is not None:
+        keep &= master_df['Year'] >= first_year
+    if last_year is not None:
+        keep &= master_df['Year'] <= last_year
+    return master_df[keep].sort_values(['Code', 'Year']).reset_index(drop=True)
+
+
+@pytest.mark.parametrize('codes, years', [
+    (None, None),
+    (None, (2012, 2015)),
+    (None, (None, 2011)),
+    (['400000', '3000000'], None),
+    (['3000000', '200000'], (2014, None)),
+    (['200000', '9999999'], (2013, 2013)),
+])
+def test_get_matches_pandas_filter(master_df, codes, years):
+    query = IndicatorQuery(master_df)
+    result = query.get('1869', codes=codes, years=years)
+
+    if codes is None:
+        reference = expected(master_df, '1869', years=years or (None, None))
+    else:
+        # runs are returned in the order of the requested codes
+        reference = pd.concat([expected(master_df, '1869', [code], years or (None, None)) for code in codes])
+    pd.testing.assert_frame_equal(
+        result.reset_index(drop=True),
+        reference[result.columns].reset_index(drop=True),
+        check_dtype=False,
+    )
+
+
+def test_series_and_cross_section_match_pandas_filter(master_df):
+    query = IndicatorQuery(master_df)
+
+    series = query.series('400000', '3430', years=(2011, 2017))
+    reference = expected(master_df, '3430', ['400000'], (2011, 2017))
+    np.testing.assert_array_equal(series.index, reference['Year'])
+    np.testing.assert_array_equal(series.to_numpy(), reference['Value'])
+
+    cross_section = query.cross_section('60', 2015)
+    reference = master_df[(master_df['Indicator code'] == '60') & (master_df['Year'] == 2015)].sort_values('Code')
+    np.testing.assert_array_equal(cross_section.index, reference['Code'])
+    np.testing.assert_array_equal(cross_section.to_numpy(), reference['Value'])
+
+
+def test_missing_rows(master_df):
+    query = IndicatorQuery(master_df)
+
+    assert query.get('9999').empty
+    assert query.series('9999999', '3430').empty
+    assert np.isnan(query.value('3430', '200000', 1990))
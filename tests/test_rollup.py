@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from processing.store import rollup_master_df
+
+
+def test_sum_of_group_without_values_is_nan():
+    # voivodeship 02 has values, every gmina of voivodeship 04 is missing one
+    master_df = pd.DataFrame({
+        'Indicator code': '1',
+        'Code': ['0201011', '0201021', '0401011', '0401021'],
+        'Year': 2020,
+        'Value': [1.0, 2.0, np.nan, np.nan],
+    })
+
+    rollup = rollup_master_df(master_df).set_index(['Level', 'Code'])
+
+    assert rollup.loc[('voivodeship', '0200000'), 'Sum'] == 3.0
+    empty = rollup.loc[('voivodeship', '0400000')]
+    assert empty['Count'] == 0
+    assert np.isnan(empty['Sum'])
+    assert np.isnan(empty['Mean'])
+    assert rollup.loc[('national', '0000000'), 'Sum'] == 3.0
+
+
+def test_weighted_mean():
+    # indicator 1 is a rate, indicator 2 the population weighting it
+    master_df = pd.DataFrame({
+        'Indicator code': ['1'] * 3 + ['2'] * 3,
+        'Code': ['0201011', '0201021', '0202011'] * 2,
+        'Year': 2020,
+        'Value': [10.0, 20.0, 40.0, 100.0, 300.0, np.nan],
+    })
+
+    rollup = rollup_master_df(master_df, {'weights': {'1': '2'}})
+    rate = rollup[rollup['Indicator code'] == '1'].set_index(['Level', 'Code'])
+
+    # the gmina without population counts in the mean, not in the weighted mean
+    assert rate.loc[('voivodeship', '0200000'), 'Weighted mean'] == (10 * 100 + 20 * 300) / 400
+    assert rate.loc[('voivodeship', '0200000'), 'Mean'] == 70 / 3
+    assert rate.loc[('powiat', '0201000'), 'Weighted mean'] == 17.5
+    assert np.isnan(rate.loc[('powiat', '0202000'), 'Weighted mean'])
+    # no weight configured -> no weighted mean
+    assert rollup.loc[rollup['Indicator code'] == '2', 'Weighted mean'].isna().all()
+
+
+def test_duplicated_rows_raise():
+    # one row per sex would be summed as two units
+    master_df = pd.DataFrame({
+        'Indicator code': '3895',
+        'Code': ['0201011', '0201011'],
+        'Year': 2020,
+        'Value': [60.0, 64.0],
+    })
+
+    with pytest.raises(ValueError, match=r"\['3895'\]"):
+        rollup_master_df(master_df)
@@ -0,0 +1,56 @@
+import asyncio
+import json
+from http import HTTPStatus
+
+import pandas as pd
+import pytest
+
+from processing.store import IndicatorQuery
+from service.server import HTTPError, QueryService
+
+
+@pytest.fixture
+def service() -> QueryService:
+    master_df = pd.DataFrame({
+        'Code': ['200000', '400000', '200000', '400000'],
+        'Name': ['DOLNOŚLĄSKIE', 'KUJAWSKO-POMORSKIE'] * 2,
+        'Year': [2020, 2020, 2021, 2021],
+        'Indicator': 'Wskaźnik',
+        'Indicator code': '5000',
+        'Value': [1.0, 2.0, 3.0, 4.0],
+    })
+    return QueryService(IndicatorQuery(master_df))
+
+
+def handle(service, target, **headers) -> tuple:
+    return asyncio.run(service.handle('GET', target, headers))
+
+
+def test_ok(service):
+    status, headers, body = handle(service, '/indicators/5000/regions/200000')
+
+    assert status == HTTPStatus.OK
+    assert headers['ETag'] == service.etag
+    assert json.loads(body) == [{'Year': 2020, 'Value': 1.0}, {'Year': 2021, 'Value': 3.0}]
+
+
+def test_not_modified(service):
+    status, headers, body = handle(service, '/indicators/5000?from=2021', **{'if-none-match': service.etag})
+
+    assert status == HTTPStatus.NOT_MODIFIED
+    assert headers['ETag'] == service.etag
+    assert body == b''
+
+
+@pytest.mark.parametrize('target, status', [
+    ('/indicators/9999', HTTPStatus.NOT_FOUND),
+    ('/unknown', HTTPStatus.NOT_FOUND),
+    ('/indicators/5000/years/latest', HTTPStatus.BAD_REQUEST),
+    ('/indicators/5000?format=xml', HTTPStatus.BAD_REQUEST),
+])
+def test_errors_whatever_the_etag(service, target, status):
+    # a client revalidating with the current version still learns the target is wrong
+    for headers in ({}, {'if-none-match': service.etag}, {'if-none-match': '*'}):
+        with pytest.raises(HTTPError) as error:
+            handle(service, target, **headers)
+        assert error.value.status == status
@@ -0,0 +1,78 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic_archive import archive_subset, generate_archive
+import processing.processor as processor
+from processing.indicator import Indicator
+from processing.store import IndicatorStore
+
+
+@pytest.fixture(scope='module')
+def full_archive(tmp_path_factory):
+    zip_path = str(tmp_path_factory.mktemp('archives') / 'full.zip')
+    generate_archive(zip_path, indicators=7, first_year=2016, last_year=2021)
+    return zip_path
+
+
+def test_inputs_in_separate_archives(full_archive, tmp_path):
+    store = IndicatorStore(str(tmp_path / 'store'))
+
+    first = archive_subset(full_archive, str(tmp_path / 'first.zip'), ['1869', '3430'])
+    assert sorted(processor.ingest_archive(first, store, use_cache=False)) == ['1869', '3430']
+    # 3787 is not there yet -> nothing derived, 1869 is published as it is
+    assert sorted(store.indicator_codes()) == ['1869', '3430']
+    assert set(processor.store_master_df(store)['Indicator code']) == {'1869', '3430'}
+
+    second = archive_subset(full_archive, str(tmp_path / 'second.zip'), ['3787'])
+    assert processor.ingest_archive(second, store, use_cache=False) == ['3787', '1869-3787']
+    assert sorted(store.indicator_codes()) == ['1869', '1869-3787', '3430', '3787']
+
+    # the derived indicator from the store equals the one derived from the full archive
+    master_df = processor.store_master_df(store)
+    assert set(master_df['Indicator code']) == {'1869-3787', '3430'}
+    expected = processor.indicators_to_master_df(processor.zip_to_indicators(first) + processor.zip_to_indicators(second))
+    derived, expected_derived = (
+        df[df['Indicator code'] == '1869-3787'].sort_values(['Code', 'Year'])['Value'].to_numpy()
+        for df in (master_df, expected)
+    )
+    assert len(derived)
+    np.testing.assert_array_equal(derived, expected_derived)
+
+
+def snapshot(values, timestamp, years=(2020, 2021)) -> Indicator:
+    df = pd.DataFrame({
+        'Code': ['200000'] * len(years),
+        'Name': 'DOLNOŚLĄSKIE',
+        'Year': list(years),
+        'Indicator': 'Wskaźnik',
+        'Indicator code': '5000',
+        'Value': values,
+    })
+    return Indicator(name='Wskaźnik', code='5000', years=list(years), df=df, timestamp=timestamp)
+
+
+def test_read_as_of_older_versions(tmp_path):
+    store = IndicatorStore(str(tmp_path / 'store'))
+    assert store.ingest([snapshot([1.0, 2.0], datetime(2023, 1, 1))]) == ['5000']
+    # a revision of 2021 and a new year
+    assert store.ingest([snapshot([3.0, 4.0], datetime(2023, 6, 1), years=(2021, 2022))]) == ['5000']
+    # the same rows again, and an older export -> no new version
+    assert store.ingest([snapshot([3.0, 4.0], datetime(2023, 7, 1), years=(2021, 2022))]) == []
+    assert store.ingest([snapshot([9.0, 9.0], datetime(2022, 1, 1))]) == []
+
+    assert [version['version'] for version in store.versions('5000')] == [1, 2]
+
+    def values(df):
+        return df.sort_values('Year')[['Year', 'Value']].to_numpy().tolist()
+
+    assert values(store.read()) == [[2020, 1.0], [2021, 3.0], [2022, 4.0]]
+    assert values(store.read(as_of='2023-03-01')) == [[2020, 1.0], [2021, 2.0]]
+    assert values(store.read(as_of=datetime(2023, 6, 1))) == values(store.read())
+    assert len(store.read(as_of='2022-12-31')) == 0
+    assert values(store.read(versions={'5000': 1})) == [[2020, 1.0], [2021, 2.0]]
+
+    # a reopened store reads the same manifest
+    assert values(IndicatorStore(store.store_path).read(as_of='2023-03-01')) == [[2020, 1.0], [2021, 2.0]]
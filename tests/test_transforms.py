@@ -0,0 +1,23 @@
+import numpy as np
+import pandas as pd
+
+from processing.indicator.df.transforms import transform_plan
+
+
+def test_3895_is_the_mean_of_both_sexes():
+    df = pd.DataFrame({
+        'Code': ['200000'] * 4 + ['400000'] * 2,
+        'Name': ['DOLNOŚLĄSKIE'] * 4 + ['KUJAWSKO-POMORSKIE'] * 2,
+        'Płeć': ['mężczyźni', 'kobiety'] * 3,
+        'Wiek': 0,
+        'Year': [2020, 2020, 2021, 2021, 2020, 2020],
+        'Value': [60.0, 64.0, 61.0, 65.0, 59.0, np.nan],
+        'Indicator': 'Oczekiwane trwanie życia w zdrowiu',
+        'Indicator code': '3895',
+    })
+
+    result = transform_plan('3895')(df)
+
+    # one row per region and year; a year without both sexes is left out
+    assert result[['Code', 'Year', 'Value']].to_numpy().tolist() == [['200000', 2020, 62.0], ['200000', 2021, 63.0]]
+    assert (result['Indicator'] == 'Oczekiwane trwanie życia w zdrowiu, średnia kobiet i mężczyzn').all()
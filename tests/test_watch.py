@@ -0,0 +1,141 @@
+import os
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic_archive import archive_subset, generate_archive
+from benchmarks.watch_latency import drop_archive, published_archives
+import processing.processor as processor
+from processing.store import IndicatorStore, published_path, read_master_df
+from processing.watch import KEEP_VERSIONS, VERSIONS_FOLDER, IngestDaemon
+
+# seconds from the last byte of an archive to published data; parsing a small archive takes well under this
+LATENCY_BOUND = 20.0
+
+ARCHIVE_NAME = 'export.zip'
+
+MASTER_DF_KEY = ['Indicator code', 'Code', 'Year']
+
+# inputs of the derived indicator of INSTRUCTIONS -> stored, but not in master_df
+DERIVED_INPUTS = ['1869', '3787']
+
+
+def small_archive(zip_path, seed):
+    # the templates (transforms and instructions) and one filler over a few years
+    return generate_archive(zip_path, indicators=8, first_year=2016, last_year=2021, seed=seed)
+
+
+def pipeline_master_df(zip_path, output_path):
+    # reference: the ingest command on the same archive
+    master_df = processor.main(zip_path, use_cache=False, overwrite=True, output_path=output_path)
+    return sorted_master_df(master_df)
+
+
+def sorted_master_df(master_df):
+    master_df = master_df[MASTER_DF_KEY + ['Value']].astype({'Indicator code': str, 'Code': str, 'Year': int, 'Value': float})
+    return master_df.sort_values(MASTER_DF_KEY, ignore_index=True)
+
+
+def wait_for_publish(output_path, name, signature, timeout) -> dict:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        record = published_archives(output_path).get(name)
+        if record is not None and record['signature'] == signature and ('published_at' in record or 'error' in record):
+            return record
+        time.sleep(0.02)
+    pytest.fail(f'{name} was not published within {timeout} s')
+
+
+@pytest.fixture
+def folders(tmp_path):
+    names = ('staging', 'watch', 'output', 'store', 'reference')
+    for name in names:
+        os.makedirs(tmp_path / name)
+    return {name: str(tmp_path / name) for name in names}
+
+
+@pytest.fixture
+def daemon(folders, tmp_path):
+    daemon = IngestDaemon(folders['watch'], folders['output'], folders['store'], workers=2, settle=0.2,
+                          poll_interval=0.1, work_path=str(tmp_path / 'work'))
+    thread = threading.Thread(target=daemon.run)
+    thread.start()
+    yield daemon
+    daemon.stop()
+    thread.join(timeout=60)
+    assert not thread.is_alive()
+
+
+def drop_and_wait(folders, source):
+    target = os.path.join(folders['watch'], ARCHIVE_NAME)
+    arrived = drop_archive(source, target, parts=4, pause=0.05)
+    stat = os.stat(target)
+
+    record = wait_for_publish(folders['output'], ARCHIVE_NAME, [stat.st_size, stat.st_mtime_ns], LATENCY_BOUND + 10)
+    assert 'error' not in record
+    assert record['published_at'] - arrived < LATENCY_BOUND
+    return record
+
+
+def test_archive_is_published(folders, daemon):
+    source = os.path.join(folders['staging'], 'first.zip')
+    small_archive(source, seed=0)
+
+    record = drop_and_wait(folders, source)
+
+    published = sorted_master_df(read_master_df(folders['output']))
+    expected = pipeline_master_df(source, folders['reference'])
+    assert set(published['Indicator code']) == set(expected['Indicator code'])
+    assert sorted(record['changed']) == sorted([*expected['Indicator code'].unique(), *DERIVED_INPUTS])
+    assert published.equals(expected)
+
+
+def test_replaced_archive_is_published(folders, daemon):
+    first, second = (os.path.join(folders['staging'], name) for name in ('first.zip', 'second.zip'))
+    small_archive(first, seed=0)
+    small_archive(second, seed=1)
+
+    drop_and_wait(folders, first)
+    # the same name again, with other values -> every indicator gets a new version
+    record = drop_and_wait(folders, second)
+
+    first_df = pipeline_master_df(first, os.path.join(folders['reference'], 'first'))
+    second_df = pipeline_master_df(second, os.path.join(folders['reference'], 'second'))
+    assert sorted(record['changed']) == sorted([*second_df['Indicator code'].unique(), *DERIVED_INPUTS])
+
+    # rows are upserted -> values of the second archive, plus rows only the first one has
+    first_only = ~first_df.set_index(MASTER_DF_KEY).index.isin(second_df.set_index(MASTER_DF_KEY).index)
+    expected = sorted_master_df(pd.concat([second_df, first_df[first_only]]))
+    assert sorted_master_df(read_master_df(folders['output'])).equals(expected)
+
+    store = IndicatorStore(folders['store'])
+    for indicator_code in record['changed']:
+        assert len(store.versions(indicator_code)) == 2
+
+
+def test_partial_archives_are_published(folders, daemon):
+    full = os.path.join(folders['staging'], 'full.zip')
+    small_archive(full, seed=0)
+    first = archive_subset(full, os.path.join(folders['staging'], 'first.zip'), ['1869', '3430'])
+    second = archive_subset(full, os.path.join(folders['staging'], 'second.zip'), ['3787'])
+
+    record = drop_and_wait(folders, first)
+    # 3787 is not there yet -> nothing derived, 1869 is published as it is
+    assert sorted(record['changed']) == ['1869', '3430']
+    assert set(read_master_df(folders['output'])['Indicator code']) == {'1869', '3430'}
+    first_path = published_path(folders['output'])
+
+    record = drop_and_wait(folders, second)
+    assert record['changed'] == ['3787', '1869-3787']
+
+    # the same rows as the ingest command on both archives at once
+    expected = pipeline_master_df(full, folders['reference'])
+    expected = expected[expected['Indicator code'].isin(['1869-3787', '3430'])].reset_index(drop=True)
+    assert sorted_master_df(read_master_df(folders['output'])).equals(expected)
+
+    # every publish is a new folder, old ones are removed
+    assert published_path(folders['output']) != first_path
+    drop_and_wait(folders, full)
+    assert len(os.listdir(os.path.join(folders['output'], VERSIONS_FOLDER))) == KEEP_VERSIONS